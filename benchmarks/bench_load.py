@@ -0,0 +1,61 @@
+"""
+Config loading benchmark.
+
+Times ``Config.from_dic`` on synthetic configurations of growing size and
+reports the cost per entry, which stays flat when loading scales linearly.
+
+Usage:
+    python benchmarks/bench_load.py
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import synthetic_config
+from conman.commands.build import Config
+
+SCALES = [10, 100, 1000, 5000]
+REPEAT = 5
+
+
+def time_load(scale: int, repeat: int = REPEAT) -> float:
+    """
+    Returns the best wall time (in seconds) to load a config of given scale.
+    """
+
+    dic = synthetic_config(scale)
+    best = float("inf")
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            Config.from_dic(dic, prune=True)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> int:
+    print(f"{'scale':>8} {'load (ms)':>12} {'per entry (us)':>16}")
+    per_entry = []
+    for scale in SCALES:
+        elapsed = time_load(scale)
+        per_entry.append(elapsed / scale)
+        print(
+            f"{scale:>8} {elapsed * 1e3:>12.2f} {per_entry[-1] * 1e6:>16.2f}"
+        )
+
+    # Linear scaling keeps the per entry cost roughly constant
+    print(
+        f"per entry cost ratio (largest / 100): {per_entry[-1] / per_entry[1]:.2f}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,302 @@
+"""
+Benchmark suite with JSON results and regression checks.
+
+Times the main code paths of a conman build on synthetic configurations of
+growing size (volumes, extra instructions, vscode extensions and compose
+services): loading the config file, building it from a dictionary, pruning
+it, dumping it to YAML and JSON, generating the Dockerfiles and running the
+full build into a temporary directory.
+
+The best time of each benchmark at each scale is saved to a JSON file. Given
+a baseline file, every benchmark slower than the baseline by more than the
+threshold is reported and the exit code is 1, so that CI can flag it.
+
+Usage:
+    python benchmarks/bench_suite.py --output results.json
+    python benchmarks/bench_suite.py --baseline results.json --threshold 0.25
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import dump_synthetic_config, synthetic_config
+from conman.commands import build as build_command
+from conman.commands.build import Config
+from conman.host import HostFacts, set_host_facts
+from conman.ressources import docker_compose
+from conman.ressources.docker_compose import DockerComposeFile
+
+SCALES = [10, 100, 1000]
+REPEAT = 5
+THRESHOLD = 0.25
+FORMAT_VERSION = 1
+
+# Probing the host is not what is measured, and it would make the results
+# depend on the machine running the suite
+FAKE_HOST_FACTS = {
+    "platform": "Linux",
+    "user": {"USER_NAME": "bench", "USER_UID": "1000", "USER_GID": "1000"},
+    "display": ":0",
+    "compute_capability": "8.6",
+}
+
+
+@contextlib.contextmanager
+def no_x_access():
+    """
+    Disables the X11 access granted on the host ("xhost +local:") by each
+    build of the graphical synthetic configurations.
+    """
+
+    previous = build_command.x_access, docker_compose.x_access
+    build_command.x_access = docker_compose.x_access = lambda: None
+    try:
+        yield
+    finally:
+        build_command.x_access, docker_compose.x_access = previous
+
+
+def best_of(
+    func: Callable,
+    setup: Optional[Callable] = None,
+    repeat: int = REPEAT,
+) -> float:
+    """
+    Returns the best wall time (in seconds) of repeat calls to func.
+
+    Args:
+        func (callable): The timed function, called with the setup result.
+        setup (callable, optional): Prepares the input of func, untimed.
+        repeat (int): The number of calls.
+
+    Returns:
+        float: The best time.
+    """
+
+    best = float("inf")
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            data = setup() if setup is not None else None
+            start = time.perf_counter()
+            func(data)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def compose_file(scale: int) -> DockerComposeFile:
+    """
+    Builds a docker-compose file with scale services.
+    """
+
+    docker_compose_file = DockerComposeFile()
+    for i in range(scale):
+        docker_compose_file.add_service(
+            f"service{i}",
+            container_name=f"container{i}",
+            volumes=[f"./data/{i}:/workspace/data/{i}"],
+        )
+    return docker_compose_file
+
+
+def run_scale(scale: int, tmpdir: str, repeat: int = REPEAT) -> Dict:
+    """
+    Runs every benchmark on a synthetic configuration of given scale.
+
+    Args:
+        scale (int): The number of entries per growing section.
+        tmpdir (str): The directory the files are written to.
+        repeat (int): The number of calls per benchmark.
+
+    Returns:
+        dict: The best time of each benchmark, in seconds.
+    """
+
+    wdir = os.path.join(tmpdir, f"project-{scale}")
+    os.makedirs(wdir)
+    filename = os.path.join(wdir, "conman-config.yml")
+    dump_synthetic_config(filename, scale)
+    dic = synthetic_config(scale)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        config = Config.load_conman_config_file(filename)
+        docker_file = config.images.root.dockerfile()[0]
+        docker_compose_file = compose_file(scale)
+
+    def load(_):
+        return Config.load_conman_config_file(filename)
+
+    def build(config):
+        config.run_building(use_cache=False, workdir=wdir)
+
+    output = os.path.join(tmpdir, f"output-{scale}")
+    benchmarks = {
+        "load_conman_config_file": (load, None),
+        "from_dic": (lambda _: Config.from_dic(dic, prune=True), None),
+        "removing_attr": (lambda _: config.removing_attr(), None),
+        "dump_to_yml": (lambda _: config.dump_to_yml(f"{output}.yml"), None),
+        "dump_to_json": (
+            lambda _: config.dump_to_json(f"{output}.json"),
+            None,
+        ),
+        "dockerfile_generate": (
+            lambda _: docker_file.generate(f"{output}.Dockerfile"),
+            None,
+        ),
+        "compose_services": (
+            lambda _: docker_compose_file.dump_to_yml(
+                f"{output}.compose.yml", rm_private=True
+            ),
+            None,
+        ),
+        # The build mutates its config, a fresh one is loaded before each run
+        "run_building": (build, lambda: load(None)),
+    }
+    return {
+        name: best_of(func, setup=setup, repeat=repeat)
+        for name, (func, setup) in benchmarks.items()
+    }
+
+
+def run_suite(scales: List[int], repeat: int = REPEAT) -> Dict:
+    """
+    Runs the benchmarks at every scale.
+
+    Args:
+        scales (list): The scales of the synthetic configurations.
+        repeat (int): The number of calls per benchmark.
+
+    Returns:
+        dict: The results, with the best times under "results" by
+            benchmark then scale.
+    """
+
+    results = {}
+    previous = set_host_facts(HostFacts(FAKE_HOST_FACTS))
+    try:
+        with no_x_access(), tempfile.TemporaryDirectory() as tmpdir:
+            for scale in scales:
+                for name, elapsed in run_scale(scale, tmpdir, repeat).items():
+                    results.setdefault(name, {})[str(scale)] = elapsed
+    finally:
+        set_host_facts(previous)
+
+    return {
+        "version": FORMAT_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List[Dict]:
+    """
+    Lists the benchmarks slower than the baseline by more than threshold.
+
+    Benchmarks or scales missing from either file are skipped.
+
+    Args:
+        baseline (dict): The reference results.
+        current (dict): The new results.
+        threshold (float): The allowed slowdown, 0.25 allows 25% slower.
+
+    Returns:
+        list: The regressions, with their name, scale, times and ratio.
+    """
+
+    regressions = []
+    for name, timings in current["results"].items():
+        reference = baseline["results"].get(name, {})
+        for scale, elapsed in timings.items():
+            if scale not in reference or reference[scale] <= 0:
+                continue
+            ratio = elapsed / reference[scale]
+            if ratio > 1 + threshold:
+                regressions.append(
+                    {
+                        "name": name,
+                        "scale": scale,
+                        "baseline": reference[scale],
+                        "current": elapsed,
+                        "ratio": ratio,
+                    }
+                )
+    return regressions
+
+
+def print_results(results: Dict) -> None:
+    scales = sorted(
+        {scale for timings in results.values() for scale in timings}, key=int
+    )
+    print(f"{'benchmark (ms)':>24}" + "".join(f"{s:>12}" for s in scales))
+    for name, timings in results.items():
+        print(
+            f"{name:>24}"
+            + "".join(
+                f"{timings[s] * 1e3:>12.2f}" if s in timings else f"{'-':>12}"
+                for s in scales
+            )
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--scales",
+        default=",".join(str(scale) for scale in SCALES),
+        help="Comma separated scales of the synthetic configurations",
+    )
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--output", help="Save the results to a JSON file")
+    parser.add_argument("--baseline", help="JSON results to compare with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=THRESHOLD,
+        help="Allowed slowdown against the baseline, 0.25 is 25%%",
+    )
+    args = parser.parse_args(argv)
+
+    scales = [int(scale) for scale in args.scales.split(",")]
+    current = run_suite(scales, repeat=args.repeat)
+    print_results(current["results"])
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=4)
+        print(f"Results saved to {args.output}")
+
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    for regression in regressions:
+        print(
+            f"Regression: {regression['name']} at scale {regression['scale']}"
+            f" {regression['baseline'] * 1e3:.2f} ms ->"
+            f" {regression['current'] * 1e3:.2f} ms"
+            f" (x{regression['ratio']:.2f})"
+        )
+    print(
+        f"{len(regressions)} regressions beyond {args.threshold:.0%}"
+        f" against {args.baseline}"
+    )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,83 @@
+"""
+YAML backend benchmark.
+
+Times parsing a conman config file and dumping it back with the libyaml and
+the pure-Python backends, on synthetic configurations of growing size.
+
+Usage:
+    python benchmarks/bench_yaml.py
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import dump_synthetic_config
+from conman import yml_backend
+from conman.commands.build import Config
+
+SCALES = [100, 1000, 5000]
+REPEAT = 3
+
+
+def best_of(func, repeat: int = REPEAT) -> float:
+    """
+    Returns the best wall time (in seconds) of repeat calls to func.
+    """
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_backend(backend: str, filename: str) -> tuple:
+    """
+    Returns the (load, dump) times of a config file with the given backend.
+    """
+
+    yml_backend.set_backend(backend)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            config = Config.load_conman_config_file(filename)
+        load = best_of(lambda: yml_backend.load_file(filename))
+        dump = best_of(
+            lambda: config.write_yml(io.StringIO(), rm_optional=False)
+        )
+    finally:
+        yml_backend.set_backend(None)
+    return load, dump
+
+
+def main() -> int:
+    backends = ["python"]
+    if yml_backend.has_libyaml():
+        backends.append("libyaml")
+    else:
+        print("PyYAML is not built with libyaml, only timing python backend")
+
+    print(f"{'scale':>8} {'backend':>8} {'load (ms)':>12} {'dump (ms)':>12}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for scale in SCALES:
+            filename = os.path.join(tmpdir, f"conman-config-{scale}.yml")
+            dump_synthetic_config(filename, scale)
+            for backend in backends:
+                load, dump = time_backend(backend, filename)
+                print(
+                    f"{scale:>8} {backend:>8}"
+                    f" {load * 1e3:>12.2f} {dump * 1e3:>12.2f}"
+                )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,84 @@
+"""Synthetic conman configurations used by the benchmarks."""
+
+from __future__ import annotations
+
+from typing import Dict
+
+import yaml
+
+
+def synthetic_config(scale: int) -> Dict:
+    """
+    Builds a conman configuration dictionary whose size grows with scale.
+
+    Every list (extra instructions, volumes, vscode extensions) gets scale
+    entries and the vscode settings get scale nested sections, each of which
+    is loaded as its own Builder instance.
+
+    Args:
+        scale (int): The number of entries per growing section.
+
+    Returns:
+        dict: The configuration, as returned by the YAML loader.
+    """
+
+    return {
+        "images": {
+            "root": {
+                "generate": True,
+                "name": "bench",
+                "tag": "latest",
+                "from_image": {"name": "ubuntu", "tag": "20.04"},
+                "conda_environment": {
+                    "directory": "/opt/conda",
+                    "env_name": "myenv",
+                    "env_filename": "./.conman/conda/environment.yml",
+                },
+                "extra_instructions": [
+                    f"RUN echo root-{i} >> /tmp/root.log" for i in range(scale)
+                ],
+            },
+            "user": {
+                "extra_instructions": [
+                    f"RUN echo user-{i} >> /tmp/user.log" for i in range(scale)
+                ],
+            },
+        },
+        "container": {
+            "engine": "docker",
+            "compose": {
+                "service_name": "main",
+                "volumes": [
+                    f"./data/{i}:/workspace/data/{i}" for i in range(scale)
+                ],
+            },
+            "devcontainer": {
+                "customizations": {
+                    "vscode": {
+                        "settings": {
+                            f"bench.section{i}": {
+                                "enabled": True,
+                                "value": i,
+                                "services": {"name": f"svc{i}"},
+                            }
+                            for i in range(scale)
+                        },
+                        "extensions": [
+                            f"publisher.extension-{i}" for i in range(scale)
+                        ],
+                    }
+                }
+            },
+            "graphical": {"protocol": "x11"},
+            "gpu": {"manufacturer": "nvidia", "count": 1},
+        },
+    }
+
+
+def dump_synthetic_config(filename: str, scale: int) -> None:
+    """
+    Writes a synthetic configuration of the given scale to a YAML file.
+    """
+
+    with open(filename, "w") as f:
+        yaml.dump(synthetic_config(scale), f, sort_keys=False, indent=4)
@@ -1 +1,11 @@
-from . import constants, main, commands, utils, io
+import importlib
+
+# Submodules are imported on first access so that the CLI only loads what the
+# chosen command needs.
+__all__ = ["constants", "main", "commands", "utils", "io", "yml_backend"]
+
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
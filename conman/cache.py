@@ -0,0 +1,375 @@
+"""
+Incremental build cache.
+
+The build manifest stored in the .conman directory maps the hash of the
+inputs of a build step (config sections, host facts, conman version) to the
+hashes of the files that step generated. A step is skipped when its inputs
+match an entry and the files on disk still have the recorded hashes.
+
+The manifest also keeps a snapshot of the last full build: the hash of the
+config file and of the environment it was built in, and the hash of every
+generated file. While they all still match, the project is up to date
+without loading the config file.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from conman.constants import CONFIG_DIR, get_version
+
+MANIFEST_FILE = CONFIG_DIR + "build-manifest.json"
+MANIFEST_VERSION = 1
+
+# Environment variables read by the host facts the generated files embed
+SNAPSHOT_ENVIRONMENT = ("USER", "DISPLAY")
+
+
+def hash_data(data: Any) -> str:
+    """
+    Hashes JSON-like data independently of dictionary ordering.
+
+    Args:
+        data (Any): The data to hash.
+
+    Returns:
+        str: The sha256 hex digest.
+    """
+
+    stream = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(stream.encode()).hexdigest()
+
+
+def hash_content(content: str) -> str:
+    """
+    Hashes a generated file content, as hash_file once it is written.
+    """
+
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def hash_file(filename: str) -> Optional[str]:
+    """
+    Hashes the content of a file.
+
+    Args:
+        filename (str): The path to the file.
+
+    Returns:
+        str: The sha256 hex digest, None if the file does not exist.
+    """
+
+    try:
+        with open(filename, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def snapshot_key(workdir: str, config_file: str) -> Optional[str]:
+    """
+    Hashes what a full build depends on besides the config sections: the
+    config file, the project directory, the conman version and environment.
+
+    Args:
+        workdir (str): The project directory.
+        config_file (str): The config file path, relative to workdir.
+
+    Returns:
+        str: The sha256 hex digest, None if the config file does not exist.
+    """
+
+    config_hash = hash_file(os.path.join(workdir, config_file))
+    if config_hash is None:
+        return None
+    return hash_data(
+        {
+            "config": config_hash,
+            "workdir": os.path.abspath(workdir),
+            "version": get_version(),
+            "environment": {
+                name: os.environ.get(name) for name in SNAPSHOT_ENVIRONMENT
+            },
+        }
+    )
+
+
+class BuildCache:
+    """
+    Content-addressed cache of the build steps of a project.
+
+    Attributes:
+        workdir (str): The project directory.
+        filename (str): The manifest path, relative to workdir.
+        max_entries (int): Number of entries kept, least recently used
+            entries are evicted first.
+        entries (OrderedDict): Input hash to step entry, oldest first.
+        snapshot (dict): The key and output hashes of the last full build.
+
+    Methods:
+        load(cls, workdir, filename, max_entries)
+            Loads the manifest of a project.
+
+        is_fresh(self, step, inputs, outputs)
+            Checks if a step can be skipped.
+
+        record(self, step, inputs, outputs)
+            Records the files generated by a step.
+
+        run(self, step, inputs, outputs, generate)
+            Runs a step unless it is fresh.
+
+        known_hashes(self, output)
+            Returns every hash recorded for a file.
+
+        record_snapshot(self, config_file, outputs)
+            Records the files generated by a full build.
+
+        snapshot_outputs(self, config_file)
+            Returns the files of an up to date snapshot.
+
+        save(self)
+            Writes the manifest.
+    """
+
+    def __init__(
+        self,
+        workdir: str = "./",
+        filename: str = MANIFEST_FILE,
+        max_entries: int = 64,
+        entries: Optional[Dict] = None,
+        snapshot: Optional[Dict] = None,
+    ):
+        self.workdir = workdir
+        self.filename = filename
+        self.max_entries = max_entries
+        self.entries = OrderedDict(entries or {})
+        self.snapshot = snapshot
+
+    @classmethod
+    def load(
+        cls,
+        workdir: str = "./",
+        filename: str = MANIFEST_FILE,
+        max_entries: int = 64,
+    ) -> BuildCache:
+        """
+        Loads the manifest of a project, an unreadable one is ignored.
+
+        Args:
+            workdir (str): The project directory.
+            filename (str): The manifest path, relative to workdir.
+            max_entries (int): Number of entries kept.
+
+        Returns:
+            BuildCache: The cache.
+        """
+
+        entries, snapshot = None, None
+        try:
+            with open(os.path.join(workdir, filename), "r") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                entries = manifest.get("entries")
+                snapshot = manifest.get("snapshot")
+        except (OSError, ValueError, AttributeError):
+            pass
+
+        return cls(
+            workdir=workdir,
+            filename=filename,
+            max_entries=max_entries,
+            entries=entries,
+            snapshot=snapshot,
+        )
+
+    def _path(self, output: str) -> str:
+        return os.path.join(self.workdir, output)
+
+    def _relpath(self, output: str) -> str:
+        return os.path.relpath(self._path(output), self.workdir)
+
+    @staticmethod
+    def input_hashes(inputs: Dict) -> Dict[str, str]:
+        """
+        Returns the hash of each input of a step.
+        """
+
+        return {name: hash_data(value) for name, value in inputs.items()}
+
+    @classmethod
+    def key(cls, step: str, inputs: Dict) -> str:
+        """
+        Returns the content address of a step for given inputs.
+        """
+
+        return hash_data({"step": step, "inputs": cls.input_hashes(inputs)})
+
+    def is_fresh(self, step: str, inputs: Dict, outputs: List[str]) -> bool:
+        """
+        Checks if a step can be skipped.
+
+        Args:
+            step (str): The step name.
+            inputs (dict): The data the step depends on.
+            outputs (list): The files generated by the step.
+
+        Returns:
+            bool: True if an entry matches the inputs and every output file
+                still has its recorded hash.
+        """
+
+        key = self.key(step, inputs)
+        entry = self.entries.get(key)
+        if entry is None:
+            return False
+
+        recorded = entry["outputs"]
+        for output in outputs:
+            relpath = self._relpath(output)
+            if relpath not in recorded:
+                return False
+            if hash_file(self._path(output)) != recorded[relpath]:
+                return False
+
+        self.entries.move_to_end(key)
+        return True
+
+    def known_hashes(self, output: str) -> Set[str]:
+        """
+        Returns every hash recorded for a file, i.e. the contents conman
+        generated for it.
+        """
+
+        relpath = self._relpath(output)
+        return {
+            entry["outputs"][relpath]
+            for entry in self.entries.values()
+            if entry["outputs"].get(relpath)
+        }
+
+    def record_snapshot(self, config_file: str, outputs: List[str]) -> None:
+        """
+        Records the files generated by a full build.
+
+        Args:
+            config_file (str): The config file path, relative to workdir.
+            outputs (list): The files generated by every step.
+
+        Returns:
+            None
+        """
+
+        key = snapshot_key(self.workdir, config_file)
+        self.snapshot = key and {
+            "key": key,
+            "outputs": {
+                self._relpath(output): hash_file(self._path(output))
+                for output in outputs
+            },
+        }
+
+    def snapshot_outputs(self, config_file: str) -> Optional[List[str]]:
+        """
+        Returns the files of the last full build if nothing changed since:
+        neither the config file, the environment nor any generated file.
+
+        Args:
+            config_file (str): The config file path, relative to workdir.
+
+        Returns:
+            list: The generated files relative to workdir, None if the
+                snapshot is missing or out of date.
+        """
+
+        if not self.snapshot:
+            return None
+        if self.snapshot["key"] != snapshot_key(self.workdir, config_file):
+            return None
+
+        recorded = self.snapshot["outputs"]
+        for relpath, recorded_hash in recorded.items():
+            if hash_file(self._path(relpath)) != recorded_hash:
+                return None
+        return list(recorded)
+
+    def record(self, step: str, inputs: Dict, outputs: List[str]) -> None:
+        """
+        Records the files generated by a step.
+
+        Args:
+            step (str): The step name.
+            inputs (dict): The data the step depends on.
+            outputs (list): The files generated by the step.
+
+        Returns:
+            None
+        """
+
+        key = self.key(step, inputs)
+        self.entries[key] = {
+            "step": step,
+            "inputs": self.input_hashes(inputs),
+            "outputs": {
+                self._relpath(output): hash_file(self._path(output))
+                for output in outputs
+            },
+        }
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def run(
+        self,
+        step: str,
+        inputs: Dict,
+        outputs: List[str],
+        generate: Callable,
+        use_cache: bool = True,
+    ) -> bool:
+        """
+        Runs a step unless it is fresh, then records its outputs.
+
+        Args:
+            step (str): The step name.
+            inputs (dict): The data the step depends on.
+            outputs (list): The files generated by the step.
+            generate (Callable): Generates the outputs.
+            use_cache (bool): If False, always run the step.
+
+        Returns:
+            bool: True if the step ran, False if it was skipped.
+        """
+
+        if use_cache and self.is_fresh(step, inputs, outputs):
+            names = ", ".join(os.path.basename(output) for output in outputs)
+            print(f"Up to date, skipping: \t{names}")
+            return False
+
+        generate()
+        self.record(step, inputs, outputs)
+        return True
+
+    def save(self) -> None:
+        """
+        Writes the manifest.
+
+        Returns:
+            None
+        """
+
+        # conman.io imports yaml, keep it out of the loading path of status
+        from conman.io import ArtifactWriter, create_directory
+
+        manifest = {"version": MANIFEST_VERSION, "entries": self.entries}
+        if self.snapshot:
+            manifest["snapshot"] = self.snapshot
+
+        filename = self._path(self.filename)
+        create_directory(filename)
+        with ArtifactWriter(filename) as f:
+            json.dump(manifest, f, indent=4)
@@ -0,0 +1,10 @@
+import importlib
+
+__all__ = ["build", "clean", "init", "lint", "status", "update"]
+
+
+def __getattr__(name):
+    # Command modules are imported on first access, see conman.main
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
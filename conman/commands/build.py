@@ -1,50 +1,135 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional, Union, Protocol
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    Protocol,
+)
 from pathlib import Path
 
 import os
+import re
 from conman import utils
 from conman.io import asi, Builder, create_directory, check_file_exist
+from conman.io import project_lock
 import conman.ressources as rsrc
+from conman.cache import BuildCache
+from conman.host import HOST_FACTS_FILE, get_host_facts
+from conman.topology import pinned_gpus, plan_numa_placement, select_gpus
 from conman.constants import *
-import yaml
 from dataclasses import dataclass, field
 from conman.ressources.devcontainer import DevContainer
 from conman.ressources.docker_compose import DockerComposeFile, DockerCompose
-from conman.ressources.docker_compose import get_user_id_data
+from conman.ressources.docker_compose import (
+    get_user_id_data,
+    get_display,
+    parse_size,
+    x_access,
+)
 from conman.ressources.docker_file import DockerFile, Instructions
 import logging
 
 
+# Config file sections each cached build step depends on
+BUILD_STEPS = {
+    "devcontainer": ["container.devcontainer", "container.compose"],
+    "dockercompose": [
+        "container.compose",
+        "container.graphical",
+        "container.gpu",
+        "container.resources",
+        "images.root.conda_environment",
+    ],
+    "dockerfile_user": ["images", "container.graphical"],
+    "dockerfile_root": ["images.root", "container.engine"],
+}
+
+
+IPC_MODES = ("private", "shareable", "host", "none")
+ULIMIT_NAMES = (
+    "core",
+    "cpu",
+    "data",
+    "fsize",
+    "locks",
+    "memlock",
+    "msgqueue",
+    "nice",
+    "nofile",
+    "nproc",
+    "rss",
+    "rtprio",
+    "rttime",
+    "sigpending",
+    "stack",
+)
+# Capabilities of the nvidia driver, "gpu" selects the driver
+GPU_CAPABILITIES = (
+    "gpu",
+    "compute",
+    "utility",
+    "graphics",
+    "video",
+    "display",
+    "compat32",
+)
+CUDA_DEVICE_ORDERS = ("PCI_BUS_ID", "FASTEST_FIRST")
+PLACEMENTS = ("", "numa")
+CPUSET = re.compile(r"^\d+(-\d+)?(,\d+(-\d+)?)*$")
+
+# Platforms of the conda-lock input, the images are built for linux-64
+LOCK_PLATFORMS = ["linux-64"]
+DEFAULT_PIP_PACKAGES = ["scipy", "opencv-python", "opencv-contrib-python"]
+
+
 @asi
 @dataclass
 class CondaEnvironment(Builder):
     directory: Path = "/opt/conda"
     env_name: str = "myenv"
     env_filename: Path = f"{CONFIG_DIR}conda/environment.yml"
+    solver: str = "classic"
+    lockfile: str = ""
+    _optional_attributes_: List[str] = field(
+        default_factory=lambda: ["solver", "lockfile"]
+    )
 
     def generate_environment_file(
         self,
         filename: str = None,
-        pip_packages=["scipy", "opencv-python", "opencv-contrib-python"],
+        pip_packages=DEFAULT_PIP_PACKAGES,
         conda_packages=["python=3.8", "pip", "numpy"],
         channels=["conda-forge", "anaconda", "defaults"],
+        platforms=None,
+        wdir: str = "./",
     ) -> None:
         """_summary_
         Manage conda environment.yml file
         if file exists do nothing else create an empty file
         Args:
             self.env_filename (str): environment.yml file path
+            platforms (list, optional): Platforms to lock the environment
+                for, the file is then also a conda-lock input. Defaults to
+                linux-64 when a lockfile is set.
+            wdir (str): The project directory env_filename is relative to.
         """
 
+        if platforms is None and self.lockfile:
+            platforms = LOCK_PLATFORMS
+
         if filename is not None:
             self.env_filename = filename
 
-        if not os.path.isfile(self.env_filename):
+        env_file = os.path.join(wdir, self.env_filename)
+        if not os.path.isfile(env_file):
             print(f"Creating conda env file at: \t{self.env_filename}")
-            create_directory(self.env_filename)
-            with open(self.env_filename, "w") as file:
+            create_directory(env_file)
+            with open(env_file, "w") as file:
                 file.write("name: " + self.env_name + "\n")
 
                 # channels
@@ -58,69 +143,282 @@ class CondaEnvironment(Builder):
                     file.write("  - " + conda_package + "\n")
 
                 # pip packages
-                file.write("  - pip: \n")
+                if pip_packages:
+                    file.write("  - pip: \n")
                 for pip_package in pip_packages:
                     file.write("    - " + pip_package + "\n")
+
+                # conda-lock platforms
+                if platforms:
+                    file.write("platforms: \n")
+                    for platform in platforms:
+                        file.write("  - " + platform + "\n")
         else:
             print(f"Conda env file exists at: \t{self.env_filename}")
 
 
+def optimize_dockerfile(docker_file: DockerFile, image):
+    """
+    Runs the optimization pass on a Dockerfile if its image asks for it.
+
+    Args:
+        docker_file (DockerFile): The Dockerfile to optimize.
+        image (Image or ImageUser): The image settings.
+
+    Returns:
+        LayerReport: The layer counts, None if the pass did not run.
+    """
+
+    if image.optimize:
+        return docker_file.optimize(
+            no_install_recommends=image.no_install_recommends
+        )
+    return None
+
+
+def print_layer_report(report, filename: str) -> None:
+    if report is not None:
+        print(f"Optimized {os.path.basename(filename)}: \t{report}")
+
+
+@asi
+@dataclass
+class Stages(Builder):
+    enabled: bool = False
+    parallel: bool = False
+    builder: str = "builder"
+    runtime: str = "runtime"
+    runtime_packages: List[str] = field(
+        default_factory=lambda: list(rsrc.docker_file.DEFAULT_RUNTIME_PACKAGES)
+    )
+    builder_instructions: List[str] = field(default_factory=lambda: [])
+    runtime_instructions: List[str] = field(default_factory=lambda: [])
+
+    def add_instructions(self, docker_file: DockerFile) -> None:
+        """
+        Adds the extra instructions of each stage to a multi-stage Dockerfile.
+
+        Args:
+            docker_file (DockerFile): The Dockerfile, with both stages.
+
+        Returns:
+            None
+        """
+
+        for stage, lines in (
+            (self.builder, self.builder_instructions),
+            (self.runtime, self.runtime_instructions),
+        ):
+            if lines:
+                docker_file.add_instruction(
+                    Instructions.from_lines(
+                        lines,
+                        comment=f"EXTRA {stage.upper()} INSTRUCTIONS",
+                        stage=stage,
+                    )
+                )
+
+
+@asi
+@dataclass
+class Wheelhouse(Builder):
+    enabled: bool = False
+    installer: str = "uv"
+    python_version: str = "3.8"
+    requirements_filename: str = f"{CONFIG_DIR}requirements.txt"
+
+    def generate_requirements_file(
+        self, pip_packages=DEFAULT_PIP_PACKAGES, wdir: str = "./"
+    ) -> None:
+        """
+        Creates the requirements file of the wheelhouse if it is missing.
+
+        Args:
+            pip_packages (list): The pip requirements.
+            wdir (str): The project directory requirements_filename is
+                relative to.
+
+        Returns:
+            None
+        """
+
+        requirements_file = os.path.join(wdir, self.requirements_filename)
+        if not os.path.isfile(requirements_file):
+            print(
+                f"Creating requirements file at: \t{self.requirements_filename}"
+            )
+            create_directory(requirements_file)
+            with open(requirements_file, "w") as file:
+                for pip_package in pip_packages:
+                    file.write(pip_package + "\n")
+        else:
+            print(
+                f"Requirements file exists at: \t{self.requirements_filename}"
+            )
+
+
+@asi
+@dataclass
+class CacheExport(Builder):
+    enabled: bool = False
+    type: str = "local"
+    ref: str = ""
+    mode: str = "max"
+    fallback: bool = True
+
+    def resolve_ref(self, image_name: str) -> str:
+        """
+        Returns the cache location, with a default shared by the projects
+        building the same image.
+
+        Args:
+            image_name (str): The root image name.
+
+        Returns:
+            str: The cache directory (local) or image reference (registry).
+        """
+
+        if self.ref:
+            return self.ref
+        if self.type == "registry":
+            return f"localhost:5000/{image_name.lower()}:buildcache"
+        return f"${{HOME}}/.cache/conman/buildx/{image_name.lower()}"
+
+
 @asi
 @dataclass
 class Image(Builder):
     name: str = "<root_image_name>"
     tag: str = "<root_image_tag>"
-    conda_environment: CondaEnvironment = CondaEnvironment()
+    conda_environment: CondaEnvironment = field(
+        default_factory=CondaEnvironment
+    )
     extra_instructions: List[str] = field(default_factory=lambda: [])
     __private_class_lib__: Dict = field(
-        default_factory=lambda: {"conda_environment": CondaEnvironment}
+        default_factory=lambda: {
+            "conda_environment": CondaEnvironment,
+            "stages": Stages,
+            "cache_export": CacheExport,
+            "wheelhouse": Wheelhouse,
+        }
     )
     generate: bool = False
     from_image: Dict[str, str] = field(
         default_factory=lambda: {"name": "ubuntu", "tag": "20.04"}
     )
+    optimize: bool = False
+    no_install_recommends: bool = False
+    buildkit: bool = False
+    stages: Stages = field(default_factory=Stages)
+    cache_export: CacheExport = field(default_factory=CacheExport)
+    wheelhouse: Wheelhouse = field(default_factory=Wheelhouse)
+    _optional_attributes_: List[str] = field(
+        default_factory=lambda: [
+            "optimize",
+            "no_install_recommends",
+            "buildkit",
+            "stages",
+            "cache_export",
+            "wheelhouse",
+        ]
+    )
+
+    def uses_wheelhouse(self) -> bool:
+        return bool(
+            self.wheelhouse and self.wheelhouse.enabled and self.buildkit
+        )
 
     def to_dockerfile(
-        self, filename: str = "Dockerfile", container_engine: str = "Docker"
+        self,
+        filename: str = "Dockerfile",
+        container_engine: str = "Docker",
+        path: str = CONFIG_DIR,
     ) -> str:
         print("--- Build root Dockerfile ---")
-        path = CONFIG_DIR
+        if self.extra_instructions:
+            print("Adding root extra instructions to Dockerfile...")
+        docker_file, report = self.dockerfile()
+        print_layer_report(report, filename)
+
+        cache_options = {}
+        if self.cache_export and self.cache_export.enabled:
+            cache_options = {
+                "cache_type": self.cache_export.type,
+                "cache_ref": self.cache_export.resolve_ref(self.name),
+                "cache_mode": self.cache_export.mode,
+                "fallback": self.cache_export.fallback,
+            }
+
+        docker_file.generate(filename=path+filename).dump_build_script(
+            filename=path + "build_root_img.sh",
+            basename=f"{self.name}:{self.tag}",
+            container_engine=container_engine,
+            **cache_options,
+        )
+
+    def dockerfile(self):
+        """
+        Builds the root Dockerfile in memory, without writing it.
+
+        Returns:
+            tuple: The DockerFile and its LayerReport, None if it was not
+                optimized.
+        """
+
         docker_file = DockerFile(
             img_basename=f"{self.from_image.name}:{self.from_image.tag}",
             conda_environment=self.conda_environment,
-            wdir=path,
+            wdir=CONFIG_DIR,
+            buildkit=self.buildkit,
         )
-        docker_file.default_debian_root_instruction()
+        if self.stages and self.stages.enabled and self.stages.parallel:
+            docker_file.parallel_root_instruction(
+                builder=self.stages.builder, runtime=self.stages.runtime
+            )
+            self.stages.add_instructions(docker_file)
+        elif self.stages and self.stages.enabled:
+            docker_file.multi_stage_root_instruction(
+                builder=self.stages.builder,
+                runtime=self.stages.runtime,
+                runtime_packages=self.stages.runtime_packages,
+            )
+            self.stages.add_instructions(docker_file)
+        else:
+            docker_file.default_debian_root_instruction()
+        if self.wheelhouse and self.wheelhouse.enabled and not self.buildkit:
+            # Without BuildKit the copied wheels would stay in an image layer
+            print("Warning: the wheelhouse requires buildkit, it is skipped")
+        if self.uses_wheelhouse():
+            docker_file.wheelhouse_instruction(
+                requirements_filename=self.wheelhouse.requirements_filename,
+                installer=self.wheelhouse.installer,
+                python_version=self.wheelhouse.python_version,
+            )
+        # Extra root instructions go to the last (runtime) stage
         if self.extra_instructions:
-            print("Adding root extra instructions to Dockerfile...")
             root_instruction = Instructions.from_lines(
                 self.extra_instructions, comment="EXTRA ROOT INSTRUCTIONS"
             )
             docker_file.add_instruction(root_instruction)
 
-        docker_file.generate(filename=path+filename).dump_build_script(
-            filename=path + "build_root_img.sh",
-            basename=f"{self.name}:{self.tag}",
-            container_engine=container_engine,
-        )
+        return docker_file, optimize_dockerfile(docker_file, self)
 
 
 @asi
 @dataclass
 class ImageUser(Builder):
     extra_instructions: List[str] = field(default_factory=lambda: [])
-    __private_root_img__: Image = Image()
+    __private_root_img__: Image = field(default_factory=Image)
+    optimize: bool = False
+    no_install_recommends: bool = False
+    _optional_attributes_: List[str] = field(
+        default_factory=lambda: ["optimize", "no_install_recommends"]
+    )
 
     def to_dockerfile(
         self, filename: str = "Dockerfile", graphical=False
     ) -> str:
         print("--- Build user Dockerfile ---")
-        docker_file = DockerFile(
-            img_basename=f"{self.__private_root_img__.name}:{self.__private_root_img__.tag}",
-            conda_environment=self.__private_root_img__.conda_environment,
-        )
-        docker_file.default_user_instruction(graphical=graphical)
-
         if self.__private_root_img__.conda_environment is not None:
             print("Adding conda environment to Dockerfile...")
         else:
@@ -128,12 +426,37 @@ class ImageUser(Builder):
 
         if self.extra_instructions:
             print("Adding user extra instructions to Dockerfile...")
+        else:
+            print("No extra instructions in user image")
+        docker_file, report = self.dockerfile(graphical=graphical)
+        print_layer_report(report, filename)
+
+        docker_file.generate(filename=filename)
+
+    def dockerfile(self, graphical=False):
+        """
+        Builds the user Dockerfile in memory, without writing it.
+
+        Args:
+            graphical (bool): Enable the X11 forwarding.
+
+        Returns:
+            tuple: The DockerFile and its LayerReport, None if it was not
+                optimized.
+        """
+
+        docker_file = DockerFile(
+            img_basename=f"{self.__private_root_img__.name}:{self.__private_root_img__.tag}",
+            conda_environment=self.__private_root_img__.conda_environment,
+        )
+        docker_file.default_user_instruction(graphical=graphical)
+
+        if self.extra_instructions:
             user_instruction = Instructions.from_lines(
                 self.extra_instructions, comment="EXTRA USER INSTRUCTIONS"
             )
             docker_file.add_instruction(user_instruction)
         else:
-            print("No extra instructions in user image")
             user_instruction = Instructions.from_lines(
                 ["RUN echo 'No user extra instructions'"],
                 comment="EXTRA USER INSTRUCTIONS",
@@ -142,7 +465,7 @@ class ImageUser(Builder):
 
         docker_file.default_user_end_instruction()
 
-        docker_file.generate(filename=filename)
+        return docker_file, optimize_dockerfile(docker_file, self)
 
 
 @asi
@@ -160,9 +483,290 @@ class Graphical(Builder):
 @asi
 @dataclass
 class Gpu(Builder):
+    """
+    GPUs reserved for the container.
+
+    Attributes:
+        manufacturer (str): Only "nvidia" GPUs are reserved.
+        count (int or str): The number of GPUs, or "all".
+        device_ids (list): The indexes or UUIDs of the GPUs to reserve,
+            instead of count. The container sees them through
+            NVIDIA_VISIBLE_DEVICES, numbered in CUDA_DEVICE_ORDER.
+        capabilities (list): The driver capabilities, e.g. compute and
+            utility, "gpu" is always requested.
+        cuda_device_order (str): The CUDA numbering of pinned devices,
+            PCI_BUS_ID matches nvidia-smi.
+        group_by_locality (bool): Pin count GPUs of the host closest to
+            each other (same NUMA node, fewest PCIe hops), instead of
+            letting the engine choose.
+    """
+
     # enabled: bool = False
     manufacturer: str = "nvidia"
-    count: int = 0
+    count: Union[int, str] = 0
+    device_ids: List[str] = field(default_factory=lambda: [])
+    capabilities: List[str] = field(default_factory=lambda: ["gpu"])
+    cuda_device_order: str = "PCI_BUS_ID"
+    group_by_locality: bool = False
+    _optional_attributes_: List[str] = field(
+        default_factory=lambda: [
+            "device_ids",
+            "capabilities",
+            "cuda_device_order",
+            "group_by_locality",
+        ]
+    )
+
+    def is_enabled(self) -> bool:
+        if self.manufacturer != "nvidia":
+            return False
+        # Invalid counts are enabled, and reported by validate
+        return bool(self.device_ids) or str(self.count) not in ("0", "")
+
+    def validate(self) -> None:
+        """
+        Checks the values of the section.
+
+        Raises:
+            ValueError: If a value is invalid.
+        """
+
+        if self.count != "all" and (
+            isinstance(self.count, bool) or not str(self.count).isdigit()
+        ):
+            raise ValueError(
+                f"Invalid gpu count: {self.count}, expected an integer or all"
+            )
+        if self.device_ids and self.count not in (0, "0"):
+            raise ValueError("gpu count and device_ids are exclusive")
+        if len(set(map(str, self.device_ids))) != len(self.device_ids):
+            raise ValueError(f"Duplicate gpu device_ids: {self.device_ids}")
+        unknown = set(self.capabilities) - set(GPU_CAPABILITIES)
+        if unknown:
+            raise ValueError(
+                f"Unknown gpu capabilities: {sorted(unknown)}, expected "
+                f"some of {GPU_CAPABILITIES}"
+            )
+        if self.cuda_device_order not in CUDA_DEVICE_ORDERS:
+            raise ValueError(
+                f"Unknown cuda_device_order: {self.cuda_device_order}, "
+                f"expected one of {CUDA_DEVICE_ORDERS}"
+            )
+
+    def resolve_device_ids(self) -> List[str]:
+        """
+        Returns the ids of the GPUs the container gets, empty when the
+        engine chooses them.
+        """
+
+        if self.device_ids:
+            return [str(device_id) for device_id in self.device_ids]
+        if not self.group_by_locality or self.count == "all":
+            return []
+        if int(self.count) < 2:
+            return []
+        try:
+            gpus = select_gpus(get_host_facts().gpus(), int(self.count))
+        except ValueError as e:
+            print(f"Warning: {e}, the engine chooses the GPUs")
+            return []
+        print(f"-> GPUs grouped by locality: {[gpu.bus_id for gpu in gpus]}")
+        return [str(gpu.index) for gpu in gpus]
+
+    def add_to_service(self, service) -> List[str]:
+        """
+        Validates the section and reserves the GPUs for a compose service.
+
+        Args:
+            service (Service): The compose service.
+
+        Returns:
+            list: The ids of the GPUs pinned to the service, empty when the
+                engine chooses them.
+        """
+
+        self.validate()
+        # The engine only selects the nvidia driver with the gpu capability
+        capabilities = ["gpu"] + [
+            capability
+            for capability in self.capabilities
+            if capability != "gpu"
+        ]
+        device_ids = self.resolve_device_ids()
+        service.deploy.activate_gpu(
+            driver=self.manufacturer,
+            count=self.count,
+            capabilities=capabilities,
+            device_ids=device_ids,
+        )
+        if device_ids:
+            service.add_environment(
+                "NVIDIA_VISIBLE_DEVICES", ",".join(device_ids)
+            )
+            service.add_environment(
+                "CUDA_DEVICE_ORDER", self.cuda_device_order
+            )
+        return device_ids
+
+
+@asi
+@dataclass
+class Resources(Builder):
+    """
+    Resources of the container service, empty values are left to the engine.
+
+    Attributes:
+        cpus (float): The number of CPUs, 0 for no limit.
+        cpuset (str): The CPUs the container may run on, e.g. "0-3,8".
+        mem_limit (str): The memory limit, e.g. "8g".
+        memswap_limit (str): The memory plus swap limit, at least mem_limit,
+            -1 for unlimited swap.
+        shm_size (str): The size of /dev/shm, e.g. "8g" for the PyTorch
+            DataLoader workers.
+        ipc (str): The IPC namespace mode, one of IPC_MODES or
+            "service:<name>"/"container:<name>".
+        ulimits (dict): The ulimits by name, e.g. nofile or memlock, as a
+            single value or a soft/hard mapping.
+        deploy_limits (bool): Write cpus and mem_limit under
+            deploy.resources.limits instead of the service keys.
+        placement (str): "numa" sets the cpuset to the CPUs of a single NUMA
+            node: numa_node, else the node of the pinned GPUs, else a node
+            chosen from the project name.
+        numa_node (int): The NUMA node of the "numa" placement, -1 to
+            choose one.
+    """
+
+    cpus: float = 0
+    cpuset: str = ""
+    mem_limit: str = ""
+    memswap_limit: str = ""
+    shm_size: str = ""
+    ipc: str = ""
+    ulimits: Dict[str, Any] = field(default_factory=lambda: {})
+    deploy_limits: bool = False
+    placement: str = ""
+    numa_node: int = -1
+
+    def ulimits_dict(self) -> Dict[str, Any]:
+        """
+        Returns the ulimits as plain dictionaries, the config loader turns
+        mappings into Builder instances.
+        """
+
+        if isinstance(self.ulimits, Builder):
+            return self.ulimits.to_dict()
+        return dict(self.ulimits or {})
+
+    def validate(self) -> None:
+        """
+        Checks the values of the section.
+
+        Raises:
+            ValueError: If a value is invalid.
+        """
+
+        if float(self.cpus) < 0:
+            raise ValueError(f"Invalid cpus: {self.cpus}, expected >= 0")
+        if self.cpuset and not CPUSET.match(str(self.cpuset)):
+            raise ValueError(
+                f"Invalid cpuset: {self.cpuset}, expected e.g. 0-3,8"
+            )
+        for name in ("mem_limit", "shm_size"):
+            if getattr(self, name):
+                parse_size(getattr(self, name))
+        if self.memswap_limit and str(self.memswap_limit) != "-1":
+            if not self.mem_limit:
+                raise ValueError("memswap_limit requires mem_limit")
+            if parse_size(self.memswap_limit) < parse_size(self.mem_limit):
+                raise ValueError(
+                    f"memswap_limit {self.memswap_limit} is smaller than "
+                    f"mem_limit {self.mem_limit}"
+                )
+        if self.ipc and not (
+            self.ipc in IPC_MODES
+            or self.ipc.startswith(("service:", "container:"))
+        ):
+            raise ValueError(
+                f"Unknown ipc mode: {self.ipc}, expected one of {IPC_MODES}"
+            )
+        if self.placement not in PLACEMENTS:
+            raise ValueError(
+                f"Unknown placement: {self.placement}, expected one of "
+                f"{PLACEMENTS}"
+            )
+        if self.placement == "numa" and self.cpuset:
+            raise ValueError("cpuset and the numa placement are exclusive")
+        if self.ipc == "host" and self.shm_size:
+            print("Warning: shm_size is ignored with ipc: host")
+        for name, value in self.ulimits_dict().items():
+            if name not in ULIMIT_NAMES:
+                raise ValueError(f"Unknown ulimit: {name}")
+            if isinstance(value, dict):
+                soft, hard = value.get("soft"), value.get("hard")
+                if not isinstance(soft, int) or not isinstance(hard, int):
+                    raise ValueError(
+                        f"ulimit {name} expects integer soft and hard values"
+                    )
+                if hard != -1 and (soft == -1 or soft > hard):
+                    raise ValueError(
+                        f"ulimit {name}: soft {soft} is above hard {hard}"
+                    )
+            elif not isinstance(value, int):
+                raise ValueError(f"ulimit {name} expects an integer value")
+
+    def plan_cpuset(self, gpu_device_ids: List[str], key: str) -> str:
+        """
+        Returns the CPUs of the NUMA node chosen for the service.
+
+        Args:
+            gpu_device_ids (list): The ids of the GPUs pinned to the service.
+            key (str): A stable name of the service, e.g. its project name.
+
+        Returns:
+            str: The cpuset.
+        """
+
+        facts = get_host_facts()
+        gpus = pinned_gpus(facts.gpus(), gpu_device_ids)
+        node, cpuset = plan_numa_placement(
+            facts.numa_nodes(), gpus=gpus, key=key, node=int(self.numa_node)
+        )
+        print(f"-> NUMA node {node}: cpuset {cpuset}")
+        return cpuset
+
+    def add_to_service(
+        self, service, gpu_device_ids: List[str] = (), key: str = ""
+    ) -> None:
+        """
+        Validates the section and sets it on a compose service.
+
+        Args:
+            service (Service): The compose service.
+            gpu_device_ids (list): The ids of the GPUs pinned to the service,
+                the numa placement keeps the service on their node.
+            key (str): A stable name of the service, e.g. its project name.
+
+        Returns:
+            None
+        """
+
+        self.validate()
+        cpuset = str(self.cpuset)
+        if self.placement == "numa":
+            cpuset = self.plan_cpuset(list(gpu_device_ids), key)
+        cpus, mem_limit = self.cpus, self.mem_limit
+        if self.deploy_limits:
+            service.deploy.activate_limits(cpus=cpus, memory=mem_limit)
+            cpus, mem_limit = 0, ""
+        service.activate_resources(
+            cpus=cpus,
+            cpuset=cpuset,
+            mem_limit=mem_limit,
+            memswap_limit=self.memswap_limit,
+            shm_size=self.shm_size,
+            ipc=self.ipc,
+            ulimits=self.ulimits_dict(),
+        )
 
 
 @asi
@@ -170,20 +774,25 @@ class Gpu(Builder):
 class Container(Builder):
     # _engine_name =
     engine: str = "docker"
-    compose: DockerCompose = DockerCompose()
-    devcontainer: Optional[DevContainer] = DevContainer()
-    graphical: Graphical = Graphical()
-    gpu: Gpu = Gpu()
+    compose: DockerCompose = field(default_factory=DockerCompose)
+    devcontainer: Optional[DevContainer] = field(default_factory=DevContainer)
+    graphical: Graphical = field(default_factory=Graphical)
+    gpu: Gpu = field(default_factory=Gpu)
+    resources: Resources = field(default_factory=Resources)
 
     __private_class_lib__: Dict = field(
         default_factory=lambda: {
             "gpu": Gpu,
+            "resources": Resources,
             "graphical": Graphical,
             "devcontainer": DevContainer,
             "conda_environment": CondaEnvironment,
             "compose": DockerCompose,
         }
     )
+    _optional_attributes_: List[str] = field(
+        default_factory=lambda: ["resources"]
+    )
 
     def __post_init__(self):
         if self.devcontainer is not None:
@@ -191,6 +800,21 @@ class Container(Builder):
             self.devcontainer.name = self.compose._container_name
             self.devcontainer.dockerComposeFile = self.compose.filename
 
+    def resolve_names(self, workdir: str) -> None:
+        """
+        Names the compose project and the container after the project.
+
+        Args:
+            workdir (str): The project directory.
+
+        Returns:
+            None
+        """
+
+        self.compose.resolve_names(workdir)
+        if self.devcontainer is not None:
+            self.devcontainer.name = self.compose._container_name
+
 
 @asi
 @dataclass
@@ -207,8 +831,8 @@ class UserSettings(Builder):
 @asi
 @dataclass
 class Images(Builder):
-    root: Image = Image()
-    user: ImageUser = ImageUser(__private_root_img__=root)
+    root: Image = field(default_factory=Image)
+    user: ImageUser = field(default_factory=ImageUser)
     __private_class_lib__: Dict = field(
         default_factory=lambda: {
             "root": Image,
@@ -216,12 +840,15 @@ class Images(Builder):
         }
     )
 
+    def __post_init__(self):
+        self.user.__private_root_img__ = self.root
+
 
 @asi
 @dataclass
 class Config(Builder):
-    images: Images = Images()
-    container: Container = Container()
+    images: Images = field(default_factory=Images)
+    container: Container = field(default_factory=Container)
     __private_class_lib__: Dict = field(
         default_factory=lambda: {
             "images": Images,
@@ -243,7 +870,7 @@ class Config(Builder):
             "rm_none": False,
         }
     )
-    _workdir: str = os.getcwd() + "/"
+    _workdir: str = field(default_factory=lambda: os.getcwd() + "/")
 
     def __post_init__(self):
         self._check_images()
@@ -258,30 +885,11 @@ class Config(Builder):
     ) -> None:
         dic = utils.load_yml_file(yml_filename=filename)
 
-        instance = cls.from_dic(dic)
+        instance = cls.from_dic(dic, prune=True)
         instance.__private_yml_dic = dic
 
-        for key in dic:
-            if hasattr(instance, key):
-                attr = getattr(instance, key)
-                attr = Config.deletion(obj=attr, dic=dic[key])
-                setattr(instance, key, attr)
-
         return instance
 
-    @staticmethod
-    def deletion(obj, dic):
-        attrs = []
-        for attr in obj.__dict__.keys():
-            if attr not in dic and not attr.startswith("__"):
-                attrs.append(attr)
-
-        for attr in attrs:
-            print(f"Deleting {attr} from {obj.__class__.__name__}")
-            setattr(obj, attr, None)
-
-        return obj
-
     def dump_conman_config_file(
         self,
         filename: Path = ".conman-config.yml",
@@ -297,42 +905,249 @@ class Config(Builder):
             filename=filename, preambule=config_msg, **self._dump_options
         )
 
-    def run_building(self) -> None:
+    def run_building(
+        self, use_cache: bool = True, workdir: Optional[str] = None
+    ) -> bool:
+        """
+        Generates every file of the project.
+
+        Args:
+            use_cache (bool): If False, regenerate unchanged files too.
+            workdir (str, optional): The project directory, defaults to the
+                current directory.
+
+        Returns:
+            bool: True if the build succeeded.
+        """
+
         try:
             print("Building...")
-            self.wdir = os.getcwd() + "/"
-            self.build_devcontainer()
-            self.build_dockercompose_file()
-            self.build_dockerfile_user()
-            self.build_dockerfile_root()
+            wdir = utils.project_directory(workdir)
+            with project_lock(wdir):
+                self.wdir = wdir
+                self.container.resolve_names(wdir)
+                self.open_build_cache(use_cache=use_cache)
+                self.build_devcontainer()
+                self.build_dockercompose_file()
+                self.build_dockerfile_user()
+                self.build_dockerfile_root()
+                self._build_cache.record_snapshot(
+                    CONFIG_FILE,
+                    [
+                        output
+                        for outputs, _ in self.step_artifacts(wdir).values()
+                        for output in outputs
+                    ],
+                )
+                self.close_build_cache()
             print("Project Building done successfully")
+            return True
         except Exception as e:
             print("Project Building failed")
             logging.exception(e)
+            return False
+
+    def open_build_cache(self, use_cache: bool = True) -> None:
+        """
+        Loads the build manifest and the persisted host facts of the project
+        in self.wdir.
+
+        Args:
+            use_cache (bool): If False, every step is regenerated and host
+                facts are probed again, but both files are still updated.
+
+        Returns:
+            None
+        """
+
+        self._build_cache = BuildCache.load(workdir=self.wdir)
+        self._use_cache = use_cache
+        get_host_facts().attach(
+            os.path.join(self.wdir, HOST_FACTS_FILE), use_persisted=use_cache
+        )
+
+    def close_build_cache(self) -> None:
+        if getattr(self, "_build_cache", None) is not None:
+            self._build_cache.save()
+            self._build_cache = None
+            get_host_facts().save()
+
+    def config_section(self, path: str) -> Any:
+        """
+        Returns a section of the loaded config file from its dotted path.
+
+        Args:
+            path (str): The section path, e.g. "container.compose".
+
+        Returns:
+            Any: The section, None if it is missing.
+        """
+
+        section = self.__private_yml_dic
+        for key in path.split("."):
+            if not isinstance(section, dict):
+                return None
+            section = section.get(key)
+        return section
+
+    def step_inputs(self, step: str) -> Dict:
+        """
+        Returns the data a build step depends on.
+
+        Args:
+            step (str): The step name, a key of BUILD_STEPS.
+
+        Returns:
+            dict: Config sections, host facts, compose names and conman
+                version.
+        """
+
+        inputs = {
+            path: self.config_section(path) for path in BUILD_STEPS[step]
+        }
+        inputs["host"] = {**get_user_id_data(), "DISPLAY": get_display()}
+        # Names hash the project path, so a copied project is regenerated
+        inputs["names"] = [
+            self.container.compose._project_name,
+            self.container.compose._container_name,
+        ]
+        inputs["version"] = get_version()
+        # Placements depend on the host topology
+        gpu, resources = self.container.gpu, self.container.resources
+        numa = resources is not None and resources.placement == "numa"
+        if "container.gpu" in BUILD_STEPS[step]:
+            if numa or (gpu is not None and gpu.group_by_locality):
+                inputs["gpus"] = get_host_facts().get("gpus")
+            if numa:
+                inputs["numa_nodes"] = get_host_facts().get("numa_nodes")
+        return inputs
+
+    def cached_step(self, step: str, outputs: List[str], generate) -> bool:
+        """
+        Runs a build step through the build cache when it is open.
+
+        Args:
+            step (str): The step name, a key of BUILD_STEPS.
+            outputs (list): The files generated by the step.
+            generate (Callable): Generates the outputs.
+
+        Returns:
+            bool: True if the step ran, False if it was skipped.
+        """
+
+        cache = getattr(self, "_build_cache", None)
+        if cache is None or not hasattr(self, "_Config__private_yml_dic"):
+            generate()
+            return True
+
+        return cache.run(
+            step,
+            self.step_inputs(step),
+            outputs,
+            generate,
+            use_cache=self._use_cache,
+        )
+
+    def step_artifacts(
+        self, wdir: str, x_access: bool = True
+    ) -> Dict[str, Tuple[List[str], Callable]]:
+        """
+        Returns the files each build step generates, and the function
+        generating them.
+
+        Args:
+            wdir (str): The project directory.
+            x_access (bool): Grant the X11 access on the host when generating
+                the compose file.
+
+        Returns:
+            dict: The outputs and generate function of each step, by step
+                name (a key of BUILD_STEPS).
+        """
+
+        steps = {}
+        config_dir = f"{wdir}{CONFIG_DIRNAME}/"
+        if self.container.devcontainer is not None:
+            wdir += ".devcontainer/"
+            devcontainer_file = f"{wdir}devcontainer.json"
+            env_file = f"{os.path.abspath(os.path.join(wdir, os.pardir))}/.env"
+
+            def generate_devcontainer():
+                print("Creating devcontainer.json file...")
+                # create devcontainer.json file
+                self.container.devcontainer.dump_devcontainerjson_file(
+                    filename=devcontainer_file
+                )
+                self.container.devcontainer.dump_envFile(
+                    username=get_user_id_data()["USER_NAME"],
+                    filename=env_file,
+                    project_name=self.container.compose._project_name,
+                )
+
+            steps["devcontainer"] = (
+                [devcontainer_file, env_file],
+                generate_devcontainer,
+            )
+
+        compose_file = f"{wdir}{self.container.compose.filename}"
+        steps["dockercompose"] = (
+            [compose_file],
+            lambda: self.generate_dockercompose_file(
+                compose_file, x_access=x_access
+            ),
+        )
+
+        dockerfile = f"{wdir}Dockerfile.user"
+        steps["dockerfile_user"] = (
+            [dockerfile],
+            lambda: self.images.user.to_dockerfile(
+                filename=dockerfile,
+                graphical=self.x11_forwarding(),
+            ),
+        )
+
+        if self.images.root.generate:
+            steps["dockerfile_root"] = (
+                [
+                    f"{config_dir}Dockerfile.root",
+                    f"{config_dir}build_root_img.sh",
+                ],
+                lambda: self.images.root.to_dockerfile(
+                    filename=f"Dockerfile.root",
+                    container_engine=self.container.engine,
+                    path=config_dir,
+                ),
+            )
+        return steps
 
     def build_devcontainer(self) -> None:
         if self.container.devcontainer is not None:
-            self.wdir += ".devcontainer/"
             # make directory .devcontainer if not exists
-            if not os.path.isdir(".devcontainer"):
-                os.mkdir(".devcontainer")
+            if not os.path.isdir(f"{self.wdir}.devcontainer"):
+                os.mkdir(f"{self.wdir}.devcontainer")
                 print("Directory .devcontainer created")
 
-            print("Creating devcontainer.json file...")
-            # create devcontainer.json file
-            self.container.devcontainer.dump_devcontainerjson_file(
-                filename=f"{self.wdir}devcontainer.json"
-            )
-            self.container.devcontainer.dump_envFile(
-                username=get_user_id_data()["USER_NAME"],
-                filename=f"{os.path.abspath(os.path.join(self.wdir, os.pardir))}/.env",
-            )
-            self.container.devcontainer.dump_optionals_scripts()
+            outputs, generate = self.step_artifacts(self.wdir)["devcontainer"]
+            self.cached_step("devcontainer", outputs, generate)
+            self.container.devcontainer.dump_optionals_scripts(wdir=self.wdir)
 
         else:
             print("No devcontainer section in config file")
 
-    def build_dockercompose_file(self) -> None:
+    def generate_dockercompose_file(
+        self, compose_file: str, x_access: bool = True
+    ) -> None:
+        """
+        Writes the compose file of the project.
+
+        Args:
+            compose_file (str): The compose file path.
+            x_access (bool): Grant the X11 access on the host.
+
+        Returns:
+            None
+        """
+
         # Add main_container service
         self.container.compose._docker_compose_file.add_service(
             service_name=self.container.compose.service_name,
@@ -347,17 +1162,25 @@ class Config(Builder):
         # Options management (adding args  eventually to the service)
         # Graphical forwarding
         if self.container.graphical is not None:
-            target_service.activate_display()
+            target_service.activate_display(x_access=x_access)
         # Volume mounting
         target_service.appending_volumes(self.container.compose.volumes)
 
         # Gpu enabling
+        gpu_device_ids = []
         if self.container.gpu is not None:
-            if (
-                self.container.gpu.count > 0
-                and self.container.gpu.manufacturer == "nvidia"
-            ):
-                target_service.deploy.activate_gpu()
+            if self.container.gpu.is_enabled():
+                gpu_device_ids = self.container.gpu.add_to_service(
+                    target_service
+                )
+
+        # Resource limits and placement
+        if self.container.resources is not None:
+            self.container.resources.add_to_service(
+                target_service,
+                gpu_device_ids=gpu_device_ids,
+                key=self.container.compose._project_name,
+            )
 
         # Conda enabling
         if self.images.root.conda_environment is not None:
@@ -367,39 +1190,68 @@ class Config(Builder):
 
         # create docker-compose.yml file
         self.container.compose._docker_compose_file.dump_to_yml(
-            filename=f"{self.wdir}{self.container.compose.filename}",
+            filename=compose_file,
             rm_private=True,
         )
 
-    def build_dockerfile_user(self) -> None:
-        def _check_graphical():
+    def build_dockercompose_file(self) -> None:
+        outputs, generate = self.step_artifacts(self.wdir)["dockercompose"]
+        if not self.cached_step("dockercompose", outputs, generate):
+            # X11 access is granted on the host at each build
             if self.container.graphical is not None:
-                if self.container.graphical.protocol == "x11":
-                    return True
-            else:
-                return False
+                x_access()
+
+    def x11_forwarding(self) -> bool:
+        """
+        Checks if the user image forwards the X11 display.
+        """
+
+        graphical = self.container.graphical
+        return graphical is not None and graphical.protocol == "x11"
 
+    def build_dockerfile_user(self) -> None:
         # create Dockerfile.user file
-        self.images.user.to_dockerfile(
-            filename=f"{self.wdir}Dockerfile.user",
-            graphical=_check_graphical(),
-        )
+        outputs, generate = self.step_artifacts(self.wdir)["dockerfile_user"]
+        self.cached_step("dockerfile_user", outputs, generate)
 
     def build_dockerfile_root(self) -> None:
         # create Dockerfile.root file
         if self.images.root.generate:
-            self.images.root.to_dockerfile(
-                filename=f"Dockerfile.root",
-                container_engine=self.container.engine,
-            )
+            outputs, generate = self.step_artifacts(self.wdir)[
+                "dockerfile_root"
+            ]
+            self.cached_step("dockerfile_root", outputs, generate)
+
+            root = self.images.root
+            if root.uses_wheelhouse():
+                # The pip packages are installed from the wheelhouse
+                if root.conda_environment is not None:
+                    root.conda_environment.generate_environment_file(
+                        pip_packages=[], wdir=self.wdir
+                    )
+                root.wheelhouse.generate_requirements_file(wdir=self.wdir)
+            else:
+                root.conda_environment.generate_environment_file(
+                    wdir=self.wdir
+                )
 
-            self.images.root.conda_environment.generate_environment_file()
 
+def build(
+    no_cache: bool = False,
+    projects: Optional[str] = None,
+    jobs: Optional[int] = None,
+) -> int:
+    if projects is not None:
+        from conman.fleet import build_projects, find_projects, print_summary
+
+        results = build_projects(
+            find_projects(projects), jobs=jobs, no_cache=no_cache
+        )
+        print_summary(results)
+        return 0 if all(result.ok for result in results) else 1
 
-def build() -> int:
     config = Config().load_conman_config_file(filename=CONFIG_FILE)
-    config.run_building()
-    return 0
+    return 0 if config.run_building(use_cache=not no_cache) else 1
 
 
 if __name__ == "__main__":
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from conman import utils
 from conman.constants import CONFIG_FILE
+from conman.io import project_lock
 from conman.commands.build import Config
 import os
 
@@ -9,9 +10,10 @@ import os
 def dump_conman_config_file(optional) -> None:
     config = Config()
     config._dump_options["rm_optional"] = not optional
-    config.dump_conman_config_file(
-        filename=CONFIG_FILE,
-    )
+    with project_lock():
+        config.dump_conman_config_file(
+            filename=CONFIG_FILE,
+        )
 
 
 def init(force=False, optional=False) -> int:
@@ -0,0 +1,65 @@
+from __future__ import annotations
+from typing import Optional
+from conman.constants import *
+from conman.commands.build import Config
+from conman.ressources.docker_file_linter import (
+    RULES,
+    SEVERITIES,
+    exceeds_threshold,
+    lint_dockerfile,
+)
+
+
+def lint(fail_on: str = "high", ignore: Optional[str] = None) -> int:
+    """
+    Lints the Dockerfiles of the project for cache-unfriendly patterns.
+
+    The Dockerfiles are built in memory from the config file, nothing is
+    written.
+
+    Args:
+        fail_on (str): Exit with 1 if a finding is at least this severe,
+            one of SEVERITIES or "never".
+        ignore (str, optional): Comma separated rule ids to skip.
+
+    Returns:
+        int: The exit code.
+    """
+
+    ignored = {
+        rule.strip() for rule in (ignore or "").split(",") if rule.strip()
+    }
+    unknown = ignored - set(RULES)
+    if unknown:
+        print(f"Unknown rules: {', '.join(sorted(unknown))}")
+        return 2
+
+    config = Config().load_conman_config_file(filename=CONFIG_FILE)
+
+    docker_files = {}
+    if config.images.root.generate:
+        docker_files["Dockerfile.root"] = config.images.root.dockerfile()[0]
+    docker_files["Dockerfile.user"] = config.images.user.dockerfile(
+        graphical=config.x11_forwarding()
+    )[0]
+
+    findings = []
+    for name, docker_file in docker_files.items():
+        file_findings = lint_dockerfile(docker_file, ignore=ignored)
+        for finding in file_findings:
+            print(f"{name}:{finding}")
+        findings.extend(file_findings)
+
+    counts = ", ".join(
+        f"{sum(f.severity == severity for f in findings)} {severity}"
+        for severity in reversed(SEVERITIES)
+    )
+    print(f"{len(findings)} findings: {counts}")
+
+    if fail_on != "never" and exceeds_threshold(findings, fail_on):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(lint())
@@ -1,8 +1,112 @@
 from __future__ import annotations
 
+import contextlib
+import io
 import os.path
+from typing import List, Tuple
+
+from conman.cache import BuildCache, hash_content, hash_file
+from conman.constants import *
+
+# The build modules (and yaml) are only imported when the snapshot of the
+# last build is out of date, loading them takes most of the run time
+
+STATES = ("up to date", "stale", "missing", "hand-edited")
+
+
+def artifact_states(config, workdir: str) -> List[Tuple[str, str]]:
+    """
+    Compares the generated files of a project with the config file.
+
+    Files whose step inputs and on-disk hashes match the build manifest are
+    up to date without rendering. The others are rendered in memory: a file
+    differing from its rendering is stale if it holds content conman
+    generated before, hand-edited otherwise. Nothing is written.
+
+    Args:
+        config (Config): The loaded config file.
+        workdir (str): The project directory, ending with "/".
+
+    Returns:
+        list: The (path relative to workdir, state) of each file, the state
+            being one of STATES.
+    """
+
+    from conman.host import HOST_FACTS_FILE, get_host_facts
+    from conman.io import capture_artifacts
+
+    cache = BuildCache.load(workdir=workdir)
+    get_host_facts().attach(os.path.join(workdir, HOST_FACTS_FILE))
+    config.container.resolve_names(workdir)
+
+    states = []
+    steps = config.step_artifacts(workdir, x_access=False)
+    for step, (outputs, generate) in steps.items():
+        if cache.is_fresh(step, config.step_inputs(step), outputs):
+            states.extend((output, "up to date") for output in outputs)
+            continue
+
+        with capture_artifacts() as rendered:
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate()
+
+        for output in outputs:
+            current = hash_file(output)
+            if current is None:
+                state = "missing"
+            elif current == hash_content(rendered[os.path.abspath(output)]):
+                state = "up to date"
+            elif current in cache.known_hashes(output):
+                state = "stale"
+            else:
+                state = "hand-edited"
+            states.append((output, state))
+
+    return [
+        (os.path.relpath(os.path.abspath(output), workdir), state)
+        for output, state in states
+    ]
 
 
 def status() -> int:
-    print("status() function executed !")
-    return 0
+    """
+    Reports the generated files that are out of date with the config file.
+
+    While the snapshot of the last build matches, the config file is not
+    even loaded.
+
+    Returns:
+        int: 0 if every file is up to date, 1 otherwise, 2 without config
+            file.
+    """
+
+    if not os.path.isfile(CONFIG_FILE):
+        print(f"No config file found at {CONFIG_FILE}, run conman init")
+        return 2
+
+    snapshot = BuildCache.load().snapshot_outputs(CONFIG_FILE)
+    if snapshot is not None:
+        states = [(path, "up to date") for path in snapshot]
+    else:
+        from conman.commands.build import Config
+        from conman.utils import project_directory
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            config = Config.load_conman_config_file(filename=CONFIG_FILE)
+        states = artifact_states(config, project_directory())
+
+    width = max(len(state) for state in STATES)
+    for path, state in states:
+        print(f"{state:<{width}}  {path}")
+
+    counts = ", ".join(
+        f"{sum(s == state for _, s in states)} {state}"
+        for state in STATES
+        if any(s == state for _, s in states)
+    )
+    print(f"{len(states)} files: {counts}")
+    return 0 if all(state == "up to date" for _, state in states) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(status())
@@ -1,6 +1,7 @@
 import os 
 import logging
 from conman.constants import CONFIG_FILE
+from conman.io import project_lock
 from conman.commands.build import Config as Config_build
 
 
@@ -10,14 +11,18 @@ class Config(Config_build):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
     
-    def update_build(self):
+    def update_build(self, use_cache=True):
         """Update the conman build"""
         try:
             print("Updating conman build...")
             self.wdir = os.getcwd() + "/"
-            self.build_devcontainer()
-            self.build_dockercompose_file()
-            self.build_dockerfile_user()
+            with project_lock(self.wdir):
+                self.container.resolve_names(self.wdir)
+                self.open_build_cache(use_cache=use_cache)
+                self.build_devcontainer()
+                self.build_dockercompose_file()
+                self.build_dockerfile_user()
+                self.close_build_cache()
         except Exception as e:
             print("Project update failed")
             logging.exception(e)
@@ -26,8 +31,8 @@ class Config(Config_build):
         
 
 
-def update():
+def update(no_cache=False):
     """Update the conman build"""
     
     config = Config().load_conman_config_file(filename=CONFIG_FILE)
-    config.update_build()
\ No newline at end of file
+    config.update_build(use_cache=not no_cache)
\ No newline at end of file
@@ -1,9 +1,77 @@
 from __future__ import annotations
-import importlib.metadata
+
+import os
+import sys
 
 
 CONFIG_DIRNAME = ".conman"
 CONFIG_DIR = f"./{CONFIG_DIRNAME}/"
 CONFIG_FILE = CONFIG_DIR + "conman-config.yml"
 
-VERSION = importlib.metadata.version("conman-tool")
+DISTRIBUTION_NAME = "conman-tool"
+
+_version = None
+
+
+def _read_dist_info_version(distribution: str) -> str:
+    """
+    Reads the version from the .dist-info directory found on sys.path.
+
+    This avoids importing importlib.metadata (and email) for --version.
+
+    Args:
+        distribution (str): The distribution name.
+
+    Returns:
+        str: The version, None if no installed metadata was found.
+    """
+
+    prefix = distribution.replace("-", "_") + "-"
+    for path in sys.path:
+        try:
+            entries = list(os.scandir(path or "."))
+        except OSError:
+            continue
+        for entry in entries:
+            if not (
+                entry.name.startswith(prefix)
+                and entry.name.endswith(".dist-info")
+            ):
+                continue
+            try:
+                with open(os.path.join(entry.path, "METADATA")) as f:
+                    for line in f:
+                        if line.startswith("Version:"):
+                            return line.split(":", 1)[1].strip()
+                        if not line.strip():
+                            break
+            except OSError:
+                continue
+    return None
+
+
+def get_version() -> str:
+    """
+    Returns the installed conman version.
+
+    The package metadata lookup is slow, so it is done on first use only.
+
+    Returns:
+        str: The version string.
+    """
+
+    global _version
+    if _version is None:
+        _version = _read_dist_info_version(DISTRIBUTION_NAME)
+    if _version is None:
+        import importlib.metadata
+
+        _version = importlib.metadata.version(DISTRIBUTION_NAME)
+    return _version
+
+
+def __getattr__(name):
+    # VERSION is kept as a lazy module attribute for backward compatibility
+    if name == "VERSION":
+        return get_version()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
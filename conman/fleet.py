@@ -0,0 +1,177 @@
+"""
+Fleet mode: build many conman projects in parallel from one process.
+
+Each project is built in a worker process, from its own directory, with its
+output captured. A failing project does not stop the others.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import glob
+import io
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+from conman.constants import CONFIG_DIRNAME, CONFIG_FILE
+
+CONFIG_FILENAME = os.path.basename(CONFIG_FILE)
+
+
+@dataclass
+class ProjectResult:
+    """
+    Outcome of the build of one project.
+
+    Attributes:
+        project (str): The project directory.
+        ok (bool): True if the build succeeded.
+        duration (float): Build duration in seconds.
+        log (str): Everything the build printed.
+        error (str): The traceback of the failure, if any.
+    """
+
+    project: str
+    ok: bool
+    duration: float = 0.0
+    log: str = ""
+    error: Optional[str] = None
+
+
+def find_projects(pattern: str) -> List[str]:
+    """
+    Finds the conman projects matching a glob pattern.
+
+    The pattern can match project directories or their config files, and
+    supports "**" for recursive matching.
+
+    Args:
+        pattern (str): The glob pattern.
+
+    Returns:
+        list: The sorted absolute paths of the project directories.
+    """
+
+    projects = set()
+    for path in glob.glob(pattern, recursive=True):
+        path = os.path.abspath(path)
+        if os.path.basename(path) == CONFIG_FILENAME:
+            path = os.path.dirname(os.path.dirname(path))
+        elif os.path.basename(path) == CONFIG_DIRNAME:
+            path = os.path.dirname(path)
+
+        if os.path.isfile(os.path.join(path, CONFIG_FILE)):
+            projects.add(path)
+
+    return sorted(projects)
+
+
+def build_project(project: str, no_cache: bool = False) -> ProjectResult:
+    """
+    Builds one project from its directory, capturing its output.
+
+    Args:
+        project (str): The project directory.
+        no_cache (bool): If True, regenerate unchanged files too.
+
+    Returns:
+        ProjectResult: The outcome of the build.
+    """
+
+    from conman.commands.build import Config
+
+    start = time.perf_counter()
+    log = io.StringIO()
+    ok, error = False, None
+    try:
+        with contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+            config = Config.load_conman_config_file(
+                filename=os.path.join(project, CONFIG_FILE)
+            )
+            ok = config.run_building(use_cache=not no_cache, workdir=project)
+        if not ok:
+            error = "Project Building failed"
+    except Exception:
+        error = traceback.format_exc()
+
+    return ProjectResult(
+        project=project,
+        ok=ok,
+        duration=time.perf_counter() - start,
+        log=log.getvalue(),
+        error=error,
+    )
+
+
+def build_projects(
+    projects: Iterable[str],
+    jobs: Optional[int] = None,
+    no_cache: bool = False,
+) -> List[ProjectResult]:
+    """
+    Builds projects in parallel over a process pool.
+
+    Args:
+        projects (Iterable[str]): The project directories.
+        jobs (int, optional): Number of worker processes, defaults to the
+            number of CPUs.
+        no_cache (bool): If True, regenerate unchanged files too.
+
+    Returns:
+        list: One ProjectResult per project, in the order given.
+    """
+
+    projects = list(projects)
+    results = {}
+    if not projects:
+        return []
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(build_project, project, no_cache): project
+            for project in projects
+        }
+        for future in as_completed(futures):
+            project = futures[future]
+            try:
+                results[project] = future.result()
+            except Exception:
+                # The worker itself died, only this project is reported
+                results[project] = ProjectResult(
+                    project=project, ok=False, error=traceback.format_exc()
+                )
+
+    return [results[project] for project in projects]
+
+
+def print_summary(results: List[ProjectResult]) -> None:
+    """
+    Prints one line per project and the failures.
+
+    Args:
+        results (list): The ProjectResult of each project.
+
+    Returns:
+        None
+    """
+
+    for result in results:
+        status = "ok" if result.ok else "FAILED"
+        print(f"{status:>6} {result.duration:7.2f}s \t{result.project}")
+
+    failed = [result for result in results if not result.ok]
+    for result in failed:
+        print(f"\n--- {result.project} ---")
+        print(result.log, end="")
+        if result.error:
+            print(result.error)
+
+    total = sum(result.duration for result in results)
+    print(
+        f"\nBuilt {len(results) - len(failed)}/{len(results)} projects"
+        f" ({total:.2f}s of build time)"
+    )
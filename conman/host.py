@@ -0,0 +1,282 @@
+"""
+Host facts provider.
+
+Facts about the host (user, UID/GID, DISPLAY, platform, NUMA nodes, GPUs and
+their compute capability) are probed once per run by a single HostFacts provider.
+Slow facts can be persisted with a time to live in the .conman directory, and
+tests can inject fake facts with set_host_facts().
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from conman.constants import CONFIG_DIR
+from conman.topology import (
+    GpuDevice,
+    discover_gpus,
+    discover_numa_nodes,
+    gpus_from_facts,
+    gpus_to_facts,
+)
+
+HOST_FACTS_FILE = CONFIG_DIR + "host-facts.json"
+DEFAULT_TTL = 24 * 3600
+
+# User and DISPLAY are cheap to read and can change between shells, they are
+# never persisted
+PERSISTED_FACTS = ("platform", "compute_capability")
+
+
+def probe_platform(facts: HostFacts) -> str:
+    import platform
+
+    return platform.system()
+
+
+def probe_user(facts: HostFacts) -> Dict[str, str]:
+    """
+    Retrieves user ID-related data based on the operating system platform.
+
+    Args:
+        facts (HostFacts): The provider, for the facts this one depends on.
+
+    Returns:
+        dict: USER_NAME, USER_UID and USER_GID.
+    """
+
+    if facts.platform() == "Linux":
+        import pwd
+
+        pw = pwd.getpwnam(os.environ.get("USER"))
+        return {
+            "USER_NAME": os.environ.get("USER"),
+            "USER_UID": str(pw.pw_uid),
+            "USER_GID": str(pw.pw_gid),
+        }
+    return {
+        "USER_NAME": os.environ.get("USER"),
+        "USER_UID": "1000",
+        "USER_GID": "1000",
+    }
+
+
+def probe_display(facts: HostFacts) -> str:
+    if facts.platform() == "Linux":
+        return str(os.environ.get("DISPLAY"))
+    return "host.docker.internal:0"
+
+
+def probe_gpus(facts: HostFacts) -> List[Dict[str, Any]]:
+    return gpus_to_facts(discover_gpus())
+
+
+def probe_numa_nodes(facts: HostFacts) -> Dict[int, List[int]]:
+    return discover_numa_nodes()
+
+
+def probe_compute_capability(facts: HostFacts) -> str:
+    """
+    Returns the compute capability of the host GPUs, ";" separated if they
+    differ.
+
+    Known GPU models are read from the driver files, nvidia-container-cli is
+    only run for the others.
+
+    Args:
+        facts (HostFacts): The provider, for the facts this one depends on.
+
+    Returns:
+        str: The compute capability, empty without NVIDIA GPUs.
+    """
+
+    gpus = facts.gpus()
+    capabilities = {gpu.compute_capability for gpu in gpus}
+    if not gpus or "" not in capabilities:
+        return ";".join(sorted(capabilities))
+
+    import subprocess
+
+    try:
+        proc = subprocess.run(
+            ["nvidia-container-cli", "info"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+    except OSError:
+        return ""
+    output = proc.stdout.decode("utf-8")
+    return "\n".join(re.findall(r"Architecture:\s*([0-9.]+)", output))
+
+
+PROBES: Dict[str, Callable[[HostFacts], Any]] = {
+    "platform": probe_platform,
+    "user": probe_user,
+    "display": probe_display,
+    "gpus": probe_gpus,
+    "numa_nodes": probe_numa_nodes,
+    "compute_capability": probe_compute_capability,
+}
+
+
+class HostFacts:
+    """
+    Memoized provider of the host facts.
+
+    Attributes:
+        facts (dict): Fact name to value, probed or injected.
+        filename (str): File the persisted facts are saved to, if any.
+        ttl (float): Time to live of persisted facts, in seconds.
+
+    Methods:
+        get(self, name)
+            Returns a fact, probing it on first use.
+
+        attach(self, filename, ttl, use_persisted)
+            Loads the unexpired facts persisted in a file.
+
+        save(self)
+            Persists the slow facts.
+    """
+
+    def __init__(
+        self,
+        facts: Optional[Dict[str, Any]] = None,
+        filename: Optional[str] = None,
+        ttl: float = DEFAULT_TTL,
+    ):
+        self.facts = dict(facts or {})
+        self.filename = filename
+        self.ttl = ttl
+        # Probe time of the facts, injected facts have none and are not saved
+        self._times = {}
+
+    def get(self, name: str) -> Any:
+        """
+        Returns a fact, probing it on first use.
+
+        Args:
+            name (str): The fact name, a key of PROBES.
+
+        Returns:
+            Any: The fact value.
+        """
+
+        if name not in self.facts:
+            self.facts[name] = PROBES[name](self)
+            self._times[name] = time.time()
+        return self.facts[name]
+
+    def platform(self) -> str:
+        return self.get("platform")
+
+    def user_id_data(self) -> Dict[str, str]:
+        return dict(self.get("user"))
+
+    def display(self) -> str:
+        return self.get("display")
+
+    def gpus(self) -> List[GpuDevice]:
+        return gpus_from_facts(self.get("gpus"))
+
+    def numa_nodes(self) -> Dict[int, List[int]]:
+        return self.get("numa_nodes")
+
+    def compute_capability(self) -> str:
+        return self.get("compute_capability")
+
+    def attach(
+        self,
+        filename: str,
+        ttl: Optional[float] = None,
+        use_persisted: bool = True,
+    ) -> None:
+        """
+        Loads the unexpired facts persisted in a file, and saves to it later.
+
+        Facts already known (probed or injected) are kept.
+
+        Args:
+            filename (str): The persisted facts file.
+            ttl (float, optional): Time to live, in seconds.
+            use_persisted (bool): If False, the file is only written.
+
+        Returns:
+            None
+        """
+
+        self.filename = filename
+        if ttl is not None:
+            self.ttl = ttl
+        if not use_persisted:
+            return
+
+        try:
+            with open(filename, "r") as f:
+                persisted = json.load(f)
+            now = time.time()
+            for name, entry in persisted.items():
+                if name in self.facts or name not in PERSISTED_FACTS:
+                    continue
+                if now - entry["time"] < self.ttl:
+                    self.facts[name] = entry["value"]
+                    self._times[name] = entry["time"]
+        except (OSError, ValueError, AttributeError, KeyError, TypeError):
+            pass
+
+    def save(self) -> None:
+        """
+        Persists the slow facts to the attached file, if any.
+
+        Returns:
+            None
+        """
+
+        if self.filename is None:
+            return
+
+        from conman.io import create_directory, write_artifact
+
+        persisted = {
+            name: {"value": self.facts[name], "time": self._times[name]}
+            for name in PERSISTED_FACTS
+            if name in self._times
+        }
+        if not persisted:
+            return
+        create_directory(self.filename)
+        write_artifact(self.filename, json.dumps(persisted, indent=4))
+
+
+_host_facts: Optional[HostFacts] = None
+
+
+def get_host_facts() -> HostFacts:
+    """
+    Returns the host facts provider of the current process.
+    """
+
+    global _host_facts
+    if _host_facts is None:
+        _host_facts = HostFacts()
+    return _host_facts
+
+
+def set_host_facts(host_facts: Optional[HostFacts]) -> Optional[HostFacts]:
+    """
+    Replaces the host facts provider, e.g. with fake facts in tests.
+
+    Args:
+        host_facts (HostFacts): The new provider, None to probe again.
+
+    Returns:
+        HostFacts: The previous provider.
+    """
+
+    global _host_facts
+    previous, _host_facts = _host_facts, host_facts
+    return previous
@@ -1,10 +1,23 @@
 from dataclasses import dataclass, field
-from typing import List, Optional, Union, Dict, Any
+from typing import List, Optional, Union, Dict, Any, FrozenSet, Iterator
 from pathlib import Path
 import json
-import yaml
 import copy
+import dataclasses
+import filecmp
+import io
+import os
+import tempfile
 import types
+from contextlib import contextmanager
+
+from conman import yml_backend
+from conman.constants import CONFIG_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 
 def create_directory(path: str) -> None:
@@ -17,6 +30,9 @@ def create_directory(path: str) -> None:
     Returns:
         None
     """
+    if _captured_artifacts is not None:
+        return
+
     # Conversion to Path object
     path = Path(path)
 
@@ -46,6 +62,156 @@ def check_file_exist(path: str) -> bool:
         return False
 
 
+# Generated files collected in memory by capture_artifacts, by absolute path
+_captured_artifacts: Optional[Dict[str, str]] = None
+
+
+@contextmanager
+def capture_artifacts():
+    """
+    Collects the files generated in the enclosed block in memory, nothing is
+    written to disk.
+
+    Yields:
+        dict: The content of each generated file, by absolute path.
+    """
+
+    global _captured_artifacts
+    previous, _captured_artifacts = _captured_artifacts, {}
+    try:
+        yield _captured_artifacts
+    finally:
+        _captured_artifacts = previous
+
+
+class ArtifactWriter:
+    """
+    Context manager writing a generated file atomically, only if it changed.
+
+    The content is written to a temporary file next to the target, which
+    then replaces the target through a rename. When the target already holds
+    the same content, the temporary file is dropped and the target (and its
+    mtime) is left untouched. Inside capture_artifacts, the content is only
+    collected.
+
+    Attributes:
+        filename (str): The target file.
+        changed (bool): After exit, True if the target was (re)written.
+
+    Example:
+        with ArtifactWriter("Dockerfile") as f:
+            f.write("FROM ubuntu")
+    """
+
+    def __init__(self, filename: str, mode: Optional[int] = None):
+        """
+        Args:
+            filename (str): The target file.
+            mode (int, optional): Permissions of the target. Defaults to the
+                ones of the existing target, or to the umask for a new one.
+        """
+        self.filename = str(filename)
+        self.mode = mode
+        self.changed = False
+        self._file = None
+
+    def __enter__(self):
+        if _captured_artifacts is not None:
+            self._file = io.StringIO()
+            return self._file
+        directory = os.path.dirname(os.path.abspath(self.filename))
+        self._file = tempfile.NamedTemporaryFile(
+            mode="w",
+            dir=directory,
+            prefix=f".{os.path.basename(self.filename)}.",
+            suffix=".tmp",
+            delete=False,
+        )
+        return self._file
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if isinstance(self._file, io.StringIO):
+            if exc_type is None and _captured_artifacts is not None:
+                path = os.path.abspath(self.filename)
+                _captured_artifacts[path] = self._file.getvalue()
+            return False
+
+        self._file.close()
+        tmp_filename = self._file.name
+
+        if exc_type is not None or (
+            os.path.isfile(self.filename)
+            and filecmp.cmp(tmp_filename, self.filename, shallow=False)
+        ):
+            os.remove(tmp_filename)
+            return False
+
+        mode = self.mode
+        if mode is None and os.path.exists(self.filename):
+            mode = os.stat(self.filename).st_mode & 0o7777
+        if mode is None:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(tmp_filename, mode)
+
+        os.replace(tmp_filename, self.filename)
+        self.changed = True
+        return False
+
+
+def write_artifact(
+    filename: str, content: str, mode: Optional[int] = None
+) -> bool:
+    """
+    Writes a generated file atomically, only if its content changed.
+
+    Args:
+        filename (str): The target file.
+        content (str): The content to write.
+        mode (int, optional): Permissions of the target.
+
+    Returns:
+        bool: True if the file was (re)written.
+    """
+
+    writer = ArtifactWriter(filename, mode=mode)
+    with writer as f:
+        f.write(content)
+    return writer.changed
+
+
+@contextmanager
+def project_lock(workdir: str = "./"):
+    """
+    Holds an exclusive lock on the project for the enclosed block.
+
+    The lock is a flock on .conman/.lock, so concurrent conman invocations
+    in the same project wait for each other. It is a no-op where fcntl is
+    not available.
+
+    Args:
+        workdir (str): The project directory.
+    """
+
+    if fcntl is None:
+        yield
+        return
+
+    lock_filename = os.path.join(workdir, CONFIG_DIR, ".lock")
+    create_directory(lock_filename)
+    with open(lock_filename, "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print("Waiting for another conman process on this project...")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
 def asi(subclass):
     """
     A decorator function that adds support for automatic super() initialization to a subclass.
@@ -78,6 +244,119 @@ def asi(subclass):
     return subclass
 
 
+@dataclass(frozen=True)
+class ClassPlan:
+    """
+    Loading plan of a Builder class, compiled once from its dataclass fields.
+
+    Attributes:
+        fields (tuple): The declared field names, in definition order.
+        class_lib (dict): Key to target class for nested dictionaries.
+        optional (frozenset): Default optional attribute names.
+        private (frozenset): Private field names (leading underscore).
+    """
+
+    fields: tuple
+    class_lib: Dict[str, type]
+    optional: FrozenSet[str]
+    private: FrozenSet[str]
+
+    def target(self, key: str) -> type:
+        """
+        Returns the class used to build the nested dictionary stored at key.
+        """
+
+        return self.class_lib.get(key, Builder)
+
+
+_CLASS_PLANS: Dict[type, ClassPlan] = {}
+
+
+def _field_default(cls, name: str, default: Any) -> Any:
+    """
+    Returns the default value of a dataclass field without instantiating cls.
+    """
+
+    fld = getattr(cls, "__dataclass_fields__", {}).get(name)
+    if fld is None:
+        return default
+    if fld.default_factory is not dataclasses.MISSING:
+        return fld.default_factory()
+    if fld.default is not dataclasses.MISSING:
+        return fld.default
+    return default
+
+
+def compile_plan(cls) -> ClassPlan:
+    """
+    Compiles (and caches) the loading plan of a Builder class.
+
+    Args:
+        cls (class): The Builder class.
+
+    Returns:
+        ClassPlan: The compiled plan.
+    """
+
+    plan = _CLASS_PLANS.get(cls)
+    if plan is None:
+        fields = tuple(getattr(cls, "__dataclass_fields__", {}))
+        plan = ClassPlan(
+            fields=fields,
+            class_lib=dict(_field_default(cls, "__private_class_lib__", {})),
+            optional=frozenset(
+                _field_default(cls, "_optional_attributes_", [])
+            ),
+            private=frozenset(f for f in fields if f.startswith("_")),
+        )
+        _CLASS_PLANS[cls] = plan
+    return plan
+
+
+def _emit_attributes(obj, memo: Dict, filters: tuple) -> Iterator:
+    """
+    Yields the filtered (name, value) attributes of an instance, nested
+    instances being emitted as dictionaries when they are reached.
+
+    Args:
+        obj (Any): The instance.
+        memo (dict): The dictionary already emitted for each instance id.
+        filters (tuple): rm_private, rm_optional, rm_empty and rm_none.
+
+    Yields:
+        tuple: The name and filtered representation of each attribute.
+    """
+
+    rm_private, rm_optional, rm_empty, rm_none = filters
+    attributes = obj.__dict__
+    optional_attributes = set()
+    if rm_optional:
+        for attr, value in attributes.items():
+            if attr.startswith("_optional_attributes_"):
+                optional_attributes.update(value)
+
+    for attr, value in attributes.items():
+        if attr in optional_attributes:
+            continue
+        if rm_private and attr.startswith("_"):
+            continue
+        if hasattr(value, "__dict__") and not isinstance(value, type):
+            if id(value) in memo:
+                value = memo[id(value)]
+            else:
+                data = memo[id(value)] = {}
+                data.update(_emit_attributes(value, memo, filters))
+                value = data
+            if (rm_empty or rm_none) and not value:
+                continue
+        elif isinstance(value, (list, dict)):
+            if rm_empty and not value:
+                continue
+        elif (rm_empty and not value) or (rm_none and value is None):
+            continue
+        yield attr, value
+
+
 class Builder:
     def __init__(self, __private_class_lib__: Dict = {}, **kwargs) -> None:
 
@@ -89,32 +368,62 @@ class Builder:
         self.class_register()
 
     @classmethod
-    def from_dic(cls, dic):
-        kwargs = {}
+    def from_dic(cls, dic: Dict, prune: bool = False):
+        """
+        Builds an instance from a dictionary in a single pass.
 
-        for key, value in dic.items():
-            temps_instance = cls()
-            temps_instance.update_private_class_lib(dic)
+        Nested dictionaries are turned into instances of the class registered
+        for their key in the compiled plan of ``cls`` (``Builder`` otherwise).
 
-            if (
-                hasattr(temps_instance, "__private_class_lib__")
-                and key in temps_instance.__private_class_lib__
-            ):
-                _class = temps_instance.__private_class_lib__[key]
-            else:
-                _class = Builder
+        Args:
+            dic (Dict): The dictionary to load.
+            prune (bool): If True, attributes of each direct sub-instance that
+                are missing from its dictionary are set to None.
+
+        Returns:
+            Builder: The built instance.
+        """
 
+        plan = compile_plan(cls)
+        kwargs = {}
+
+        for key, value in dic.items():
             if value.__class__ == dict:
-                sub_instance = _class()
-                sub_instance.update_private_class_lib(dic)
-                kwargs[key] = sub_instance.from_dic(value)
-            else:
-                kwargs[key] = value
+                value = plan.target(key).from_dic(value)
+            kwargs[key] = value
 
         instance = cls(**kwargs)
         instance.update_private_class_lib(dic)
+
+        if prune:
+            for key, value in dic.items():
+                if hasattr(instance, key):
+                    attr = cls.deletion(obj=getattr(instance, key), dic=value)
+                    setattr(instance, key, attr)
+
         return instance
 
+    @staticmethod
+    def deletion(obj, dic):
+        """
+        Sets to None the public attributes of obj that are missing from dic.
+
+        Optional attributes keep their defaults.
+        """
+
+        optional = getattr(obj, "_optional_attributes_", None) or []
+        attrs = []
+        for attr in obj.__dict__.keys():
+            if attr in dic or attr.startswith("_") or attr in optional:
+                continue
+            attrs.append(attr)
+
+        for attr in attrs:
+            print(f"Deleting {attr} from {obj.__class__.__name__}")
+            setattr(obj, attr, None)
+
+        return obj
+
     def update_private_class_lib(self, dic: Dict):
         inter_key = set(dic) & set(self.__private_class_lib__)
         shared_class_lib = {}
@@ -148,12 +457,14 @@ class Builder:
             None
         """
 
-        yaml.add_representer(cls, cls.class_representer)
+        yml_backend.add_representer(cls, cls.class_representer)
 
     @staticmethod
     def deleting_attributes(obj: object, attributes: List[str]) -> object:
         for attr in attributes:
-            delattr(obj, attr)
+            # Instances shared in the tree are reached more than once
+            if attr in obj.__dict__:
+                delattr(obj, attr)
         return obj
 
     @staticmethod
@@ -240,49 +551,112 @@ class Builder:
             None
         """
 
-        with open(filename, "r") as file:
-            dic = yaml.load(file, Loader=yaml.FullLoader)
+        dic = yml_backend.load_file(filename)
 
         return cls.from_dic(dic)
 
-    def dump_to_yml(self, filename: Path, preambule="", **kwargs) -> None:
+    def write_yml(self, stream, preambule="", **kwargs) -> None:
         """
-        Dumps the configuration to a YAML file.
+        Writes the configuration as YAML to an open text stream.
+
+        Top-level attributes are serialized and emitted one at a time
+        straight to the stream, so that only the section being written is
+        held in memory, and a "# X Settings" header is written before each
+        block section as it is reached.
 
         Args:
-            filename (Path): The path to the YAML file.
+            stream (file): The text stream to write to.
+            preambule (str): Text written before the document.
+            **kwargs: Filtering options forwarded to iter_dict.
 
         Returns:
             None
         """
-        # Clean attributes before dumping
 
-        data = self.removing_attr(**kwargs)
+        prim_attrs = set(self.__dataclass_fields__)
 
-        stream = yaml.dump(
-            data,
-            default_flow_style=False,
-            sort_keys=False,
-            indent=4,
-        )
-
-        stream = preambule + stream
-        prim_attrs = [key for key in data.__dataclass_fields__]
-        for attr in prim_attrs:
-            stream = stream.replace(
-                f"\n{attr}:\n",
-                f"\n\n# {attr.capitalize()} Settings\n{attr}:\n",
+        stream.write(preambule)
+        new_line = preambule.endswith("\n")
+        empty = True
+        for attr, value in self.iter_dict(**kwargs):
+            empty = False
+            # Only sections rendered as blocks start with "attr:" on a line
+            if (
+                new_line
+                and attr in prim_attrs
+                and isinstance(value, (list, dict))
+                and value
+            ):
+                stream.write(f"\n# {attr.capitalize()} Settings\n")
+            yml_backend.dump(
+                {attr: value},
+                stream,
+                default_flow_style=False,
+                sort_keys=False,
+                indent=4,
             )
+            new_line = True
+
+        if empty:
+            yml_backend.dump({}, stream, default_flow_style=False)
+
+    def dump_to_yml(self, filename: Path, preambule="", **kwargs) -> None:
+        """
+        Dumps the configuration to a YAML file.
+
+        Args:
+            filename (Path): The path to the YAML file.
+
+        Returns:
+            None
+        """
 
         create_directory(filename)
 
         # Actually write the file
-        with open(filename, "w") as f:
-            f.write(stream)
+        with ArtifactWriter(filename) as f:
+            self.write_yml(f, preambule=preambule, **kwargs)
 
     def copy(self) -> Any:
         return copy.deepcopy(self)
 
+    @staticmethod
+    def json_default(obj) -> Dict:
+        """
+        JSON fallback for objects left inside lists or dictionaries.
+
+        Mirrors class_representer: objects are emitted as their __dict__.
+
+        Args:
+            obj (object): The object json cannot serialize natively.
+
+        Returns:
+            dict: The attributes of the object.
+        """
+
+        if hasattr(obj, "__dict__"):
+            return obj.__dict__
+        raise TypeError(
+            f"Object of type {obj.__class__.__name__} is not JSON serializable"
+        )
+
+    def to_json(self, fp=None, **kwargs) -> Optional[str]:
+        """
+        Serializes the instance tree straight to JSON.
+
+        Args:
+            fp (file, optional): File handle to stream the JSON to.
+            **kwargs: Filtering options forwarded to to_dict.
+
+        Returns:
+            str: The JSON document, or None when streamed to fp.
+        """
+
+        data = self.to_dict(**kwargs)
+        if fp is None:
+            return json.dumps(data, indent=4, default=self.json_default)
+        json.dump(data, fp, indent=4, default=self.json_default)
+
     def dump_to_json(self, filename: Path, **kwargs) -> None:
         """
         Dumps the configuration to a JSON file.
@@ -294,20 +668,8 @@ class Builder:
             None
         """
 
-        # Clean attributes before dumping
-        data = self.removing_attr(**kwargs)
-
-        # Intermediate yml representation
-        stream = yaml.dump(
-            data,
-            default_flow_style=False,
-            sort_keys=False,
-            indent=4,
-        )
-        yaml_data = yaml.safe_load(stream)
-
-        with open(filename, "w") as json_file:
-            json.dump(yaml_data, json_file, indent=4)
+        with ArtifactWriter(filename) as json_file:
+            self.to_json(fp=json_file, **kwargs)
 
     def removing_attr(
         self,
@@ -331,5 +693,76 @@ class Builder:
 
         return data
 
+    def to_dict(
+        self,
+        rm_private=True,
+        rm_optional=True,
+        rm_empty=False,
+        rm_none=False,
+        **kwargs,
+    ) -> Dict:
+        """
+        Serializes the instance tree to nested dictionaries in one traversal.
+
+        Applies the same filters as removing_attr (optional, private, empty
+        and None attributes) while emitting, without copying the instances.
+        Lists and dictionaries are shared with the instances, and an instance
+        reached twice is emitted as the same dictionary.
+
+        Args:
+            rm_private (bool): Skip attributes starting with an underscore.
+            rm_optional (bool): Skip attributes listed in
+                _optional_attributes_.
+            rm_empty (bool): Skip empty attributes.
+            rm_none (bool): Skip None attributes and emptied instances.
+
+        Returns:
+            dict: The filtered representation of the instance.
+        """
+
+        filters = (rm_private, rm_optional, rm_empty, rm_none)
+        memo = {}
+        data = memo[id(self)] = {}
+        data.update(_emit_attributes(self, memo, filters))
+        return data
+
+    def iter_dict(
+        self,
+        rm_private=True,
+        rm_optional=True,
+        rm_empty=False,
+        rm_none=False,
+        **kwargs,
+    ) -> Iterator:
+        """
+        Serializes the instance tree one top-level attribute at a time.
+
+        Same filters as to_dict, but each top-level value is only built when
+        it is reached, and dropped by the next one unless the caller keeps
+        it. An instance reached twice within a top-level attribute is
+        emitted as the same dictionary.
+
+        Args:
+            rm_private (bool): Skip attributes starting with an underscore.
+            rm_optional (bool): Skip attributes listed in
+                _optional_attributes_.
+            rm_empty (bool): Skip empty attributes.
+            rm_none (bool): Skip None attributes and emptied instances.
+
+        Yields:
+            tuple: The name and filtered representation of each attribute.
+        """
+
+        filters = (rm_private, rm_optional, rm_empty, rm_none)
+        memo = {}
+        for attr, value in _emit_attributes(self, memo, filters):
+            yield attr, value
+            memo.clear()
+
     def add_field(self, field_name, field_value):
         setattr(self, field_name, field_value)
+
+
+# Builder subclasses register on instantiation, this also covers the
+# instances created without Builder.__init__, such as deep copies
+yml_backend.add_multi_representer(Builder, Builder.class_representer)
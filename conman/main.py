@@ -1,31 +1,77 @@
 from __future__ import annotations
 
 import argparse
-import logging
 import os
 import sys
 from typing import Any
 from typing import Optional
 from typing import Sequence
 from typing import Union
-import conman.constants as C
+import importlib
 
-from conman.commands.init import init
-from conman.commands.clean import clean
-from conman.commands.status import status
-from conman.commands.build import build
-from conman.commands.update import update
+import conman.constants as C
 
 
+# Command modules are imported on dispatch only, so that the startup time does
+# not depend on yaml, the resources and the other commands.
 CMDS = {
-    "init": {"func": init, "kargs": ["force", "optional"]},
-    "clean": {"func": clean, "kargs": []},
-    "status": {"func": status, "kargs": []},
-    "build": {"func": build, "kargs": []},
-    "update": {"func": update, "kargs": []},
+    "init": {
+        "module": "conman.commands.init",
+        "func": "init",
+        "kargs": ["force", "optional"],
+    },
+    "clean": {"module": "conman.commands.clean", "func": "clean", "kargs": []},
+    "status": {
+        "module": "conman.commands.status",
+        "func": "status",
+        "kargs": [],
+    },
+    "build": {
+        "module": "conman.commands.build",
+        "func": "build",
+        "kargs": ["no_cache", "projects", "jobs"],
+    },
+    "update": {
+        "module": "conman.commands.update",
+        "func": "update",
+        "kargs": ["no_cache"],
+    },
+    "lint": {
+        "module": "conman.commands.lint",
+        "func": "lint",
+        "kargs": ["fail_on", "ignore"],
+    },
 }
 
 
+def load_command(command: str) -> Any:
+    """
+    Imports the function implementing a command.
+
+    Args:
+        command (str): The command name, a key of CMDS.
+
+    Returns:
+        Callable: The command function.
+    """
+
+    cmd = CMDS[command]
+    return getattr(importlib.import_module(cmd["module"]), cmd["func"])
+
+
+class _VersionAction(argparse.Action):
+    """
+    Same as argparse "version" action, but resolves the version on use.
+    """
+
+    def __init__(self, option_strings, dest, **kwargs):
+        kwargs.setdefault("help", "show program's version number and exit")
+        super().__init__(option_strings, dest, nargs=0, **kwargs)
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        parser.exit(message=f"{parser.prog} {C.get_version()}\n")
+
+
 def main(argv: Optional[Sequence[str]] = None) -> int:
     argv = argv if argv is not None else sys.argv[1:]
     parser = argparse.ArgumentParser(
@@ -37,8 +83,7 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
     parser.add_argument(
         "-V",
         "--version",
-        action="version",
-        version=f"%(prog)s {C.VERSION}",
+        action=_VersionAction,
     )
 
     # Generic options - Options group
@@ -64,7 +109,7 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
 
     ## Status command
     status_impl_parser = subparsers.add_parser(
-        "status", help="Show the project status (not implemented yet)"
+        "status", help="Show the generated files out of date with the config"
     )
 
     ## Init command
@@ -87,13 +132,50 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
 
     ## Install command
     build_impl_parser = subparsers.add_parser("build", help="Build project")
-    
+    build_impl_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Regenerate every file, even if its inputs did not change",
+    )
+    build_impl_parser.add_argument(
+        "--projects",
+        metavar="GLOB",
+        help="Build every project matching the glob pattern in parallel",
+    )
+    build_impl_parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        help="Number of worker processes used with --projects",
+    )
+
     ## Update command
     update_impl_parser = subparsers.add_parser("update", help="Update project")
+    update_impl_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Regenerate every file, even if its inputs did not change",
+    )
 
     ## Clean command
     clean_impl_parser = subparsers.add_parser("clean", help="Clean project")
 
+    ## Lint command
+    lint_impl_parser = subparsers.add_parser(
+        "lint", help="Check the Dockerfiles for cache-unfriendly patterns"
+    )
+    lint_impl_parser.add_argument(
+        "--fail-on",
+        choices=["low", "medium", "high", "never"],
+        default="high",
+        help="Exit with an error if a finding is at least this severe",
+    )
+    lint_impl_parser.add_argument(
+        "--ignore",
+        metavar="RULES",
+        help="Comma separated rule ids to skip, e.g. CM004,CM006",
+    )
+
     # Analyse command line arguments
     args = parser.parse_args(argv)
 
@@ -116,7 +198,7 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
             for kwarg in value["kargs"]:
                 if hasattr(args, kwarg):
                     extra_args.update({kwarg: getattr(args, kwarg)})
-            value["func"](**extra_args)
+            return load_command(key)(**extra_args)
 
     # return 0
 
@@ -1 +1,2 @@
-from . import docker_compose, docker_file, devcontainer
+from . import docker_compose, docker_file, docker_file_optimizer, devcontainer
+from . import docker_file_linter
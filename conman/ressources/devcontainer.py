@@ -1,7 +1,13 @@
 from dataclasses import dataclass, field
 from typing import List, Optional, Union, Dict, Any
 from pathlib import Path
-from conman.io import asi, Builder, create_directory, check_file_exist
+from conman.io import (
+    asi,
+    Builder,
+    create_directory,
+    check_file_exist,
+    write_artifact,
+)
 from conman.utils import get_random_hash_str
 from conman.constants import CONFIG_DIR, CONFIG_DIRNAME
 
@@ -34,7 +40,7 @@ class VSCode(Builder):
 @asi
 @dataclass
 class Customizations(Builder):
-    vscode: VSCode = VSCode()
+    vscode: VSCode = field(default_factory=VSCode)
 
     __private_class_lib__: Dict = field(
         default_factory=lambda: {"vscode": VSCode}
@@ -50,7 +56,7 @@ class DevContainer(Builder):
     dockerComposeFile: str = str(Path("./docker-compose.yml"))
     service: str = "main"
     shutdownAction: str = "stopCompose"
-    customizations: Customizations = Customizations()
+    customizations: Customizations = field(default_factory=Customizations)
     initializeCommand: str = f"cd {CONFIG_DIR}scripts && /bin/bash initializeCommand.sh"
     onCreateCommand: str = (
         f"cd {workspaceFolder}{CONFIG_DIRNAME}/scripts && /bin/bash onCreateCommand.sh"
@@ -92,11 +98,14 @@ class DevContainer(Builder):
             rm_none=True,
         )
 
-    def dump_envFile(self, username, filename: str = "../.env"):
-        hash_value = get_random_hash_str()
-        VAR = f"COMPOSE_PROJECT_NAME={username}-{hash_value}"
+    def dump_envFile(
+        self, username, filename: str = "../.env", project_name: str = None
+    ):
+        if project_name is None:
+            project_name = f"{username}-{get_random_hash_str()}"
+        VAR = f"COMPOSE_PROJECT_NAME={project_name}"
 
-        open(filename, "w").write(VAR)
+        write_artifact(filename, VAR)
 
     def empty_shell_script(self, filename, header: str = ""):
         create_directory(filename)
@@ -142,12 +151,23 @@ class DevContainer(Builder):
     ):
         self.empty_shell_script(filename, header="Post start command")
 
-    def dump_optionals_scripts(self):
-        self.dump_initializeCommand_script()
-        self.dump_onCreateCommand_script()
-        self.dump_updateContentCommand_script()
-        self.dump_postStartCommand_script()
-        self.dump_postCreateCommand_script()
+    def dump_optionals_scripts(self, wdir: str = "./"):
+        scripts_dir = f"{wdir}{CONFIG_DIRNAME}/scripts/"
+        self.dump_initializeCommand_script(
+            filename=scripts_dir + "initializeCommand.sh"
+        )
+        self.dump_onCreateCommand_script(
+            filename=scripts_dir + "onCreateCommand.sh"
+        )
+        self.dump_updateContentCommand_script(
+            filename=scripts_dir + "updateContentCommand.sh"
+        )
+        self.dump_postStartCommand_script(
+            filename=scripts_dir + "postStartCommand.sh"
+        )
+        self.dump_postCreateCommand_script(
+            filename=scripts_dir + "postCreateCommand.sh"
+        )
 
 
 if __name__ == "__main__":
@@ -1,10 +1,10 @@
-import yaml
-import platform
 import os
+import re
+from conman.host import get_host_facts
 from conman.io import asi, Builder
-from conman.utils import get_random_hash_str
+from conman.utils import get_random_hash_str, get_stable_hash_str
 from dataclasses import dataclass, field
-from typing import List, Dict, Any
+from typing import Any, Dict, List, Optional, Union
 
 
 def get_user_id_data():
@@ -15,21 +15,7 @@ def get_user_id_data():
         dict: A dictionary containing user ID-related data, including USER_NAME, UID, and GID.
     """
 
-    # Check if the OS platform is Linux or Windows
-    if platform.system() == "Linux":
-        import pwd
-
-        return {
-            "USER_NAME": os.environ.get("USER"),
-            "USER_UID": str(pwd.getpwnam(os.environ.get("USER")).pw_uid),
-            "USER_GID": str(pwd.getpwnam(os.environ.get("USER")).pw_gid),
-        }
-    elif platform.system() == "Windows":
-        return {
-            "USER_NAME": os.environ.get("USER"),
-            "USER_UID": "1000",
-            "USER_GID": "1000",
-        }
+    return get_host_facts().user_id_data()
 
 
 def get_display():
@@ -40,10 +26,74 @@ def get_display():
         str: The display configuration.
     """
 
-    if platform.system() == "Linux":
-        return str(os.environ.get("DISPLAY"))
+    return get_host_facts().display()
+
+
+NAMING_MODES = ("stable", "random")
+SIZE_UNITS = {"": 1, "b": 1, "k": 1024, "m": 1024**2, "g": 1024**3}
+SIZE = re.compile(r"^(\d+(?:\.\d+)?)\s*([bkmg]?)b?$", re.I)
+
+
+def parse_size(value) -> int:
+    """
+    Converts a compose byte value, such as "512m" or "2gb", to bytes.
+
+    Args:
+        value (int or str): The size, an int is a number of bytes.
+
+    Returns:
+        int: The size in bytes.
+    """
+
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    match = SIZE.match(str(value).strip())
+    if match is None:
+        raise ValueError(
+            f"Invalid size: {value}, expected e.g. 512m, 2g or a byte count"
+        )
+    amount, unit = match.groups()
+    return int(float(amount) * SIZE_UNITS[unit.lower()])
+
+
+def get_compose_names(
+    workdir: str,
+    service_name: str,
+    naming: str = "stable",
+) -> Dict[str, str]:
+    """
+    Computes the compose project name and the container name of a project.
+
+    In "stable" mode the names hash the absolute project path and the service
+    name, so that a rebuild reuses the existing containers while two
+    checkouts of the same project do not collide. In "random" mode a new hash
+    is drawn at each call.
+
+    Args:
+        workdir (str): The project directory.
+        service_name (str): The compose service name.
+        naming (str): "stable" or "random".
+
+    Returns:
+        dict: The "project_name" and "container_name".
+    """
+
+    if naming == "stable":
+        hash_value = get_stable_hash_str(
+            os.path.abspath(workdir), service_name
+        )
+    elif naming == "random":
+        hash_value = get_random_hash_str()
     else:
-        return "host.docker.internal:0"
+        raise ValueError(
+            f"Unknown naming mode: {naming}, expected one of {NAMING_MODES}"
+        )
+
+    user_name = get_user_id_data()["USER_NAME"]
+    return {
+        "project_name": f"{user_name}-{hash_value}",
+        "container_name": f"{user_name}-container-{hash_value}",
+    }
 
 
 def x_access():
@@ -56,7 +106,7 @@ def x_access():
 @dataclass
 class DockerComposeFile(Builder):
     version: str = "3.9"
-    services: Builder = Builder()
+    services: Builder = field(default_factory=Builder)
 
     def add_service(self, service_name, **kwargs):
         """
@@ -90,10 +140,34 @@ class DockerCompose(Builder):
     filename: str = "docker-compose.yml"
     service_name: str = "main_service_name"
     volumes: List[str] = field(default_factory=lambda: ["../:/workspace"])
-    _container_name: str = (
-        f'{get_user_id_data()["USER_NAME"]}-container-{get_random_hash_str()}'
+    naming: str = "stable"
+    _container_name: str = field(
+        default_factory=lambda: get_compose_names(
+            os.getcwd(), "main_service_name"
+        )["container_name"]
     )
-    _docker_compose_file: DockerComposeFile = DockerComposeFile()
+    _project_name: str = ""
+    _docker_compose_file: DockerComposeFile = field(
+        default_factory=DockerComposeFile
+    )
+    _optional_attributes_: List[str] = field(
+        default_factory=lambda: ["naming"]
+    )
+
+    def resolve_names(self, workdir: str) -> None:
+        """
+        Sets the compose project and container names of the project.
+
+        Args:
+            workdir (str): The project directory.
+
+        Returns:
+            None
+        """
+
+        names = get_compose_names(workdir, self.service_name, self.naming)
+        self._container_name = names["container_name"]
+        self._project_name = names["project_name"]
 
 
 @asi
@@ -178,44 +252,68 @@ class Build(Builder):
 @asi
 @dataclass
 class Deploy(Builder):
-    resources: Builder = Builder()
+    resources: Builder = field(default_factory=Builder)
 
     def __post_init__(self):
         self.resources.add_field("reservations", Builder())
 
     def activate_gpu(
-        self, driver="nvidia", count: int = 1, capabilities=["gpu"]
+        self,
+        driver="nvidia",
+        count: Union[int, str] = 1,
+        capabilities=["gpu"],
+        device_ids: Optional[List[str]] = None,
     ):
         """
         Activates GPU support for the deployment.
 
         Args:
             driver (str): The driver to use for GPU support.
-            count (int): The number of GPUs to allocate.
+            count (int or str): The number of GPUs to allocate, or "all".
             capabilities (list): The capabilities required for the GPUs.
+            device_ids (list, optional): The indexes or UUIDs of the GPUs to
+                allocate, replaces count.
 
         Returns:
             None
         """
 
-        self.resources.reservations.add_field(
-            "devices",
-            [
-                {
-                    "driver": driver,
-                    "count": int(count),
-                    "capabilities": capabilities,
-                }
-            ],
-        )
+        device = {"driver": driver}
+        if device_ids:
+            device["device_ids"] = [str(device_id) for device_id in device_ids]
+        else:
+            device["count"] = "all" if count == "all" else int(count)
+        device["capabilities"] = list(capabilities)
+        self.resources.reservations.add_field("devices", [device])
         print("-> GPU activated")
 
+    def activate_limits(self, cpus: float = 0, memory: str = ""):
+        """
+        Caps the resources of the deployment.
+
+        Args:
+            cpus (float): The number of CPUs, 0 for no limit.
+            memory (str): The memory limit, e.g. "8g", empty for no limit.
+
+        Returns:
+            None
+        """
+
+        limits = {}
+        if cpus:
+            limits["cpus"] = str(cpus)
+        if memory:
+            limits["memory"] = memory
+        if limits:
+            self.resources.add_field("limits", limits)
+            print(f"-> Deploy limits: {limits}")
+
 
 @asi
 @dataclass
 class Service(Builder):
-    build: Build = Build()
-    deploy: Deploy = Deploy()
+    build: Build = field(default_factory=Build)
+    deploy: Deploy = field(default_factory=Deploy)
     container_name: str = ""
     volumes: List[str] = field(default_factory=lambda: [])
     __private_class_lib__: Dict = field(
@@ -250,14 +348,18 @@ class Service(Builder):
     def x_access(self):
         x_access()
 
-    def activate_display(self):
+    def activate_display(self, x_access: bool = True):
         """
         Activates the display configuration.
 
+        Args:
+            x_access (bool): Grant the X11 access on the host.
+
         Returns:
             None
         """
-        self.x_access()
+        if x_access:
+            self.x_access()
         self.build.get_display()
         self.extra_volumes_display()
         self.privileged = True
@@ -272,9 +374,10 @@ class Service(Builder):
             None
         """
 
+        user_name = get_user_id_data()["USER_NAME"]
         X_volumes = [
             "/tmp/.X11-unix:/tmp/.X11-unix:rw",
-            f"/home/{get_user_id_data()['USER_NAME']}/.Xauthority:/home/{get_user_id_data()['USER_NAME']}/.Xauthority:rw",
+            f"/home/{user_name}/.Xauthority:/home/{user_name}/.Xauthority:rw",
         ]
         print("Appending volumes for display configuration...")
         self.appending_volumes(X_volumes)
@@ -298,6 +401,65 @@ class Service(Builder):
         """
         self.build.add_arg("CONDA_ENV_NAME", f"{conda_env_name}")
 
+    def add_environment(self, name: str, value: str):
+        """
+        Adds a variable to the environment of the service.
+
+        Args:
+            name (str): The variable name.
+            value (str): The variable value.
+
+        Returns:
+            None
+        """
+
+        if not hasattr(self, "environment"):
+            self.environment = []
+        self.environment.append(f"{name}={value}")
+        print(f"-> Set environment: {name}={value}")
+
+    def activate_resources(
+        self,
+        cpus: float = 0,
+        cpuset: str = "",
+        mem_limit: str = "",
+        memswap_limit: str = "",
+        shm_size: str = "",
+        ipc: str = "",
+        ulimits: Dict[str, Any] = None,
+    ):
+        """
+        Sets the resources of the service, empty values are left unset.
+
+        Args:
+            cpus (float): The number of CPUs.
+            cpuset (str): The CPUs the container may run on, e.g. "0-3,8".
+            mem_limit (str): The memory limit, e.g. "8g".
+            memswap_limit (str): The memory plus swap limit, -1 for
+                unlimited swap.
+            shm_size (str): The size of /dev/shm.
+            ipc (str): The IPC namespace mode, e.g. "host" or "shareable".
+            ulimits (dict): The ulimits, by name, as a single value or a
+                soft/hard mapping.
+
+        Returns:
+            None
+        """
+
+        resources = {
+            "cpus": cpus,
+            "cpuset": cpuset,
+            "mem_limit": mem_limit,
+            "memswap_limit": memswap_limit,
+            "shm_size": shm_size,
+            "ipc": ipc,
+            "ulimits": ulimits,
+        }
+        for name, value in resources.items():
+            if value:
+                setattr(self, name, value)
+                print(f"-> Set {name}: {value}")
+
 
 if __name__ == "__main__":
     # Create DockerComposeFile instance
@@ -1,7 +1,58 @@
 import os
-import subprocess
+import re
 from pathlib import Path
 from conman.constants import CONFIG_DIR
+from conman.host import get_host_facts
+from conman.io import ArtifactWriter, write_artifact
+
+DEBIAN_ENV = 'DEBIAN_FRONTEND="noninteractive" TZ="Europe/Paris"'
+# Non development packages of the default root image
+DEFAULT_RUNTIME_PACKAGES = [
+    "ca-certificates",
+    "ffmpeg",
+    "git",
+    "htop",
+    "locales",
+    "sudo",
+    "wget",
+    "x11-apps",
+    "xauth",
+]
+# Packages the miniconda stage needs to download the installer
+MINICONDA_PACKAGES = ["ca-certificates", "wget"]
+SYSTEM_STAGE = "system"
+MINICONDA_STAGE = "miniconda"
+BUILDKIT_SYNTAX = "# syntax=docker/dockerfile:1"
+APT_CACHE_MOUNTS = [
+    "--mount=type=cache,target=/var/cache/apt,sharing=locked",
+    "--mount=type=cache,target=/var/lib/apt,sharing=locked",
+]
+PIP_CACHE_MOUNT = "--mount=type=cache,target=/root/.cache/pip"
+RUN_FLAGS_SEPARATOR = " \\ \n\t"
+CONDA_INSTALL = re.compile(
+    r"\b(conda|micromamba)\s+(create|install|update|env\s+(update|create))\b"
+)
+# An environment file with a pip section makes conda call pip
+PIP_INSTALL = re.compile(
+    r"\bpip3?\s+(install|wheel)\b|\bconda\s+env\s+(update|create)\b"
+    r"|\bmicromamba\s+create\b.*\.ya?ml"
+)
+CONDA_SOLVERS = ("classic", "libmamba", "micromamba")
+MICROMAMBA_URL = (
+    "https://github.com/mamba-org/micromamba-releases/releases/latest/"
+    "download/micromamba-linux-64"
+)
+PIP_INSTALLERS = ("uv", "pip")
+UV_IMAGE = "ghcr.io/astral-sh/uv:latest"
+WHEELHOUSE = "/wheelhouse"
+BUILDX_CACHE_TYPES = ("local", "registry")
+BUILDX_BUILDER = "conman"
+# Debian based images delete the downloaded packages after each install
+KEEP_APT_CACHE = (
+    "rm -f /etc/apt/apt.conf.d/docker-clean && \\ \n\t"
+    "echo 'Binary::apt::APT::Keep-Downloaded-Packages \"true\";'"
+    " > /etc/apt/apt.conf.d/keep-cache"
+)
 
 
 class Instructions:
@@ -10,21 +61,21 @@ class Instructions:
     """
 
     @classmethod
-    def from_line(cls, line: str, comments: str = ""):
+    def from_line(cls, line: str, comments: str = "", stage: str = None):
         cmd = line.split(" ")[0]
         args = " ".join(line.split(" ")[1:])
-        return cls(cmd, args, comments)
+        return cls(cmd, args, comments, stage=stage)
 
     @classmethod
-    def from_lines(cls, lines: str, comment: str = ""):
+    def from_lines(cls, lines: str, comment: str = "", stage: str = None):
         cmds = []
         argss = []
         for line in lines:
             cmds.append(line.split(" ")[0])
             argss.append(" ".join(line.split(" ")[1:]))
-        return cls(cmds, argss, comment)
+        return cls(cmds, argss, comment, stage=stage)
 
-    def __init__(self, cmds, arguments, comments=""):
+    def __init__(self, cmds, arguments, comments="", stage=None):
         """
         Initialize the Instructions object.
 
@@ -32,9 +83,12 @@ class Instructions:
             cmds (str or list): The command(s) of the instruction.
             arguments (str or list): The argument(s) of the instruction.
             comments (str, optional): Comments for the instruction. Defaults to "".
+            stage (str, optional): The build stage the instruction belongs
+                to, None for single stage Dockerfiles.
         """
         self.cmds = cmds
         self.arguments = arguments
+        self.stage = stage
 
         self.comments = (
             "# " + comments
@@ -86,6 +140,9 @@ class DockerFile:
         add(self, cmds, arguments, comments="")
             Adds a new instruction to the Dockerfile.
 
+        optimize(self, no_install_recommends=False)
+            Merges the adjacent RUN layers and their apt commands.
+
         generate(self, filename)
             Generates the Dockerfile content and writes it to a file.
 
@@ -96,10 +153,15 @@ class DockerFile:
         img_basename: str,
         conda_environment: object = None,
         wdir: str = "./",
+        buildkit: bool = False,
     ):
         """
         Initializes a new instance of the DockerFile class.
 
+        Args:
+            buildkit (bool): Generate for BuildKit, with cache mounts for
+                the apt, conda and pip caches.
+
         Returns:
             None
         """
@@ -107,8 +169,13 @@ class DockerFile:
         self.conda_environment: object = conda_environment
         self.instructions = []
         self.wdir = wdir
+        self.buildkit = buildkit
+        self.stages = []
+        self.current_stage = None
+        # Stages in file order, None stands for the unnamed stage
+        self._stage_order = [None]
 
-    def add(self, cmds, arguments, comments=""):
+    def add(self, cmds, arguments, comments="", stage=None):
         """
         Adds a new instruction to the Dockerfile.
 
@@ -116,12 +183,14 @@ class DockerFile:
             cmds (str): The command of the instruction.
             arguments (str): The arguments of the instruction.
             comments (str): Optional comments for the instruction.
+            stage (str, optional): The target stage, defaults to the current
+                one.
 
         Returns:
             None
         """
 
-        self.instructions.append(Instructions(cmds, arguments, comments))
+        self.add_instruction(Instructions(cmds, arguments, comments, stage))
 
     def add_line(self, line, comments=""):
         """
@@ -136,18 +205,230 @@ class DockerFile:
 
         cmd = line.split(" ")[0]
         args = " ".join(line.split(" ")[1:])
-        self.instructions.append(Instructions(cmd, args, comments))
+        self.add_instruction(Instructions(cmd, args, comments))
 
     def add_instruction(self, instruction: Instructions):
         """
         Adds a new instruction to the Dockerfile.
         Args:
-            instruction (Instructions): The instruction to add.
+            instruction (Instructions): The instruction to add, to the
+                current stage unless it targets one.
         Returns:
             None
         """
+        if instruction.stage is None:
+            instruction.stage = self.current_stage
+        elif instruction.stage not in self.stages:
+            raise ValueError(
+                f"Unknown stage: {instruction.stage}, "
+                f"expected one of {self.stages}"
+            )
         self.instructions.append(instruction)
 
+    def add_stage(
+        self, name: str, base: str, comments: str = "", first: bool = False
+    ):
+        """
+        Starts a new build stage, the next instructions are added to it.
+
+        Args:
+            name (str): The stage name.
+            base (str): The image or stage the stage starts from.
+            comments (str): Optional comments for the FROM instruction.
+            first (bool): Write the stage before the others, e.g. for a
+                stage the others copy from. The current stage is unchanged,
+                instructions must target the new stage explicitly.
+
+        Returns:
+            None
+        """
+
+        if name in self.stages:
+            raise ValueError(f"Stage {name} already exists")
+        self.stages.append(name)
+        if first:
+            self._stage_order.insert(0, name)
+        else:
+            self._stage_order.append(name)
+            self.current_stage = name
+        self.add("FROM", f"{base} AS {name}", comments=comments, stage=name)
+
+    def ordered_instructions(self) -> list:
+        """
+        Returns the instructions grouped by stage, in the stages order.
+
+        Instructions added later to an earlier stage are emitted within that
+        stage.
+
+        Returns:
+            list: The Instructions objects.
+        """
+
+        if not self.stages:
+            return list(self.instructions)
+        return [
+            instruction
+            for stage in self._stage_order
+            for instruction in self.instructions
+            if instruction.stage == stage
+        ]
+
+    def optimize(self, no_install_recommends: bool = False):
+        """
+        Merges the adjacent RUN layers and their apt commands.
+
+        Args:
+            no_install_recommends (bool): Add --no-install-recommends to the
+                apt-get installs.
+
+        Returns:
+            LayerReport: The layer count before and after the pass.
+        """
+
+        from conman.ressources.docker_file_optimizer import (
+            optimize_instructions,
+        )
+
+        self.instructions, report = optimize_instructions(
+            self.ordered_instructions(),
+            no_install_recommends=no_install_recommends,
+        )
+        return report
+
+    def cache_mounts(self, argument: str) -> list:
+        """
+        Returns the BuildKit cache mounts a RUN argument benefits from.
+
+        Args:
+            argument (str): The shell command of the RUN instruction.
+
+        Returns:
+            list: The --mount flags.
+        """
+
+        from conman.ressources.docker_file_optimizer import (
+            APT_INSTALL_ANY,
+            APT_UPDATE_ANY,
+        )
+
+        mounts = []
+        if APT_UPDATE_ANY.search(argument) or APT_INSTALL_ANY.search(argument):
+            mounts += APT_CACHE_MOUNTS
+        if self.conda_environment and CONDA_INSTALL.search(argument):
+            mounts.append(
+                f"--mount=type=cache,"
+                f"target={self.conda_environment.directory}/pkgs,"
+                "sharing=locked"
+            )
+        if PIP_INSTALL.search(argument):
+            mounts.append(PIP_CACHE_MOUNT)
+        return mounts
+
+    def buildkit_run(self, argument):
+        """
+        Adds the cache mounts to a shell-form RUN argument.
+
+        The apt cleanup commands are dropped from RUNs mounting the apt
+        caches, the caches are not part of the image anymore and cleaning
+        them would defeat the mounts.
+
+        Args:
+            argument (str): The shell command of the RUN instruction.
+
+        Returns:
+            str: The new RUN argument.
+        """
+
+        from conman.ressources.docker_file_optimizer import (
+            APT_CLEANUP,
+            RUN_SEPARATOR,
+            split_commands,
+        )
+
+        if not isinstance(argument, str) or argument.lstrip()[:1] in "[-":
+            return argument
+        mounts = self.cache_mounts(argument)
+        if not mounts:
+            return argument
+
+        if mounts[: len(APT_CACHE_MOUNTS)] == APT_CACHE_MOUNTS:
+            commands = split_commands(argument)
+            kept = [cmd for cmd in commands if cmd not in APT_CLEANUP]
+            if kept != commands:
+                argument = RUN_SEPARATOR.join(kept)
+        return RUN_FLAGS_SEPARATOR.join(mounts + [argument.strip()])
+
+    def buildkit_instructions(self) -> list:
+        """
+        Returns the instructions with the BuildKit cache mounts.
+
+        Returns:
+            list: New Instructions objects, self.instructions is unchanged.
+        """
+
+        from conman.ressources.docker_file_optimizer import flatten
+
+        output = []
+        apt_stages = set()
+        for instruction in self.ordered_instructions():
+            arguments = [
+                self.buildkit_run(argument) if cmd == "RUN" else argument
+                for cmd, argument in flatten(instruction)
+            ]
+            if not isinstance(instruction.arguments, list):
+                arguments = arguments[0]
+
+            if APT_CACHE_MOUNTS[0] in str(arguments):
+                apt_stages.add(instruction.stage)
+            output.append(
+                Instructions(
+                    instruction.cmds,
+                    arguments,
+                    instruction.comments,
+                    stage=instruction.stage,
+                )
+            )
+
+        # After the FROM of the stages using apt, stages built on a stage
+        # with the setting inherit it
+        kept, positions = set(), []
+        for ind, instruction in enumerate(output):
+            if instruction.cmds != "FROM":
+                continue
+            base = str(instruction.arguments).split(" ")[0]
+            if base in kept:
+                kept.add(instruction.stage)
+            elif instruction.stage in apt_stages:
+                kept.add(instruction.stage)
+                positions.append(ind)
+        for ind in reversed(positions):
+            output.insert(
+                ind + 1,
+                Instructions(
+                    "RUN",
+                    KEEP_APT_CACHE,
+                    "Keep downloaded apt packages in the cache mount",
+                    stage=output[ind].stage,
+                ),
+            )
+        return output
+
+    def header_lines(self) -> list:
+        """
+        Returns the lines written before the instructions.
+        """
+
+        return [BUILDKIT_SYNTAX + "\n"] if self.buildkit else []
+
+    def rendered_instructions(self) -> list:
+        """
+        Returns the instructions as written to the Dockerfile.
+        """
+
+        if self.buildkit:
+            return self.buildkit_instructions()
+        return self.ordered_instructions()
+
     def closing_file(self):
         self.add(
             cmds=["SHELL", "ENTRYPOINT"],
@@ -167,22 +448,311 @@ class DockerFile:
             None
         """
 
-        with open(filename, "w") as f:
+        with ArtifactWriter(filename) as f:
+            f.writelines(self.header_lines())
             f.writelines(
-                instruction.generate() for instruction in self.instructions
+                instruction.generate()
+                for instruction in self.rendered_instructions()
             )
         print(f"Generated {filename.split('/')[-1]} at: \t {filename}")
         return self
 
+    @staticmethod
+    def buildx_script(
+        classic_cmd: str,
+        basename: str,
+        build_args: list,
+        container_engine: str,
+        cache_type: str,
+        cache_ref: str,
+        cache_mode: str = "max",
+        fallback: bool = True,
+    ) -> str:
+        """
+        Returns a build script using buildx with an exported cache.
+
+        Args:
+            classic_cmd (str): The classic build command, for the fallback.
+            basename (str): The image name and tag.
+            build_args (list): The build arguments.
+            container_engine (str): The container engine command.
+            cache_type (str): One of BUILDX_CACHE_TYPES.
+            cache_ref (str): The cache directory or image reference.
+            cache_mode (str): The cache export mode.
+            fallback (bool): Use classic_cmd when buildx is missing.
+
+        Returns:
+            str: The script content.
+        """
+
+        if cache_type not in BUILDX_CACHE_TYPES:
+            raise ValueError(
+                f"Unknown cache type: {cache_type}, "
+                f"expected one of {BUILDX_CACHE_TYPES}"
+            )
+        if cache_type == "local":
+            cache_from = f"type=local,src={cache_ref}"
+            cache_to = f"type=local,dest={cache_ref},mode={cache_mode}"
+        else:
+            cache_from = f"type=registry,ref={cache_ref}"
+            cache_to = f"type=registry,ref={cache_ref},mode={cache_mode}"
+
+        buildx = f"{container_engine} buildx"
+        options = [
+            f"--builder {BUILDX_BUILDER}",
+            "-f ./Dockerfile.root",
+            f"-t {basename}",
+            "--load",
+            f'--cache-from "{cache_from}"',
+            f'--cache-to "{cache_to}"',
+            *(f"--build-arg {arg}" for arg in build_args),
+        ]
+        build = f"{buildx} build " + " \\\n\t".join(options) + " ."
+        # The default docker driver cannot export a cache, the host network
+        # lets the builder reach a local registry
+        create = (
+            f"{buildx} inspect {BUILDX_BUILDER} > /dev/null 2>&1 || \\\n\t"
+            f"{buildx} create --name {BUILDX_BUILDER} "
+            "--driver docker-container --driver-opt network=host"
+        )
+
+        lines = ["#!/bin/bash", "set -e", ""]
+        if fallback:
+            lines += [
+                f"if {buildx} version > /dev/null 2>&1; then",
+                "\t" + create.replace("\n\t", "\n\t\t"),
+                "\t" + build.replace("\n\t", "\n\t\t"),
+                "else",
+                '\techo "buildx not found, building without cache export"',
+                f"\t{classic_cmd}",
+                "fi",
+            ]
+        else:
+            lines += [create, build]
+        return "\n".join(lines) + "\n"
+
     def default_debian_root_instruction(self):
         self.add(
             "FROM",
             f"{self.img_basename}",
             comments="Source image",
         )
+        self.system_instruction()
+
+        # Conda settings and installation
+        if self.conda_environment:
+            self.conda_variables_instruction()
+            self.umask_instruction()
+            self.miniconda_instruction()
+            self.conda_env_instruction()
+            self.conda_activation_instruction()
+
+    def multi_stage_root_instruction(
+        self,
+        builder: str = "builder",
+        runtime: str = "runtime",
+        runtime_packages: list = DEFAULT_RUNTIME_PACKAGES,
+    ):
+        """
+        Adds a builder stage with the build tools and the conda solve, and a
+        runtime stage with the runtime libraries and the conda install only.
+
+        Args:
+            builder (str): The builder stage name.
+            runtime (str): The runtime stage name.
+            runtime_packages (list): The apt packages of the runtime stage.
+
+        Returns:
+            None
+        """
+
+        self.add_stage(builder, self.img_basename, comments="Builder stage")
+        self.system_instruction()
+        if self.conda_environment:
+            self.conda_variables_instruction()
+            self.umask_instruction()
+            self.miniconda_instruction()
+            self.conda_env_instruction()
+            self.add(
+                "RUN",
+                "conda clean -afy",
+                comments="Drop the conda package cache before the copy",
+            )
+
+        self.add_stage(runtime, self.img_basename, comments="Runtime stage")
+        self.add("ENV", DEBIAN_ENV)
+        self.apt_install_instruction(
+            runtime_packages, comments="Runtime libraries"
+        )
+        self.add(
+            "RUN",
+            ["locale-gen en_US.UTF-8", "dpkg-reconfigure locales"],
+            comments="Locales update",
+        )
+        if self.conda_environment:
+            self.conda_copy_instruction(builder)
+
+    def parallel_root_instruction(
+        self, builder: str = "builder", runtime: str = "runtime"
+    ):
+        """
+        Adds the default root image as independent stages, which BuildKit
+        builds concurrently and caches separately: the system packages and
+        the miniconda install, joined in the conda env solve stage (builder)
+        so that pip can build packages with the system build tools, and the
+        runtime stage.
+
+        Args:
+            builder (str): The conda env solve stage name.
+            runtime (str): The final stage name.
+
+        Returns:
+            None
+        """
+
+        self.add_stage(
+            SYSTEM_STAGE, self.img_basename, comments="System packages stage"
+        )
+        self.system_instruction()
 
+        if self.conda_environment:
+            self.add_stage(
+                MINICONDA_STAGE, self.img_basename, comments="Miniconda stage"
+            )
+            self.add("ENV", DEBIAN_ENV)
+            self.apt_install_instruction(
+                MINICONDA_PACKAGES, comments="Installer download tools"
+            )
+            self.conda_variables_instruction()
+            self.miniconda_instruction()
+
+            self.add_stage(
+                builder, SYSTEM_STAGE, comments="Conda env solve stage"
+            )
+            self.conda_variables_instruction()
+            self.umask_instruction()
+            directory = self.conda_environment.directory
+            self.add(
+                "COPY",
+                f"--from={MINICONDA_STAGE} {directory} {directory}",
+                comments="Miniconda install",
+            )
+            self.conda_env_instruction()
+            self.add(
+                "RUN",
+                "conda clean -afy",
+                comments="Drop the conda package cache before the copy",
+            )
+        else:
+            self.add_stage(builder, SYSTEM_STAGE, comments="Builder stage")
+
+        self.add_stage(runtime, SYSTEM_STAGE, comments="Runtime stage")
+        if self.conda_environment:
+            self.conda_copy_instruction(builder)
+
+    def apt_install_instruction(self, packages: list, comments: str = ""):
+        # Single layer install, leaving no apt cache nor lists behind
+        self.add(
+            "RUN",
+            "apt-get update && \\ \n\t"
+            f"apt-get install -y {' '.join(sorted(packages))} && \\ \n\t"
+            "apt-get clean && \\ \n\t"
+            "rm -rf /var/lib/apt/lists/*",
+            comments=comments,
+        )
+
+    def wheelhouse_instruction(
+        self,
+        requirements_filename: str,
+        installer: str = "uv",
+        python_version: str = "3.8",
+        stage: str = "wheelhouse",
+    ):
+        """
+        Adds a stage building the wheels of a requirements file, and installs
+        them in the current stage without reaching the package index.
+
+        The stage only depends on the requirements file, unchanged
+        requirements reuse the cached wheels. The wheels are bind-mounted,
+        BuildKit is required: a copy would leave them in an image layer.
+
+        Args:
+            requirements_filename (str): The requirements file, in the build
+                context.
+            installer (str): One of PIP_INSTALLERS.
+            python_version (str): The Python version the wheels are built
+                for, the one of the conda env or of the system.
+            stage (str): The wheelhouse stage name.
+
+        Returns:
+            None
+        """
+
+        if installer not in PIP_INSTALLERS:
+            raise ValueError(
+                f"Unknown pip installer: {installer}, "
+                f"expected one of {PIP_INSTALLERS}"
+            )
+        if not self.buildkit:
+            raise ValueError("The wheelhouse requires BuildKit")
+
+        requirements = f"{WHEELHOUSE}/requirements.txt"
+        self.add_stage(
+            stage,
+            f"python:{python_version}-slim",
+            comments="Wheelhouse stage",
+            first=True,
+        )
+        self.add(
+            ["COPY", "RUN"],
+            [
+                f"{os.path.relpath(requirements_filename, self.wdir)} "
+                f"{requirements}",
+                f"pip wheel --wheel-dir {WHEELHOUSE} -r {requirements}",
+            ],
+            comments="Building or downloading the wheels",
+            stage=stage,
+        )
+
+        if self.conda_environment:
+            python = "$CONDA_ENV_BIN_PATH/python"
+        else:
+            python = "python3"
+            packages = ["python3"] + (["python3-pip"] * (installer == "pip"))
+            self.apt_install_instruction(packages, comments="Python")
+
+        if installer == "uv":
+            self.add(
+                "COPY",
+                f"--from={UV_IMAGE} /uv /usr/local/bin/uv",
+                comments="uv installer",
+            )
+            install = f"uv pip install --python {python}"
+        else:
+            install = f"{python} -m pip install"
+        install += f" --no-index --find-links {WHEELHOUSE} -r {requirements}"
+
+        self.add(
+            "RUN",
+            f"--mount=type=bind,from={stage},source={WHEELHOUSE},"
+            f"target={WHEELHOUSE}{RUN_FLAGS_SEPARATOR}{install}",
+            comments="Python packages from the wheelhouse",
+        )
+
+    def conda_copy_instruction(self, builder: str):
+        self.conda_variables_instruction()
+        self.umask_instruction()
+        directory = self.conda_environment.directory
+        self.add(
+            "COPY",
+            f"--from={builder} {directory} {directory}",
+            comments="Conda install and environment from the builder",
+        )
+        self.conda_activation_instruction()
+
+    def system_instruction(self):
         # Set Debian frontend to noninteractive
-        self.add("ENV", 'DEBIAN_FRONTEND="noninteractive" TZ="Europe/Paris"')
+        self.add("ENV", DEBIAN_ENV)
 
         # Add basics libraries
         self.add("RUN", "apt-get update", comments="Updating apt cache")
@@ -221,83 +791,165 @@ class DockerFile:
 
         self.add("RUN", "apt-get clean", comments="Cleaning apt cache")
 
-        # Conda settings and installation
-        if self.conda_environment:
-            # Add conda arguments
-            self.add(
-                "ENV",
-                [
-                    f"CONDA_DIRECTORY={self.conda_environment.directory}",
-                    f"CONDA_ENV_NAME={self.conda_environment.env_name}",
-                ],
-                comments="CONDA ENV",
-            )
+    def conda_variables_instruction(self):
+        # Add conda arguments
+        self.add(
+            "ENV",
+            [
+                f"CONDA_DIRECTORY={self.conda_environment.directory}",
+                f"CONDA_ENV_NAME={self.conda_environment.env_name}",
+            ],
+            comments="CONDA ENV",
+        )
 
-            # Define conda environment variables
-            self.add(
-                "ENV",
-                [
-                    "CONDA_DIRECTORY $CONDA_DIRECTORY",
-                    "CONDA_ENV_NAME $CONDA_ENV_NAME",
-                    "CONDA_BIN_PATH $CONDA_DIRECTORY/condabin/conda",
-                    "CONDA_ENV_BIN_PATH $CONDA_DIRECTORY/envs/$CONDA_ENV_NAME/bin",
-                    "CONDA_ENV_PATH $CONDA_DIRECTORY/envs/$CONDA_ENV_NAME",
-                ],
-                comments="Conda environment variables",
-            )
+        # Define conda environment variables
+        self.add(
+            "ENV",
+            [
+                "CONDA_DIRECTORY $CONDA_DIRECTORY",
+                "CONDA_ENV_NAME $CONDA_ENV_NAME",
+                "CONDA_BIN_PATH $CONDA_DIRECTORY/condabin/conda",
+                "CONDA_ENV_BIN_PATH $CONDA_DIRECTORY/envs/$CONDA_ENV_NAME/bin",
+                "CONDA_ENV_PATH $CONDA_DIRECTORY/envs/$CONDA_ENV_NAME",
+            ],
+            comments="Conda environment variables",
+        )
 
-            # Add conda executable to PATH
+        # Add conda executable to PATH
 
-            self.add(
-                "ENV",
-                "PATH $CONDA_DIRECTORY/condabin/:$PATH",
-                comments="Add conda executable to PATH",
-            )
+        self.add(
+            "ENV",
+            "PATH $CONDA_DIRECTORY/condabin/:$PATH",
+            comments="Add conda executable to PATH",
+        )
 
-            # Setting umask to 0000
+    def umask_instruction(self):
+        # Setting umask to 0000
 
-            self.add(
-                "RUN",
-                [
-                    'line_num=$(cat /etc/pam.d/common-session | grep -n umask | cut -d: -f1 | tail -1) && \ \n\tsed -i "${line_num}s/.*/session optional pam_umask.so umask=000/" /etc/pam.d/common-session',
-                    'line_num=$(cat /etc/login.defs | grep -n UMASK | cut -d: -f1 | tail -1) && \ \n\tsed -i "${line_num}s/.*/UMASK               000/" /etc/pam.d/common-session',
-                    "echo 'umask 000' >> ~/.profile",
-                ],
-                comments="Setting umask",
-            )
+        self.add(
+            "RUN",
+            [
+                'line_num=$(cat /etc/pam.d/common-session | grep -n umask | cut -d: -f1 | tail -1) && \ \n\tsed -i "${line_num}s/.*/session optional pam_umask.so umask=000/" /etc/pam.d/common-session',
+                'line_num=$(cat /etc/login.defs | grep -n UMASK | cut -d: -f1 | tail -1) && \ \n\tsed -i "${line_num}s/.*/UMASK               000/" /etc/pam.d/common-session',
+                "echo 'umask 000' >> ~/.profile",
+            ],
+            comments="Setting umask",
+        )
 
-            # Installing miniconda
-            self.add(
-                "RUN",
-                "umask 000 && \ \n\tmkdir -p ${CONDA_DIRECTORY} && \ \n\tchmod 777 ${CONDA_DIRECTORY} && \ \n\twget --quiet https://repo.anaconda.com/miniconda/Miniconda3-latest-Linux-x86_64.sh -O ~/miniconda.sh && \ \n\tbin/bash ~/miniconda.sh -ub -p $CONDA_DIRECTORY && \ \n\trm ~/miniconda.sh",
-                comments="Installing miniconda",
+    def miniconda_instruction(self):
+        # Installing miniconda
+        self.add(
+            "RUN",
+            "umask 000 && \ \n\tmkdir -p ${CONDA_DIRECTORY} && \ \n\tchmod 777 ${CONDA_DIRECTORY} && \ \n\twget --quiet https://repo.anaconda.com/miniconda/Miniconda3-latest-Linux-x86_64.sh -O ~/miniconda.sh && \ \n\tbin/bash ~/miniconda.sh -ub -p $CONDA_DIRECTORY && \ \n\trm ~/miniconda.sh",
+            comments="Installing miniconda",
+        )
+
+    def conda_env_instruction(self):
+        solver = getattr(self.conda_environment, "solver", "classic")
+        lockfile = getattr(self.conda_environment, "lockfile", "")
+        if solver not in CONDA_SOLVERS:
+            raise ValueError(
+                f"Unknown conda solver: {solver}, "
+                f"expected one of {CONDA_SOLVERS}"
             )
 
-            conda_src_dir = Path(f"./conda/")
-            if len(self.conda_environment.env_filename.split("/")) > 1:
-                conda_src_dir = Path(
-                    f"{conda_src_dir / self.conda_environment.env_filename.split('/')[-1]}"
-                )
-            else:
-                conda_src_dir = conda_src_dir / self.conda_environment.env_filename
+        if lockfile:
+            self.conda_lock_instruction(solver, lockfile)
+            return
 
-            self.add(
-                ["COPY", "RUN"],
-                [
-                    f"{conda_src_dir} /tmp/environment.yml",
-                    "umask 000 && \ \n\tconda update -n base conda && \ \n\tconda create -y -n $CONDA_ENV_NAME && \ \n\tconda env update --name $CONDA_ENV_NAME --file /tmp/environment.yml --prune ",
-                ],
-                comments="Conda env creation",
+        # A single solve instead of the classic three
+        if solver == "libmamba":
+            create = (
+                "CONDA_SOLVER=libmamba conda env create "
+                "--name $CONDA_ENV_NAME --file /tmp/environment.yml"
+            )
+        elif solver == "micromamba":
+            create = (
+                f"{self.micromamba_download()} && \\ \n\t"
+                "micromamba create -y -r $CONDA_DIRECTORY "
+                "-n $CONDA_ENV_NAME -f /tmp/environment.yml"
+            )
+        else:
+            create = (
+                "conda update -n base conda && \\ \n\t"
+                "conda create -y -n $CONDA_ENV_NAME && \\ \n\t"
+                "conda env update --name $CONDA_ENV_NAME "
+                "--file /tmp/environment.yml --prune "
             )
 
-            self.add(
-                "RUN",
-                [
-                    'echo ". /opt/conda/etc/profile.d/conda.sh" >> ~/.bashrc',
-                    'echo "conda activate $CONDA_ENV_NAME" >> ~/.bashrc',
-                ],
-                comments="Conda env activation for root user",
+        env_file = self.conda_context_path(self.conda_environment.env_filename)
+        self.add(
+            ["COPY", "RUN"],
+            [
+                f"{env_file} /tmp/environment.yml",
+                f"umask 000 && \\ \n\t{create}",
+            ],
+            comments="Conda env creation",
+        )
+
+    @staticmethod
+    def conda_context_path(filename: str) -> Path:
+        """
+        Returns the path of a conda file in the build context.
+        """
+
+        return Path("./conda/") / filename.split("/")[-1]
+
+    @staticmethod
+    def micromamba_download() -> str:
+        return (
+            f"wget --quiet {MICROMAMBA_URL} -O /usr/local/bin/micromamba && "
+            "\\ \n\tchmod +x /usr/local/bin/micromamba"
+        )
+
+    def conda_lock_instruction(self, solver: str, lockfile: str):
+        """
+        Creates the conda env from an explicit lockfile, without solving.
+
+        The pip packages of a conda-lock explicit lockfile are listed as
+        "# pip" comments, they are installed without dependencies.
+
+        Args:
+            solver (str): One of CONDA_SOLVERS.
+            lockfile (str): The explicit lockfile path.
+
+        Returns:
+            None
+        """
+
+        if solver == "micromamba":
+            create = (
+                f"{self.micromamba_download()} && \\ \n\t"
+                "micromamba create -y -r $CONDA_DIRECTORY "
+                "-n $CONDA_ENV_NAME -f /tmp/conda.lock"
             )
+        else:
+            create = (
+                "conda create -y -n $CONDA_ENV_NAME --file /tmp/conda.lock"
+            )
+        self.add(
+            ["COPY", "RUN"],
+            [
+                f"{self.conda_context_path(lockfile)} /tmp/conda.lock",
+                f"umask 000 && \\ \n\t{create} && \\ \n\t"
+                "(grep '^# pip ' /tmp/conda.lock | sed 's/^# pip //' "
+                "> /tmp/requirements.txt || true) && \\ \n\t"
+                "if [ -s /tmp/requirements.txt ]; then "
+                "$CONDA_ENV_BIN_PATH/pip install --no-deps "
+                "-r /tmp/requirements.txt; fi",
+            ],
+            comments="Conda env creation from the lockfile",
+        )
+
+    def conda_activation_instruction(self):
+        self.add(
+            "RUN",
+            [
+                'echo ". /opt/conda/etc/profile.d/conda.sh" >> ~/.bashrc',
+                'echo "conda activate $CONDA_ENV_NAME" >> ~/.bashrc',
+            ],
+            comments="Conda env activation for root user",
+        )
 
     def default_user_instruction(
         self,
@@ -386,31 +1038,58 @@ class DockerFile:
         filename: str = "run.sh",
         container_engine: str = "docker",
         enable_nvidia_gpu: bool = False,
+        cache_type: str = None,
+        cache_ref: str = None,
+        cache_mode: str = "max",
+        fallback: bool = True,
     ):
+        """
+        Writes the script building the image of the Dockerfile.
+
+        Args:
+            basename (str): The image name and tag.
+            filename (str): The script path.
+            container_engine (str): The container engine command.
+            enable_nvidia_gpu (bool): Pass the GPU compute capability.
+            cache_type (str, optional): Build with buildx and share its
+                cache, one of BUILDX_CACHE_TYPES.
+            cache_ref (str, optional): The cache directory (local) or image
+                reference (registry).
+            cache_mode (str): The cache export mode, "min" or "max".
+            fallback (bool): Use the classic builder when buildx is missing.
+
+        Returns:
+            None
+        """
+
         build_args = []
 
         if enable_nvidia_gpu:
-            proc = subprocess.Popen(
-                [
-                    "nvidia-container-cli info | grep Architecture | grep -oe '\([0-9.]*\)'"
-                ],
-                stdout=subprocess.PIPE,
-                shell=True,
-            )
-            (out, err) = proc.communicate()
-            compute_capability = out.decode("utf-8").strip()
+            compute_capability = get_host_facts().compute_capability()
             print("GPU COMPUTE CAPABILITY:", compute_capability)
             build_args.append(f"COMPUTE_CAPABILITY={compute_capability}")
 
         cmd = f"{container_engine} build -f ./Dockerfile.root -t {basename}"
+        if self.buildkit:
+            cmd = "DOCKER_BUILDKIT=1 " + cmd
         for arg in build_args:
             cmd += f" --build-arg {arg}"
         cmd += " ."
 
-        with open(filename, "w") as file:
-            file.write(cmd)
+        if cache_type is not None:
+            cmd = self.buildx_script(
+                classic_cmd=cmd,
+                basename=basename,
+                build_args=build_args,
+                container_engine=container_engine,
+                cache_type=cache_type,
+                cache_ref=cache_ref,
+                cache_mode=cache_mode,
+                fallback=fallback,
+            )
 
         # For posix plateform apply chmod +x
-        if os.name == "posix":
-            os.chmod(filename, 0o755)
+        write_artifact(
+            filename, cmd, mode=0o755 if os.name == "posix" else None
+        )
         print(f"Generated {filename.split('/')[-1]} at: \t {filename}")
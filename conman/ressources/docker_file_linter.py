@@ -0,0 +1,413 @@
+"""
+Cache-friendliness linter for the instructions of a DockerFile.
+
+Each rule flags a pattern that makes Docker rebuild layers more often than
+needed, or keep stale or useless data in cached layers. A finding holds the
+rule id, the Dockerfile line, and its estimated impact: the number of layers
+the pattern affects.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+from conman.ressources.docker_file_optimizer import (
+    APT_INSTALL_ANY,
+    APT_UPDATE_ANY,
+    LAYER_COMMANDS,
+    flatten,
+    split_commands,
+)
+
+SEVERITIES = ("low", "medium", "high")
+
+HEAVY_RUN = re.compile(
+    r"\bapt(-get)?\s+install\b"
+    r"|\bconda\s+(create|install|update|env\s+update)\b"
+    r"|\bpip3?\s+install\b"
+    r"|\b(wget|curl|make|cmake)\b"
+    r"|\bgit\s+clone\b"
+    r"|\bnpm\s+(install|ci)\b"
+)
+# Commands that fill a cache CLEANUP removes
+CACHE_FILLING = re.compile(
+    r"\bapt(-get)?\s+(install|update)\b|\bconda\s+|\bpip3?\s+install\b"
+)
+CLEANUP = re.compile(
+    r"^(apt-get\s+clean|apt\s+clean|conda\s+clean\b.*|pip3?\s+cache\s+purge"
+    r"|rm\s+-r?f\s+(-r\s+)?(/var/lib/apt/lists/\S*|/tmp/\S*"
+    r"|/var/cache/apt/\S*|~/\.cache/\S*|/root/\.cache/\S*))$"
+)
+DOWNLOAD = re.compile(r"\b(wget|curl)\b[^&|;]*?(https?://\S+)")
+CHECKSUM = re.compile(r"\b(sha256sum|sha512sum|md5sum|gpg)\b|--checksum")
+UNPINNED_URL = re.compile(r"latest|master|main|nightly|/download/?$", re.I)
+# Arguments differing between the users sharing an image
+USER_ARG = re.compile(r"USER|UID|GID|HOME", re.I)
+# Variables consumed implicitly by the tools of the later layers
+IMPLICIT_ENV = {
+    "DEBIAN_FRONTEND",
+    "TZ",
+    "PATH",
+    "LANG",
+    "LANGUAGE",
+    "LC_ALL",
+    "SHELL",
+    "HOME",
+    "HTTP_PROXY",
+    "HTTPS_PROXY",
+    "NO_PROXY",
+    "PIP_NO_CACHE_DIR",
+}
+
+
+@dataclass
+class Line:
+    """
+    An instruction line of a rendered Dockerfile.
+
+    Attributes:
+        number (int): The line number, starting at 1.
+        cmd (str): The instruction command.
+        argument (str): The instruction argument.
+        stage (str): The build stage, None for single stage Dockerfiles.
+        section (str): The comment of the instructions block.
+    """
+
+    number: int
+    cmd: str
+    argument: str
+    stage: Optional[str] = None
+    section: str = ""
+
+
+@dataclass
+class Finding:
+    """
+    A cache-unfriendly pattern found in a Dockerfile.
+
+    Attributes:
+        rule (str): The rule id.
+        severity (str): One of SEVERITIES.
+        line (int): The Dockerfile line number.
+        message (str): What was found and how to fix it.
+        impact (int): The number of layers affected.
+        section (str): The comment of the instructions block, which tells
+            extra_instructions apart from the generated ones.
+    """
+
+    rule: str
+    severity: str
+    line: int
+    message: str
+    impact: int
+    section: str = ""
+
+    def __str__(self) -> str:
+        section = f" ({self.section})" if self.section else ""
+        return (
+            f"{self.line}: {self.rule} [{self.severity}] {self.message}, "
+            f"impact: {self.impact} layer{'s' * (self.impact != 1)}{section}"
+        )
+
+
+def instruction_lines(instructions: List, first_line: int = 1) -> List[Line]:
+    """
+    Returns the instruction lines of rendered Instructions objects.
+
+    Args:
+        instructions (list): The Instructions objects, in file order.
+        first_line (int): The line number of the first instruction block.
+
+    Returns:
+        list: The Line objects.
+    """
+
+    lines = []
+    number = first_line
+    for instruction in instructions:
+        current = number + instruction.comments.count("\n") + 1
+        section = instruction.comments.lstrip("# ").split("\n")[0]
+        for cmd, argument in flatten(instruction):
+            argument = str(argument)
+            lines.append(
+                Line(current, cmd, argument, instruction.stage, section)
+            )
+            current += argument.count("\n") + 1
+        number += instruction.generate().count("\n")
+    return lines
+
+
+def stage_lines(lines: List[Line], ind: int) -> List[Line]:
+    """
+    Returns the lines following lines[ind] in the same stage.
+    """
+
+    later = []
+    for line in lines[ind + 1 :]:
+        if line.cmd == "FROM":
+            break
+        later.append(line)
+    return later
+
+
+def is_heavy(line: Line) -> bool:
+    return line.cmd == "RUN" and bool(HEAVY_RUN.search(line.argument))
+
+
+def references(line: Line, name: str) -> bool:
+    return bool(re.search(rf"\$\{{?{re.escape(name)}\b", line.argument))
+
+
+def count_layers(lines: List[Line]) -> int:
+    return sum(line.cmd in LAYER_COMMANDS for line in lines)
+
+
+def env_names(line: Line) -> List[str]:
+    """
+    Returns the variables an ENV line sets.
+    """
+
+    tokens = line.argument.split()
+    if tokens and "=" not in tokens[0]:
+        return tokens[:1]
+    return [token.split("=")[0] for token in tokens if "=" in token]
+
+
+def runs_before_reference(
+    later: List[Line], names: List[str], heavy: bool = False
+) -> List[Line]:
+    """
+    Returns the RUN lines before the first one referencing one of names.
+
+    ENV lines copying one of names are followed, as they carry the value to
+    the later RUNs.
+    """
+
+    names = list(names)
+    runs = []
+    for line in later:
+        if any(references(line, name) for name in names):
+            if line.cmd != "ENV":
+                break
+            names.extend(env_names(line))
+            continue
+        if line.cmd == "RUN" and (is_heavy(line) or not heavy):
+            runs.append(line)
+    return runs
+
+
+def rule_apt_update_alone(lines: List[Line]) -> Iterable[Finding]:
+    for ind, line in enumerate(lines):
+        if line.cmd != "RUN" or not APT_UPDATE_ANY.search(line.argument):
+            continue
+        if APT_INSTALL_ANY.search(line.argument):
+            continue
+        installs = [
+            later
+            for later in stage_lines(lines, ind)
+            if later.cmd == "RUN" and APT_INSTALL_ANY.search(later.argument)
+        ]
+        yield Finding(
+            "CM001",
+            "high",
+            line.number,
+            "apt-get update in a separate layer, the cached lists go stale "
+            "for the later installs: update and install in the same RUN",
+            len(installs),
+            line.section,
+        )
+
+
+def rule_copy_before_heavy_run(lines: List[Line]) -> Iterable[Finding]:
+    for ind, line in enumerate(lines):
+        if line.cmd not in ("COPY", "ADD") or "--from=" in line.argument:
+            continue
+        sources = line.argument.split()
+        destination = sources[-1]
+        names = {destination.rstrip("/")} | {
+            source.rstrip("/").split("/")[-1]
+            for source in sources[:-1]
+            if not source.startswith("--")
+        }
+        heavy = [
+            later
+            for later in stage_lines(lines, ind)
+            if is_heavy(later)
+            and not any(name and name in later.argument for name in names)
+        ]
+        if heavy:
+            yield Finding(
+                "CM002",
+                "medium",
+                line.number,
+                f"{line.cmd} of {' '.join(sources[:-1])} before heavy RUNs "
+                "that do not use it, each change rebuilds them: copy it "
+                "after them",
+                len(heavy),
+                line.section,
+            )
+
+
+def rule_cleanup_separate_layer(lines: List[Line]) -> Iterable[Finding]:
+    # Cleaning a stage copied from by another one shrinks the copy
+    copied = {
+        match.group(1)
+        for line in lines
+        if line.cmd == "COPY"
+        for match in [re.search(r"--from=(\S+)", line.argument)]
+        if match
+    }
+    for ind, line in enumerate(lines):
+        if line.cmd != "RUN" or line.stage in copied:
+            continue
+        commands = split_commands(line.argument)
+        if not all(CLEANUP.match(command) for command in commands):
+            continue
+        filling = [
+            earlier
+            for earlier in lines[:ind]
+            if earlier.cmd == "RUN"
+            and earlier.stage == line.stage
+            and CACHE_FILLING.search(earlier.argument)
+        ]
+        yield Finding(
+            "CM003",
+            "medium",
+            line.number,
+            "Cleanup in a separate layer, the files stay in the earlier "
+            "layers: clean up in the RUN that created them",
+            len(filling),
+            line.section,
+        )
+
+
+def rule_unpinned_download(lines: List[Line]) -> Iterable[Finding]:
+    for ind, line in enumerate(lines):
+        if line.cmd != "RUN":
+            continue
+        for match in DOWNLOAD.finditer(line.argument):
+            url = match.group(2)
+            if UNPINNED_URL.search(url) or not CHECKSUM.search(line.argument):
+                yield Finding(
+                    "CM004",
+                    "medium",
+                    line.number,
+                    f"Unpinned download of {url}, the cached layer keeps a "
+                    "stale copy: download a versioned URL and check its "
+                    "checksum",
+                    1 + count_layers(stage_lines(lines, ind)),
+                    line.section,
+                )
+                break
+
+
+def rule_early_user_arg(lines: List[Line]) -> Iterable[Finding]:
+    in_stage = False
+    for ind, line in enumerate(lines):
+        in_stage |= line.cmd == "FROM"
+        # Arguments declared before the first FROM only apply to FROM
+        if line.cmd != "ARG" or not in_stage:
+            continue
+        names = [line.argument.split("=")[0].strip()]
+        if not USER_ARG.search(names[0]):
+            continue
+        # Every RUN uses the arguments implicitly, they all miss the cache
+        # when the user changes
+        runs = runs_before_reference(stage_lines(lines, ind), names)
+        if runs:
+            yield Finding(
+                "CM005",
+                "medium" if any(is_heavy(run) for run in runs) else "low",
+                line.number,
+                f"Per-user ARG {names[0]} declared before RUNs that do not "
+                "use it, they are rebuilt for every user: declare it just "
+                "before its first use",
+                len(runs),
+                line.section,
+            )
+
+
+def rule_early_env(lines: List[Line]) -> Iterable[Finding]:
+    user_args = [
+        line.argument.split("=")[0].strip()
+        for line in lines
+        if line.cmd == "ARG" and USER_ARG.search(line.argument.split("=")[0])
+    ]
+    for ind, line in enumerate(lines):
+        if line.cmd != "ENV":
+            continue
+        names = env_names(line)
+        if not names or any(name in IMPLICIT_ENV for name in names):
+            continue
+        # Re-exports are reported on the first definition, copies of
+        # per-user arguments with the ARG
+        if any(references(line, name) for name in names + user_args):
+            continue
+        runs = runs_before_reference(
+            stage_lines(lines, ind), names, heavy=True
+        )
+        if runs:
+            yield Finding(
+                "CM006",
+                "low",
+                line.number,
+                f"ENV {', '.join(names)} set before heavy RUNs that do not "
+                "use it, changing it rebuilds them: set it after them",
+                len(runs),
+                line.section,
+            )
+
+
+RULES: Dict[str, Callable[[List[Line]], Iterable[Finding]]] = {
+    "CM001": rule_apt_update_alone,
+    "CM002": rule_copy_before_heavy_run,
+    "CM003": rule_cleanup_separate_layer,
+    "CM004": rule_unpinned_download,
+    "CM005": rule_early_user_arg,
+    "CM006": rule_early_env,
+}
+
+
+def lint_dockerfile(docker_file, ignore: Iterable[str] = ()) -> List[Finding]:
+    """
+    Lints the instructions of a DockerFile, as they would be written.
+
+    Args:
+        docker_file (DockerFile): The Dockerfile.
+        ignore (list): Rule ids to skip.
+
+    Returns:
+        list: The findings, sorted by line.
+    """
+
+    lines = instruction_lines(
+        docker_file.rendered_instructions(),
+        first_line=len(docker_file.header_lines()) + 1,
+    )
+    findings = [
+        finding
+        for rule, check in RULES.items()
+        if rule not in ignore
+        for finding in check(lines)
+    ]
+    return sorted(findings, key=lambda finding: (finding.line, finding.rule))
+
+
+def exceeds_threshold(findings: List[Finding], fail_on: str) -> bool:
+    """
+    Checks if a finding is at least as severe as a threshold.
+
+    Args:
+        findings (list): The findings.
+        fail_on (str): The threshold, one of SEVERITIES.
+
+    Returns:
+        bool: True if the threshold is reached.
+    """
+
+    threshold = SEVERITIES.index(fail_on)
+    return any(
+        SEVERITIES.index(finding.severity) >= threshold for finding in findings
+    )
@@ -0,0 +1,326 @@
+"""
+Optimization pass over the instructions of a DockerFile.
+
+Adjacent shell-form RUN instructions are merged into a single layer. Inside a
+merged layer, redundant "apt-get update" calls are dropped, consecutive
+"apt-get install -y" calls are merged with a sorted package list, and the
+apt cleanup is moved to the end of the layer that filled the apt cache.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+LAYER_COMMANDS = ("RUN", "COPY", "ADD")
+RUN_SEPARATOR = " && \\ \n\t"
+APT_CLEANUP = ["apt-get clean", "rm -rf /var/lib/apt/lists/*"]
+NO_INSTALL_RECOMMENDS = "--no-install-recommends"
+
+# Commands changing the state of the shell, which would leak into the next
+# commands once merged
+STATEFUL_COMMAND = re.compile(
+    r"(^|&&|;|\|\|)\s*(cd|export|umask|source|\.|set|unset|alias)\s"
+)
+# Arguments that are not split on "&&": quoting, pipes, subshells
+COMPLEX_SHELL = re.compile(r"""['"|;()`]""")
+AND_SEPARATOR = re.compile(r"\s*(?:\\[ \t]*\n\s*)?&&(?:\s*\\[ \t]*\n)?\s*")
+APT_UPDATE = re.compile(r"^apt(-get)?\s+update$")
+APT_GET_INSTALL = re.compile(r"^apt-get\s+install\s+(.*)$")
+APT_INSTALL_ANY = re.compile(r"\bapt(-get)?\s+install\b")
+APT_UPDATE_ANY = re.compile(r"\bapt(-get)?\s+update\b")
+APT_CLEAN = re.compile(r"^apt-get\s+clean$")
+APT_YES = ("-y", "--yes")
+
+
+@dataclass
+class LayerReport:
+    """
+    Number of layers of a Dockerfile before and after optimization.
+
+    Attributes:
+        before (int): Layer count before the pass.
+        after (int): Layer count after the pass.
+    """
+
+    before: int
+    after: int
+
+    def __str__(self) -> str:
+        return f"{self.before} -> {self.after} layers"
+
+
+def flatten(instruction) -> List[Tuple[str, str]]:
+    """
+    Returns the (command, argument) lines of an Instructions object.
+    """
+
+    cmds, arguments = instruction.cmds, instruction.arguments
+    if not isinstance(arguments, list):
+        return [(cmds, arguments)]
+    if isinstance(cmds, list):
+        return [(cmds[ind], arg) for ind, arg in enumerate(arguments)]
+    return [(cmds, arg) for arg in arguments]
+
+
+def count_layers(instructions: List) -> int:
+    """
+    Counts the instructions creating a filesystem layer.
+    """
+
+    return sum(
+        cmd in LAYER_COMMANDS
+        for instruction in instructions
+        for cmd, _ in flatten(instruction)
+    )
+
+
+def is_mergeable(cmd: str, argument) -> bool:
+    """
+    Checks if a line is a RUN that can share a layer with its neighbours.
+    """
+
+    if cmd != "RUN" or not isinstance(argument, str):
+        return False
+    argument = argument.strip()
+    if argument.startswith("[") or argument.startswith("--"):
+        return False
+    return not STATEFUL_COMMAND.search(argument)
+
+
+def split_commands(argument: str) -> List[str]:
+    """
+    Splits a RUN argument on "&&" when it holds only simple commands.
+    """
+
+    argument = argument.strip()
+    if COMPLEX_SHELL.search(argument):
+        return [argument]
+    return [cmd for cmd in AND_SEPARATOR.split(argument) if cmd]
+
+
+def has_list_operator(command: str) -> bool:
+    """
+    Checks if a command holds a ";", "||", "&" or newline outside of quotes
+    and parentheses, which would bind looser than the "&&" of a merged layer.
+    """
+
+    depth, quote, ind = 0, None, 0
+    while ind < len(command):
+        char = command[ind]
+        if char == "\\" and quote != "'":
+            # Escaped character or line continuation
+            ind += 2
+            continue
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"`":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif depth == 0:
+            pair = command[ind : ind + 2]
+            if pair in ("&&", ">&", "&>"):
+                ind += 2
+                continue
+            if char in ";\n" or pair == "||" or char == "&":
+                return True
+        ind += 1
+    return False
+
+
+def parse_apt_install(command: str) -> Optional[Tuple[List, List]]:
+    """
+    Parses a non-interactive "apt-get install" command.
+
+    Returns:
+        tuple: The options and the packages, None if the command is not a
+            plain "apt-get install -y".
+    """
+
+    match = APT_GET_INSTALL.match(command)
+    if match is None:
+        return None
+
+    options, packages = [], []
+    for token in match.group(1).split():
+        (options if token.startswith("-") else packages).append(token)
+    if not any(option in APT_YES for option in options) or not packages:
+        return None
+    return options, packages
+
+
+def optimize_apt(
+    commands: List[str],
+    no_install_recommends: bool = False,
+    remove_lists: bool = True,
+) -> List[str]:
+    """
+    Rewrites the apt commands of a single layer.
+
+    Args:
+        commands (list): The commands of the layer, in order.
+        no_install_recommends (bool): Add --no-install-recommends to the
+            merged installs.
+        remove_lists (bool): Remove the apt lists at the end of the layer,
+            only safe if no later layer installs without updating first.
+
+    Returns:
+        list: The rewritten commands.
+    """
+
+    output = []
+    installs = {}
+    updated = False
+    cleanup = False
+    current = None
+
+    for command in commands:
+        if APT_UPDATE.match(command):
+            # Only apt commands ran since the last update, sources are
+            # unchanged
+            if not updated:
+                output.append(command)
+                updated = cleanup = True
+            continue
+
+        if APT_CLEAN.match(command):
+            cleanup = True
+            continue
+
+        install = parse_apt_install(command)
+        if install is not None:
+            options, packages = install
+            if no_install_recommends and NO_INSTALL_RECOMMENDS not in options:
+                options.append(NO_INSTALL_RECOMMENDS)
+            if current is None:
+                current = len(output)
+                output.append(None)
+                installs[current] = (options, set())
+            for option in options:
+                if option not in installs[current][0]:
+                    installs[current][0].append(option)
+            installs[current][1].update(packages)
+            continue
+
+        output.append(command)
+        updated = False
+        current = None
+
+    for ind, (options, packages) in installs.items():
+        output[ind] = " ".join(
+            ["apt-get", "install", *options, *sorted(packages)]
+        )
+
+    if cleanup:
+        output.append(APT_CLEANUP[0])
+        if remove_lists and any(APT_UPDATE.match(cmd) for cmd in output):
+            output.append(APT_CLEANUP[1])
+
+    return output
+
+
+def needs_apt_lists(later_runs: List[str]) -> bool:
+    """
+    Checks if a later RUN installs packages before updating the apt lists.
+    """
+
+    for argument in later_runs:
+        install = APT_INSTALL_ANY.search(argument)
+        update = APT_UPDATE_ANY.search(argument)
+        if install and (update is None or install.start() < update.start()):
+            return True
+        if update:
+            return False
+    return False
+
+
+def optimize_instructions(
+    instructions: List, no_install_recommends: bool = False
+) -> Tuple[List, LayerReport]:
+    """
+    Merges and rewrites the RUN layers of a list of instructions.
+
+    Args:
+        instructions (list): The Instructions objects of a DockerFile.
+        no_install_recommends (bool): Add --no-install-recommends to apt-get
+            installs.
+
+    Returns:
+        tuple: The new Instructions list and the LayerReport.
+    """
+
+    from conman.ressources.docker_file import Instructions
+
+    # Segments: ("run", [argument], [comment], stage) or
+    # ("other", lines, comment, stage), RUNs of different stages never merge
+    segments = []
+    for instruction in instructions:
+        comment = instruction.comments
+        stage = instruction.stage
+        other = []
+        for cmd, argument in flatten(instruction):
+            if is_mergeable(cmd, argument):
+                if other:
+                    segments.append(("other", other, comment, stage))
+                    other, comment = [], ""
+                if not segments or segments[-1][0::3] != ("run", stage):
+                    segments.append(("run", [], [], stage))
+                segments[-1][1].append(argument)
+                if comment:
+                    segments[-1][2].append(comment)
+                    comment = ""
+            else:
+                other.append((cmd, argument))
+        if other:
+            segments.append(("other", other, comment, stage))
+
+    run_arguments = [
+        (ind, argument if isinstance(argument, str) else "")
+        for ind, (kind, lines, _, _) in enumerate(segments)
+        for argument in (
+            lines if kind == "run" else [a for c, a in lines if c == "RUN"]
+        )
+    ]
+
+    optimized = []
+    for ind, (kind, lines, comment, stage) in enumerate(segments):
+        if kind == "other":
+            cmds = [cmd for cmd, _ in lines]
+            arguments = [argument for _, argument in lines]
+            if len(lines) == 1:
+                cmds, arguments = cmds[0], arguments[0]
+            optimized.append(Instructions(cmds, arguments, comment, stage))
+            continue
+
+        commands = [
+            cmd for argument in lines for cmd in split_commands(argument)
+        ]
+        later_runs = [arg for seg, arg in run_arguments if seg > ind]
+        commands = optimize_apt(
+            commands,
+            no_install_recommends=no_install_recommends,
+            remove_lists=not needs_apt_lists(later_runs),
+        )
+        if len(commands) > 1:
+            commands = [
+                f"( {cmd} )" if has_list_operator(cmd) else cmd
+                for cmd in commands
+            ]
+        optimized.append(
+            Instructions(
+                "RUN",
+                RUN_SEPARATOR.join(commands),
+                "\n".join(comment),
+                stage,
+            )
+        )
+
+    report = LayerReport(
+        before=count_layers(instructions), after=count_layers(optimized)
+    )
+    return optimized, report
@@ -0,0 +1,359 @@
+"""
+Host GPU and NUMA topology.
+
+The NVIDIA GPUs are discovered from the driver entries in
+/proc/driver/nvidia/gpus and their PCI devices in /sys/bus/pci/devices,
+without running any command. Each GPU gets its PCI bus index, which is the
+nvidia-smi and CUDA (CUDA_DEVICE_ORDER=PCI_BUS_ID) numbering, its compute
+capability, NUMA node and the chain of PCI bridges leading to it, from which
+the GPUs closest to each other are selected.
+
+The NUMA nodes and their CPUs are read from /sys/devices/system/node and
+/sys/devices/system/cpu, to keep a container on the CPUs of a single node.
+
+Every function takes the filesystem root, so that tests can use a fake tree.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from itertools import combinations
+from typing import Dict, List, Optional, Tuple
+
+NVIDIA_GPUS_DIR = "proc/driver/nvidia/gpus"
+PCI_DEVICES_DIR = "sys/bus/pci/devices"
+NODES_DIR = "sys/devices/system/node"
+CPUS_ONLINE = "sys/devices/system/cpu/online"
+PCI_ADDRESS = re.compile(r"^[0-9a-f]{4}:[0-9a-f]{2}:[0-9a-f]{2}\.[0-9a-f]$")
+
+# Compute capability of the GPU families, by model name, the first match wins
+COMPUTE_CAPABILITIES: List[Tuple[str, str]] = [
+    (r"Quadro RTX \d+", "7.5"),
+    (r"RTX \d+( SFF)? Ada Generation", "8.9"),
+    (r"TITAN X$", "5.2"),
+    (r"\b(GB|B)(100|200)\b", "10.0"),
+    (r"GeForce RTX 50\d\d|RTX PRO \d+ Blackwell", "12.0"),
+    (r"\b(GH|H)(100|200|800)\b", "9.0"),
+    (r"\bL4\b|\bL40|RTX 40\d\d", "8.9"),
+    (r"\bA(100|800|30)\b", "8.0"),
+    (r"\bA(2|10G?|16|40)\b|RTX 30\d\d|RTX A\d+", "8.6"),
+    (r"\bT4\b|RTX 20\d\d|TITAN RTX|GTX 16\d\d", "7.5"),
+    (r"\bV100|TITAN V\b", "7.0"),
+    (r"\bP100\b", "6.0"),
+    (r"\bP(4|40)\b|GTX 10\d\d|TITAN Xp\b", "6.1"),
+]
+
+
+@dataclass
+class GpuDevice:
+    """
+    An NVIDIA GPU of the host.
+
+    Attributes:
+        index (int): The PCI bus order index, as numbered by nvidia-smi.
+        bus_id (str): The PCI address, e.g. "0000:07:00.0".
+        model (str): The model name.
+        uuid (str): The GPU UUID.
+        compute_capability (str): e.g. "8.6", empty if the model is unknown.
+        numa_node (int): The NUMA node of the device, -1 if unknown.
+        pci_path (list): The PCI addresses from the root port to the device.
+    """
+
+    index: int
+    bus_id: str
+    model: str = ""
+    uuid: str = ""
+    compute_capability: str = ""
+    numa_node: int = -1
+    pci_path: List[str] = field(default_factory=lambda: [])
+
+
+def read_file(path: str) -> Optional[str]:
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def read_information(path: str) -> Dict[str, str]:
+    """
+    Parses the "Key: value" lines of a driver information file.
+    """
+
+    information = {}
+    for line in (read_file(path) or "").splitlines():
+        key, _, value = line.partition(":")
+        information[key.strip()] = value.strip()
+    return information
+
+
+def compute_capability(model: str) -> str:
+    """
+    Returns the compute capability of a GPU model, empty if unknown.
+    """
+
+    for pattern, capability in COMPUTE_CAPABILITIES:
+        if re.search(pattern, model):
+            return capability
+    return ""
+
+
+def pci_path(bus_id: str, root: str = "/") -> List[str]:
+    """
+    Returns the PCI addresses from the root port to a device.
+
+    Args:
+        bus_id (str): The PCI address of the device.
+        root (str): The filesystem root.
+
+    Returns:
+        list: The addresses of the bridges then of the device.
+    """
+
+    device = os.path.realpath(os.path.join(root, PCI_DEVICES_DIR, bus_id))
+    path = [part for part in device.split(os.sep) if PCI_ADDRESS.match(part)]
+    return path or [bus_id]
+
+
+def discover_gpus(root: str = "/") -> List[GpuDevice]:
+    """
+    Lists the NVIDIA GPUs of the host.
+
+    Args:
+        root (str): The filesystem root.
+
+    Returns:
+        list: The GpuDevice objects, in PCI bus order.
+    """
+
+    gpus_dir = os.path.join(root, NVIDIA_GPUS_DIR)
+    try:
+        bus_ids = sorted(name.lower() for name in os.listdir(gpus_dir))
+    except OSError:
+        return []
+
+    gpus = []
+    for index, bus_id in enumerate(bus_ids):
+        information = read_information(
+            os.path.join(gpus_dir, bus_id, "information")
+        )
+        model = information.get("Model", "")
+        numa_node = read_file(
+            os.path.join(root, PCI_DEVICES_DIR, bus_id, "numa_node")
+        )
+        gpus.append(
+            GpuDevice(
+                index=index,
+                bus_id=bus_id,
+                model=model,
+                uuid=information.get("GPU UUID", ""),
+                compute_capability=compute_capability(model),
+                numa_node=int(numa_node) if numa_node else -1,
+                pci_path=pci_path(bus_id, root),
+            )
+        )
+    return gpus
+
+
+def gpus_to_facts(gpus: List[GpuDevice]) -> List[Dict]:
+    return [asdict(gpu) for gpu in gpus]
+
+
+def gpus_from_facts(facts: List[Dict]) -> List[GpuDevice]:
+    return [GpuDevice(**gpu) for gpu in facts]
+
+
+def distance(first: GpuDevice, second: GpuDevice) -> Tuple[int, int]:
+    """
+    Returns how far apart two GPUs are: whether they are on different NUMA
+    nodes, then the number of PCI hops between them.
+    """
+
+    common = 0
+    for a, b in zip(first.pci_path, second.pci_path):
+        if a != b:
+            break
+        common += 1
+    hops = len(first.pci_path) + len(second.pci_path) - 2 * common
+    if common == 0:
+        # Different root ports, the traffic crosses the host bridge
+        hops += 1
+    return int(first.numa_node != second.numa_node), hops
+
+
+def group_cost(gpus: List[GpuDevice]) -> Tuple[int, int]:
+    costs = [distance(a, b) for a, b in combinations(gpus, 2)]
+    return sum(c[0] for c in costs), sum(c[1] for c in costs)
+
+
+def select_gpus(gpus: List[GpuDevice], count: int) -> List[GpuDevice]:
+    """
+    Selects the count GPUs closest to each other.
+
+    Each GPU seeds a group grown with the GPU closest to the group so far,
+    the group with the least NUMA crossings then PCI hops wins, ties going
+    to the lowest indexes.
+
+    Args:
+        gpus (list): The GpuDevice objects of the host.
+        count (int): The number of GPUs to select.
+
+    Returns:
+        list: The selected GpuDevice objects, in index order.
+
+    Raises:
+        ValueError: If the host has fewer than count GPUs.
+    """
+
+    if count > len(gpus):
+        raise ValueError(
+            f"{count} GPUs requested, the host only has {len(gpus)}"
+        )
+
+    best, best_cost = None, None
+    for seed in gpus:
+        group = [seed]
+        while len(group) < count:
+            candidates = [gpu for gpu in gpus if gpu not in group]
+            group.append(
+                min(
+                    candidates,
+                    key=lambda gpu: (group_cost(group + [gpu]), gpu.index),
+                )
+            )
+        cost = group_cost(group)
+        if best_cost is None or cost < best_cost:
+            best, best_cost = group, cost
+    return sorted(best, key=lambda gpu: gpu.index)
+
+
+def pinned_gpus(gpus: List[GpuDevice], device_ids: List) -> List[GpuDevice]:
+    """
+    Returns the GPUs matching device ids, given as indexes or UUIDs.
+    """
+
+    device_ids = {str(device_id) for device_id in device_ids}
+    return [
+        gpu
+        for gpu in gpus
+        if str(gpu.index) in device_ids or gpu.uuid in device_ids
+    ]
+
+
+def parse_cpulist(cpulist: str) -> List[int]:
+    """
+    Parses a kernel CPU list, such as "0-3,8,10-11".
+    """
+
+    cpus = []
+    for part in cpulist.strip().split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def format_cpulist(cpus: List[int]) -> str:
+    """
+    Formats CPUs as a kernel CPU list, with ranges.
+    """
+
+    ranges = []
+    for cpu in sorted(set(cpus)):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(
+        str(first) if first == last else f"{first}-{last}"
+        for first, last in ranges
+    )
+
+
+def discover_numa_nodes(root: str = "/") -> Dict[int, List[int]]:
+    """
+    Lists the online CPUs of each NUMA node of the host.
+
+    A host without NUMA information is a single node 0 holding every online
+    CPU.
+
+    Args:
+        root (str): The filesystem root.
+
+    Returns:
+        dict: The CPUs by node, nodes without online CPUs are left out.
+    """
+
+    online = read_file(os.path.join(root, CPUS_ONLINE))
+    online = set(parse_cpulist(online)) if online else None
+
+    nodes = {}
+    nodes_dir = os.path.join(root, NODES_DIR)
+    try:
+        names = os.listdir(nodes_dir)
+    except OSError:
+        names = []
+    for name in names:
+        if not re.match(r"^node\d+$", name):
+            continue
+        cpulist = read_file(os.path.join(nodes_dir, name, "cpulist"))
+        cpus = parse_cpulist(cpulist or "")
+        if online is not None:
+            cpus = [cpu for cpu in cpus if cpu in online]
+        if cpus:
+            nodes[int(name[4:])] = cpus
+
+    if not nodes and online:
+        nodes[0] = sorted(online)
+    return dict(sorted(nodes.items()))
+
+
+def plan_numa_placement(
+    nodes: Dict[int, List[int]],
+    gpus: List[GpuDevice] = (),
+    key: str = "",
+    node: int = -1,
+) -> Tuple[int, str]:
+    """
+    Chooses the NUMA node a container runs on.
+
+    The node is, in order: the requested one, the node of most pinned GPUs,
+    or a node drawn from a hash of key, so that the containers of different
+    projects spread over the nodes while a rebuild keeps its node.
+
+    Args:
+        nodes (dict): The CPUs by node, from discover_numa_nodes.
+        gpus (list): The GpuDevice objects pinned to the container.
+        key (str): A stable name of the container, e.g. its project name.
+        node (int): The requested node, -1 to choose one.
+
+    Returns:
+        tuple: The node and the cpuset of its CPUs.
+
+    Raises:
+        ValueError: If the host has no NUMA information or no such node.
+    """
+
+    if not nodes:
+        raise ValueError("No NUMA topology found on the host")
+    if node >= 0:
+        if node not in nodes:
+            raise ValueError(
+                f"Unknown NUMA node: {node}, the host has {sorted(nodes)}"
+            )
+    else:
+        gpu_nodes = Counter(
+            gpu.numa_node for gpu in gpus if gpu.numa_node in nodes
+        )
+        if gpu_nodes:
+            node = min(gpu_nodes, key=lambda n: (-gpu_nodes[n], n))
+        else:
+            digest = hashlib.sha256(key.encode()).hexdigest()
+            node = sorted(nodes)[int(digest, 16) % len(nodes)]
+    return node, format_cpulist(nodes[node])
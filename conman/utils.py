@@ -1,10 +1,9 @@
 from __future__ import annotations
 
 import os.path
-import pkg_resources
 import shutil
 import os
-import yaml
+from conman import yml_backend
 
 TEMPLATE_PREFIX = "empty_template_"
 
@@ -44,10 +43,19 @@ def cp_template_file(template_filename: str) -> None:
     return 0
 
 
+def project_directory(path: str = None) -> str:
+    """
+    Returns the absolute path of a project directory, ending with "/".
+
+    Args:
+        path (str): The directory, None for the current one.
+    """
+
+    return os.path.join(os.path.abspath(path or os.getcwd()), "")
+
+
 def load_yml_file(yml_filename: str) -> dict:
-    with open(yml_filename, "r") as f:
-        config = yaml.load(f, Loader=yaml.FullLoader)
-    return config
+    return yml_backend.load_file(yml_filename)
 
 
 def convert_to_object(data):
@@ -73,3 +81,21 @@ def get_random_hash_str(size=14):
         str.encode(str(time()) + os.getcwd())
     ).hexdigest()
     return hash_value[:size]
+
+
+def get_stable_hash_str(*parts: str, size: int = 14) -> str:
+    """
+    Returns a short hash that only depends on the given parts.
+
+    Args:
+        *parts (str): The hashed values, e.g. a project path.
+        size (int): Number of hexadecimal characters kept.
+
+    Returns:
+        str: The hash.
+    """
+
+    import hashlib
+
+    hash_value = hashlib.sha256("\0".join(parts).encode()).hexdigest()
+    return hash_value[:size]
@@ -0,0 +1,175 @@
+"""
+YAML backend used by conman to load and dump files.
+
+The libyaml C implementation is picked when PyYAML is built with it, the
+pure-Python one otherwise. The choice can be forced with set_backend() or the
+CONMAN_YAML_BACKEND environment variable ("auto", "libyaml" or "python").
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Callable, List, Optional
+
+import yaml
+
+BACKENDS = ("auto", "libyaml", "python")
+BACKEND_ENV_VAR = "CONMAN_YAML_BACKEND"
+
+_backend: Optional[str] = None
+
+
+def has_libyaml() -> bool:
+    """
+    Checks if PyYAML is built with libyaml.
+
+    Returns:
+        bool: True if the C loaders and dumpers are available.
+    """
+
+    return bool(getattr(yaml, "__with_libyaml__", False))
+
+
+def set_backend(name: Optional[str]) -> None:
+    """
+    Forces the YAML backend.
+
+    Args:
+        name (str): One of "auto", "libyaml" or "python". None goes back to
+            the CONMAN_YAML_BACKEND environment variable.
+
+    Returns:
+        None
+    """
+
+    if name is not None and name not in BACKENDS:
+        raise ValueError(
+            f"Unknown YAML backend: {name}, expected one of {BACKENDS}"
+        )
+    global _backend
+    _backend = name
+
+
+def get_backend() -> str:
+    """
+    Resolves the YAML backend in use.
+
+    Returns:
+        str: "libyaml" or "python".
+    """
+
+    name = _backend or os.environ.get(BACKEND_ENV_VAR, "auto") or "auto"
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Unknown YAML backend: {name}, expected one of {BACKENDS}"
+        )
+    if name == "auto":
+        return "libyaml" if has_libyaml() else "python"
+    if name == "libyaml" and not has_libyaml():
+        raise ImportError("PyYAML is not built with libyaml")
+    return name
+
+
+def get_loader() -> type:
+    """
+    Returns the safe loader class of the backend in use.
+    """
+
+    return yaml.CSafeLoader if get_backend() == "libyaml" else yaml.SafeLoader
+
+
+def get_dumper() -> type:
+    """
+    Returns the safe dumper class of the backend in use.
+
+    Builder objects are dumped through the representers registered with
+    add_representer().
+    """
+
+    return yaml.CSafeDumper if get_backend() == "libyaml" else yaml.SafeDumper
+
+
+def add_representer(data_type: type, representer: Callable) -> None:
+    """
+    Registers a representer on every dumper a backend can pick.
+
+    Args:
+        data_type (type): The represented class.
+        representer (Callable): The representer function.
+
+    Returns:
+        None
+    """
+
+    for dumper in _dumpers():
+        if dumper.yaml_representers.get(data_type) is not representer:
+            dumper.add_representer(data_type, representer)
+
+
+def add_multi_representer(data_type: type, representer: Callable) -> None:
+    """
+    Registers a representer for a class and its subclasses on every dumper a
+    backend can pick.
+
+    Args:
+        data_type (type): The represented base class.
+        representer (Callable): The representer function.
+
+    Returns:
+        None
+    """
+
+    for dumper in _dumpers():
+        dumper.add_multi_representer(data_type, representer)
+
+
+def _dumpers() -> List[type]:
+    dumpers = [yaml.SafeDumper]
+    if has_libyaml():
+        dumpers.append(yaml.CSafeDumper)
+    return dumpers
+
+
+def load(stream) -> Any:
+    """
+    Parses a YAML document.
+
+    Args:
+        stream (str or file): The YAML document.
+
+    Returns:
+        Any: The loaded data.
+    """
+
+    return yaml.load(stream, Loader=get_loader())
+
+
+def load_file(filename: str) -> Any:
+    """
+    Parses a YAML file.
+
+    Args:
+        filename (str): The path to the YAML file.
+
+    Returns:
+        Any: The loaded data.
+    """
+
+    with open(filename, "r") as f:
+        return load(f)
+
+
+def dump(data: Any, stream=None, **kwargs) -> Optional[str]:
+    """
+    Serializes data to YAML.
+
+    Args:
+        data (Any): The data to dump.
+        stream (file, optional): Stream to write to.
+        **kwargs: Options forwarded to yaml.dump.
+
+    Returns:
+        str: The YAML document, or None when written to stream.
+    """
+
+    return yaml.dump(data, stream, Dumper=get_dumper(), **kwargs)
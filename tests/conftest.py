@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from conman.host import HostFacts, set_host_facts
+
+FAKE_USER = {"USER_NAME": "alice", "USER_UID": "1001", "USER_GID": "1002"}
+# Facts the tests use instead of probing the host running them
+FAKE_HOST_FACTS = {"platform": "Linux", "user": FAKE_USER, "display": ":0"}
+
+CONFIG = """
+images:
+    root:
+        name: foo
+        tag: bar
+    user:
+        extra_instructions: []
+container:
+    compose:
+        service_name: main
+        volumes: []
+"""
+
+FULL_CONFIG = """
+images:
+    root:
+        generate: true
+        name: foo
+        tag: bar
+        from_image:
+            name: ubuntu
+            tag: "20.04"
+        conda_environment:
+            env_name: myenv
+    user:
+        extra_instructions: []
+container:
+    compose:
+        service_name: main
+        volumes: []
+    devcontainer:
+        name: devcontainer_name
+"""
+
+
+def make_project(path, config=CONFIG):
+    os.makedirs(path / ".conman")
+    (path / ".conman" / "conman-config.yml").write_text(config)
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def fake_host():
+    previous = set_host_facts(HostFacts(FAKE_HOST_FACTS))
+    yield
+    set_host_facts(previous)
+
+
+@pytest.fixture
+def built_project(tmp_path, monkeypatch):
+    from conman.commands.build import Config
+
+    make_project(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    Config.load_conman_config_file(".conman/conman-config.yml").run_building()
+    return tmp_path
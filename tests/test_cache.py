@@ -0,0 +1,38 @@
+from conman.cache import BuildCache
+
+
+class TestBuildCache:
+    def test_skip_fresh_step(self, tmp_path):
+        cache = BuildCache(workdir=str(tmp_path))
+        output = tmp_path / "Dockerfile"
+        calls = []
+
+        def generate():
+            calls.append(1)
+            output.write_text("FROM ubuntu")
+
+        inputs = {"images": {"name": "foo"}}
+        assert cache.run("step", inputs, [str(output)], generate)
+        assert not cache.run("step", inputs, [str(output)], generate)
+        assert cache.run("step", {"images": None}, [str(output)], generate)
+        assert len(calls) == 2
+
+    def test_hand_edited_output_is_regenerated(self, tmp_path):
+        cache = BuildCache(workdir=str(tmp_path))
+        output = tmp_path / "Dockerfile"
+        generate = lambda: output.write_text("FROM ubuntu")
+        cache.run("step", {}, [str(output)], generate)
+        output.write_text("FROM debian")
+        assert cache.run("step", {}, [str(output)], generate)
+        assert cache.run("step", {}, [str(output)], generate, use_cache=False)
+
+    def test_lru_eviction_and_save(self, tmp_path):
+        cache = BuildCache(workdir=str(tmp_path), max_entries=2)
+        for i in range(3):
+            cache.record("step", {"i": i}, [])
+        assert list(cache.entries) == [
+            cache.key("step", {"i": 1}),
+            cache.key("step", {"i": 2}),
+        ]
+        cache.save()
+        assert BuildCache.load(str(tmp_path)).entries == cache.entries
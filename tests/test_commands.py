@@ -1,6 +1,8 @@
 import conman as cn
 import os
 
+from conftest import make_project
+
 
 class TestInit:
     def test_init_file_creation(self):
@@ -16,6 +18,17 @@ class TestInstall:
     pass
 
 
+class TestLint:
+    def test_ignore_list(self, tmp_path, monkeypatch):
+        from conman.commands.lint import lint
+
+        make_project(tmp_path)
+        monkeypatch.chdir(tmp_path)
+        assert lint(fail_on="never", ignore="CM001, ") == 0
+        assert lint(fail_on="never", ignore=" CM001 ,,CM006") == 0
+        assert lint(ignore="CM001,CM999") == 2
+
+
 if __name__ == "__main__":
     config = cn.commands.install.install()
     out = cn.commands.install.install_docker_compose(config)
@@ -0,0 +1,131 @@
+import pytest
+
+from conman.commands.build import Gpu, Resources
+from conman.ressources.docker_compose import (
+    DockerComposeFile,
+    get_compose_names,
+    parse_size,
+)
+
+
+class TestComposeNames:
+    def test_stable_names(self, tmp_path):
+        names = get_compose_names(str(tmp_path), "main")
+        assert names == get_compose_names(str(tmp_path) + "/", "main")
+        assert names["project_name"].startswith("alice-")
+        assert names["container_name"].startswith("alice-container-")
+
+    def test_unique_across_checkouts(self, tmp_path):
+        names = get_compose_names(str(tmp_path / "a"), "main")
+        assert names != get_compose_names(str(tmp_path / "b"), "main")
+        assert names != get_compose_names(str(tmp_path / "a"), "other")
+
+    def test_unknown_naming_mode(self, tmp_path):
+        with pytest.raises(ValueError):
+            get_compose_names(str(tmp_path), "main", naming="foo")
+
+
+class TestResources:
+    def test_service_resources(self):
+        compose_file = DockerComposeFile()
+        compose_file.add_service("main")
+        service = compose_file.get_service("main")
+        Resources(
+            cpus=4,
+            shm_size="8g",
+            ipc="shareable",
+            ulimits={"nofile": {"soft": 1024, "hard": 65536}, "memlock": -1},
+        ).add_to_service(service)
+
+        data = compose_file.to_dict()["services"]["main"]
+        assert data["cpus"] == 4
+        assert data["shm_size"] == "8g"
+        assert data["ipc"] == "shareable"
+        assert data["ulimits"]["memlock"] == -1
+        assert "mem_limit" not in data and "cpuset" not in data
+
+    def test_deploy_limits(self):
+        compose_file = DockerComposeFile()
+        compose_file.add_service("main")
+        service = compose_file.get_service("main")
+        Resources(cpus=2.5, mem_limit="8g", deploy_limits=True).add_to_service(
+            service
+        )
+
+        data = compose_file.to_dict()["services"]["main"]
+        limits = data["deploy"]["resources"]["limits"]
+        assert limits == {"cpus": "2.5", "memory": "8g"}
+        assert "cpus" not in data and "mem_limit" not in data
+
+    @pytest.mark.parametrize(
+        "options",
+        [
+            {"cpus": -1},
+            {"cpuset": "0-3,a"},
+            {"shm_size": "lots"},
+            {"mem_limit": "8g", "memswap_limit": "4g"},
+            {"ipc": "shared"},
+            {"ulimits": {"files": 1024}},
+            {"ulimits": {"nofile": {"soft": 4096, "hard": 1024}}},
+        ],
+    )
+    def test_invalid(self, options):
+        with pytest.raises(ValueError):
+            Resources(**options).validate()
+
+    def test_parse_size(self):
+        assert parse_size("512m") == 512 * 1024**2
+        assert parse_size("2GB") == 2 * 1024**3
+        assert parse_size(4096) == 4096
+
+
+class TestGpu:
+    def reserve(self, **options):
+        compose_file = DockerComposeFile()
+        compose_file.add_service("main")
+        Gpu(**options).add_to_service(compose_file.get_service("main"))
+        return compose_file.to_dict()["services"]["main"]
+
+    def test_count(self):
+        data = self.reserve(count=2)
+        devices = data["deploy"]["resources"]["reservations"]["devices"]
+        assert devices == [
+            {"driver": "nvidia", "count": 2, "capabilities": ["gpu"]}
+        ]
+        assert "environment" not in data
+
+    def test_count_all(self):
+        data = self.reserve(count="all", capabilities=["compute", "utility"])
+        device = data["deploy"]["resources"]["reservations"]["devices"][0]
+        assert device["count"] == "all"
+        assert device["capabilities"] == ["gpu", "compute", "utility"]
+
+    def test_device_ids(self):
+        data = self.reserve(device_ids=[1, 3])
+        device = data["deploy"]["resources"]["reservations"]["devices"][0]
+        assert device["device_ids"] == ["1", "3"]
+        assert "count" not in device
+        assert data["environment"] == [
+            "NVIDIA_VISIBLE_DEVICES=1,3",
+            "CUDA_DEVICE_ORDER=PCI_BUS_ID",
+        ]
+
+    def test_enabled(self):
+        assert not Gpu().is_enabled()
+        assert Gpu(count="all").is_enabled()
+        assert Gpu(device_ids=["0"]).is_enabled()
+        assert not Gpu(count=1, manufacturer="amd").is_enabled()
+
+    @pytest.mark.parametrize(
+        "options",
+        [
+            {"count": "two"},
+            {"count": 1, "device_ids": ["0"]},
+            {"device_ids": ["0", "0"]},
+            {"count": 1, "capabilities": ["cuda"]},
+            {"count": 1, "cuda_device_order": "BY_NAME"},
+        ],
+    )
+    def test_invalid(self, options):
+        with pytest.raises(ValueError):
+            Gpu(**options).validate()
@@ -0,0 +1,339 @@
+from types import SimpleNamespace
+
+import pytest
+
+from conman.ressources.docker_file import DockerFile
+from conman.ressources.docker_file_linter import (
+    exceeds_threshold,
+    lint_dockerfile,
+)
+from conman.ressources.docker_file_optimizer import count_layers, optimize_apt
+
+
+def run_lines(docker_file):
+    return [
+        instruction.arguments
+        for instruction in docker_file.instructions
+        if instruction.cmds == "RUN"
+    ]
+
+
+class TestOptimizer:
+    def test_default_root_dockerfile(self):
+        docker_file = DockerFile(img_basename="ubuntu:20.04")
+        docker_file.default_debian_root_instruction()
+        report = docker_file.optimize()
+
+        assert report.after < report.before
+        assert report.after == count_layers(docker_file.instructions)
+        (apt_layer,) = run_lines(docker_file)
+        assert apt_layer.count("apt-get update") == 1
+        assert apt_layer.count("apt-get install") == 1
+        assert apt_layer.endswith("rm -rf /var/lib/apt/lists/*")
+
+    def test_apt_installs_are_merged_and_sorted(self):
+        commands = optimize_apt(
+            [
+                "apt-get update",
+                "apt-get install -y wget git",
+                "apt-get update",
+                "apt-get install -y cmake git",
+            ],
+            no_install_recommends=True,
+        )
+        assert commands == [
+            "apt-get update",
+            "apt-get install -y --no-install-recommends cmake git wget",
+            "apt-get clean",
+            "rm -rf /var/lib/apt/lists/*",
+        ]
+
+    def test_lists_kept_for_later_installs(self):
+        docker_file = DockerFile(img_basename="ubuntu:20.04")
+        docker_file.add("RUN", "apt-get update && apt-get install -y git")
+        docker_file.add("RUN", "umask 000 && mkdir /opt/foo")
+        docker_file.add("RUN", "apt-get install -y wget")
+        report = docker_file.optimize()
+
+        assert report.before == report.after == 3
+        first, stateful, last = run_lines(docker_file)
+        assert "rm -rf /var/lib/apt/lists" not in first
+        assert stateful == "umask 000 && mkdir /opt/foo"
+
+    def test_list_operators_are_grouped(self):
+        docker_file = DockerFile(img_basename="ubuntu:20.04")
+        docker_file.add("RUN", "apt-get update")
+        docker_file.add("RUN", "make build || echo failed; ls")
+        docker_file.add("RUN", "echo 'a;b' | grep a")
+        docker_file.add("RUN", "apt-get install -y git")
+        docker_file.optimize()
+
+        (layer,) = run_lines(docker_file)
+        commands = layer.split(" && \\ \n\t")
+        assert commands[:3] == [
+            "apt-get update",
+            "( make build || echo failed; ls )",
+            "echo 'a;b' | grep a",
+        ]
+
+
+class TestBuildKit:
+    def test_cache_mounts(self, tmp_path):
+        docker_file = DockerFile(img_basename="ubuntu:20.04", buildkit=True)
+        docker_file.add("FROM", "ubuntu:20.04")
+        docker_file.add(
+            "RUN", "apt-get update && apt-get install -y git && apt-get clean"
+        )
+        docker_file.add("RUN", "pip install numpy")
+        docker_file.add("RUN", "echo done")
+        filename = str(tmp_path / "Dockerfile")
+        docker_file.generate(filename).dump_build_script(
+            basename="foo:bar", filename=str(tmp_path / "build.sh")
+        )
+
+        with open(filename) as f:
+            content = f.read()
+        assert content.startswith("# syntax=docker/dockerfile:1\n")
+        assert "keep-cache" in content
+        assert content.count("target=/var/cache/apt") == 1
+        assert "apt-get clean" not in content
+        assert "target=/root/.cache/pip \\ \n\tpip install numpy" in content
+        assert "RUN echo done" in content
+        with open(tmp_path / "build.sh") as f:
+            assert f.read().startswith("DOCKER_BUILDKIT=1 docker build")
+
+
+class TestStages:
+    def test_instructions_target_their_stage(self, tmp_path):
+        docker_file = DockerFile(img_basename="ubuntu:20.04")
+        docker_file.add_stage("builder", "ubuntu:20.04")
+        docker_file.add("RUN", "make")
+        docker_file.add_stage("runtime", "ubuntu:20.04")
+        docker_file.add("COPY", "--from=builder /opt /opt")
+        docker_file.add("RUN", "make install", stage="builder")
+        filename = str(tmp_path / "Dockerfile")
+        docker_file.generate(filename)
+
+        with open(filename) as f:
+            lines = [line for line in f.read().splitlines() if line]
+        assert lines == [
+            "FROM ubuntu:20.04 AS builder",
+            "RUN make",
+            "RUN make install",
+            "FROM ubuntu:20.04 AS runtime",
+            "COPY --from=builder /opt /opt",
+        ]
+        with pytest.raises(ValueError):
+            docker_file.add("RUN", "make", stage="tests")
+
+    def test_optimizer_keeps_stages_apart(self):
+        docker_file = DockerFile(img_basename="ubuntu:20.04")
+        docker_file.add_stage("builder", "ubuntu:20.04")
+        docker_file.add("RUN", "apt-get update")
+        docker_file.add("RUN", "apt-get install -y gcc")
+        docker_file.add_stage("runtime", "ubuntu:20.04")
+        docker_file.add("RUN", "apt-get update")
+        docker_file.add("RUN", "apt-get install -y git")
+        report = docker_file.optimize()
+
+        assert report.before == 4 and report.after == 2
+        assert [i.stage for i in docker_file.instructions] == [
+            "builder",
+            "builder",
+            "runtime",
+            "runtime",
+        ]
+
+    def test_parallel_root_stages(self, tmp_path):
+        conda_environment = SimpleNamespace(
+            directory="/opt/conda",
+            env_name="myenv",
+            env_filename="./.conman/conda/environment.yml",
+        )
+        docker_file = DockerFile(
+            img_basename="ubuntu:20.04", conda_environment=conda_environment
+        )
+        docker_file.parallel_root_instruction()
+        filename = str(tmp_path / "Dockerfile")
+        docker_file.generate(filename)
+
+        with open(filename) as f:
+            lines = f.read().splitlines()
+        assert [line for line in lines if line.startswith("FROM")] == [
+            "FROM ubuntu:20.04 AS system",
+            "FROM ubuntu:20.04 AS miniconda",
+            "FROM system AS builder",
+            "FROM system AS runtime",
+        ]
+        # The env solve has the build tools of the system stage
+        assert "COPY --from=miniconda /opt/conda /opt/conda" in lines
+        assert "COPY --from=builder /opt/conda /opt/conda" in lines
+
+
+class TestLinter:
+    def lint(self, tmp_path, lines, **kwargs):
+        docker_file = DockerFile(img_basename="ubuntu:20.04", **kwargs)
+        docker_file.add("FROM", "ubuntu:20.04")
+        for line in lines:
+            docker_file.add_line(line)
+        filename = str(tmp_path / "Dockerfile")
+        docker_file.generate(filename)
+        with open(filename) as f:
+            content = f.read().splitlines()
+        findings = lint_dockerfile(docker_file)
+        return {f.rule: (content[f.line - 1], f) for f in findings}
+
+    def test_rules(self, tmp_path):
+        findings = self.lint(
+            tmp_path,
+            [
+                "ARG USER_UID",
+                "ENV TOOL_HOME=/opt/tool",
+                "COPY src /src",
+                "RUN apt-get update",
+                "RUN apt-get install -y git",
+                "RUN apt-get clean",
+                "RUN wget https://example.com/tool-latest.tar.gz",
+                "RUN useradd --uid $USER_UID foo",
+            ],
+        )
+
+        assert sorted(findings) == [
+            "CM001",
+            "CM002",
+            "CM003",
+            "CM004",
+            "CM005",
+            "CM006",
+        ]
+        assert findings["CM001"][0] == "RUN apt-get update"
+        assert findings["CM001"][1].impact == 1
+        assert findings["CM002"][1].impact == 2
+        assert findings["CM004"][0].startswith("RUN wget")
+        assert findings["CM005"][1].severity == "medium"
+        assert findings["CM005"][1].impact == 4
+        assert exceeds_threshold([f for _, f in findings.values()], "high")
+
+    def test_clean_dockerfile(self, tmp_path):
+        findings = self.lint(
+            tmp_path,
+            [
+                "RUN apt-get update && apt-get install -y git && "
+                "rm -rf /var/lib/apt/lists/*",
+                "ARG USER_UID",
+                "RUN useradd --uid $USER_UID foo",
+                "COPY src /src",
+            ],
+            buildkit=True,
+        )
+        assert findings == {}
+
+
+class TestBuildxCache:
+    def build_script(self, tmp_path, **kwargs):
+        docker_file = DockerFile(img_basename="ubuntu:20.04")
+        docker_file.dump_build_script(
+            basename="foo:bar", filename=str(tmp_path / "build.sh"), **kwargs
+        )
+        with open(tmp_path / "build.sh") as f:
+            return f.read()
+
+    def test_classic_script_is_unchanged(self, tmp_path):
+        assert (
+            self.build_script(tmp_path)
+            == "docker build -f ./Dockerfile.root -t foo:bar ."
+        )
+
+    def test_local_cache_with_fallback(self, tmp_path):
+        script = self.build_script(
+            tmp_path, cache_type="local", cache_ref="/cache/foo"
+        )
+        assert '--cache-from "type=local,src=/cache/foo"' in script
+        assert '--cache-to "type=local,dest=/cache/foo,mode=max"' in script
+        assert "\telse\n" not in script and "\nelse\n" in script
+        assert "\tdocker build -f ./Dockerfile.root -t foo:bar .\n" in script
+
+    def test_registry_cache(self, tmp_path):
+        script = self.build_script(
+            tmp_path,
+            cache_type="registry",
+            cache_ref="localhost:5000/foo:cache",
+            fallback=False,
+        )
+        assert "type=registry,ref=localhost:5000/foo:cache" in script
+        assert "docker build " not in script
+        with pytest.raises(ValueError):
+            self.build_script(tmp_path, cache_type="s3", cache_ref="x")
+
+
+class TestCondaSolver:
+    def env_run(self, solver="classic", lockfile=""):
+        conda_environment = SimpleNamespace(
+            directory="/opt/conda",
+            env_name="myenv",
+            env_filename="./.conman/conda/environment.yml",
+            solver=solver,
+            lockfile=lockfile,
+        )
+        docker_file = DockerFile(
+            img_basename="ubuntu:20.04", conda_environment=conda_environment
+        )
+        docker_file.conda_env_instruction()
+        (instruction,) = docker_file.instructions
+        return instruction.arguments
+
+    def test_solvers(self):
+        copy, run = self.env_run()
+        assert copy == "conda/environment.yml /tmp/environment.yml"
+        assert "conda update -n base conda" in run
+
+        _, run = self.env_run("libmamba")
+        assert "CONDA_SOLVER=libmamba conda env create" in run
+        assert "conda update" not in run
+
+        _, run = self.env_run("micromamba")
+        assert "micromamba create -y -r $CONDA_DIRECTORY" in run
+
+        with pytest.raises(ValueError):
+            self.env_run("pip")
+
+    def test_lockfile_skips_the_solve(self):
+        copy, run = self.env_run(
+            lockfile="./.conman/conda/conda-linux-64.lock"
+        )
+        assert copy == "conda/conda-linux-64.lock /tmp/conda.lock"
+        assert "--file /tmp/conda.lock" in run
+        assert "environment.yml" not in run
+        assert "pip install --no-deps" in run
+
+
+class TestWheelhouse:
+    def test_wheelhouse_stage_comes_first(self, tmp_path):
+        docker_file = DockerFile(
+            img_basename="ubuntu:20.04", wdir="./.conman/", buildkit=True
+        )
+        docker_file.add("FROM", "ubuntu:20.04")
+        docker_file.wheelhouse_instruction("./.conman/requirements.txt")
+        filename = str(tmp_path / "Dockerfile")
+        docker_file.generate(filename)
+
+        with open(filename) as f:
+            content = f.read()
+        lines = content.splitlines()
+        assert [line for line in lines if line.startswith("FROM")] == [
+            "FROM python:3.8-slim AS wheelhouse",
+            "FROM ubuntu:20.04",
+        ]
+        assert "COPY requirements.txt /wheelhouse/requirements.txt" in lines
+        assert "--mount=type=bind,from=wheelhouse" in content
+        assert "uv pip install --python python3 --no-index" in content
+
+    def test_classic_builder_is_refused(self):
+        docker_file = DockerFile(img_basename="ubuntu:20.04")
+        docker_file.add("FROM", "ubuntu:20.04")
+        # A copy of the wheels would stay in an image layer
+        with pytest.raises(ValueError):
+            docker_file.wheelhouse_instruction("requirements.txt", "pip")
+        docker_file.buildkit = True
+        with pytest.raises(ValueError):
+            docker_file.wheelhouse_instruction("requirements.txt", "conda")
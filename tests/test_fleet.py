@@ -0,0 +1,68 @@
+import os
+import threading
+
+from conftest import FULL_CONFIG, make_project
+from conman.commands.build import Config
+from conman.fleet import build_projects, find_projects
+
+
+class TestFleet:
+    def test_find_projects(self, tmp_path):
+        first = make_project(tmp_path / "first")
+        second = make_project(tmp_path / "second")
+        os.makedirs(tmp_path / "not_a_project")
+        assert find_projects(str(tmp_path / "*")) == [first, second]
+        pattern = tmp_path / "*" / ".conman" / "conman-config.yml"
+        assert find_projects(str(pattern)) == [first, second]
+
+    def test_build_projects_isolates_errors(self, tmp_path):
+        good = make_project(tmp_path / "good")
+        bad = make_project(tmp_path / "bad", config="images: [")
+        cwd = os.getcwd()
+
+        results = build_projects([good, bad], jobs=2)
+
+        assert os.getcwd() == cwd
+        assert [result.project for result in results] == [good, bad]
+        assert results[0].ok and results[0].error is None
+        assert os.path.isfile(os.path.join(good, "Dockerfile.user"))
+        assert not results[1].ok and "ParserError" in results[1].error
+
+    def test_build_without_changing_directory(self, tmp_path, monkeypatch):
+        projects = [
+            make_project(tmp_path / name, config=FULL_CONFIG)
+            for name in ("first", "second")
+        ]
+        monkeypatch.chdir(tmp_path)
+        configs = [
+            Config.load_conman_config_file(
+                os.path.join(project, ".conman", "conman-config.yml")
+            )
+            for project in projects
+        ]
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda c=config, p=project: results.append(
+                    c.run_building(workdir=p)
+                )
+            )
+            for config, project in zip(configs, projects)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == [True, True]
+        assert sorted(os.listdir(tmp_path)) == ["first", "second"]
+        for project in projects:
+            for output in (
+                ".devcontainer/devcontainer.json",
+                ".devcontainer/Dockerfile.user",
+                ".conman/Dockerfile.root",
+                ".conman/build_root_img.sh",
+                ".conman/conda/environment.yml",
+                ".conman/scripts/postStartCommand.sh",
+            ):
+                assert os.path.isfile(os.path.join(project, output)), output
@@ -0,0 +1,48 @@
+import json
+
+from conftest import FAKE_USER
+from conman import host
+from conman.host import HostFacts, get_host_facts, set_host_facts
+from conman.ressources.docker_compose import get_user_id_data
+
+
+class TestHostFacts:
+    def test_injected_facts(self):
+        previous = set_host_facts(HostFacts({"user": FAKE_USER}))
+        try:
+            assert get_user_id_data() == FAKE_USER
+            get_user_id_data()["USER_NAME"] = "bob"
+            assert get_host_facts().user_id_data() == FAKE_USER
+        finally:
+            set_host_facts(previous)
+
+    def test_probed_once(self, monkeypatch):
+        calls = []
+        monkeypatch.setitem(
+            host.PROBES,
+            "compute_capability",
+            lambda f: calls.append(1) or "8.6",
+        )
+        facts = HostFacts()
+        assert facts.compute_capability() == "8.6"
+        assert facts.compute_capability() == "8.6"
+        assert len(calls) == 1
+
+    def test_persisted_with_ttl(self, tmp_path, monkeypatch):
+        monkeypatch.setitem(host.PROBES, "compute_capability", lambda f: "8.6")
+        filename = str(tmp_path / "host-facts.json")
+        facts = HostFacts({"platform": "Linux"})
+        facts.attach(filename)
+        facts.compute_capability()
+        facts.save()
+        with open(filename) as f:
+            assert list(json.load(f)) == ["compute_capability"]
+
+        monkeypatch.setitem(host.PROBES, "compute_capability", lambda f: "9.0")
+        facts = HostFacts()
+        facts.attach(filename)
+        assert facts.compute_capability() == "8.6"
+
+        facts = HostFacts()
+        facts.attach(filename, ttl=0)
+        assert facts.compute_capability() == "9.0"
@@ -0,0 +1,128 @@
+import io
+import json
+import os
+import pytest
+import yaml
+
+from conman import yml_backend
+from conman.io import Builder, compile_plan, ArtifactWriter, write_artifact
+from conman.commands.build import Config, Images, Image, Container
+
+
+class TestLoader:
+    def test_plan_is_cached(self):
+        assert compile_plan(Config) is compile_plan(Config)
+        assert compile_plan(Images).target("root") is Image
+        assert compile_plan(Images).target("unknown") is Builder
+
+    def test_from_dic_builds_nested_classes(self):
+        config = Config.from_dic(
+            {"images": {"root": {"name": "foo", "tag": "bar"}}}
+        )
+        assert isinstance(config.images.root, Image)
+        assert config.images.root.name == "foo"
+        assert config.images.user.__private_root_img__ is config.images.root
+
+    def test_from_dic_prune(self):
+        config = Config.from_dic(
+            {"container": {"engine": "podman"}}, prune=True
+        )
+        assert isinstance(config.container, Container)
+        assert config.container.engine == "podman"
+        assert config.container.gpu is None
+        assert config.container.devcontainer is None
+
+
+class TestSerializer:
+    def test_to_dict_matches_removing_attr(self):
+        config = Config()
+        for rm_empty in (True, False):
+            for rm_none in (True, False):
+                options = {"rm_empty": rm_empty, "rm_none": rm_none}
+                assert yml_backend.dump(
+                    config.to_dict(**options)
+                ) == yml_backend.dump(config.removing_attr(**options))
+
+    def test_to_dict_does_not_modify_instance(self):
+        config = Config()
+        data = config.to_dict(rm_private=True, rm_optional=True)
+        assert "_workdir" not in data
+        assert "name" not in data["container"]["devcontainer"]
+        assert hasattr(config, "_workdir")
+        assert hasattr(config.container.devcontainer, "name")
+
+    def test_to_json_matches_yaml_round_trip(self):
+        devcontainer = Config().container.devcontainer
+        options = {"rm_optional": False, "rm_none": True}
+        stream = yaml.dump(devcontainer.to_dict(**options), sort_keys=False)
+        expected = json.dumps(yaml.safe_load(stream), indent=4)
+        assert devcontainer.to_json(**options) == expected
+
+    def test_iter_dict_builds_one_section_at_a_time(self):
+        config = Config()
+        options = {"rm_optional": False, "rm_none": True}
+        assert dict(config.iter_dict(**options)) == config.to_dict(**options)
+
+        sections = config.iter_dict()
+        assert next(sections)[0] == "images"
+        # The container section is only serialized when it is reached
+        config.container.engine = "podman"
+        assert next(sections) == ("container", config.to_dict()["container"])
+        assert config.to_dict()["container"]["engine"] == "podman"
+
+    def test_write_yml_section_headers(self):
+        stream = io.StringIO()
+        Config().write_yml(stream, preambule="# Preambule\n")
+        content = stream.getvalue()
+        assert content.startswith(
+            "# Preambule\n\n# Images Settings\nimages:\n"
+        )
+        assert "\n\n# Container Settings\ncontainer:\n" in content
+
+
+class TestYmlBackend:
+    def test_forced_backends_agree(self):
+        data = Config().to_dict(rm_optional=False)
+        outputs = []
+        for backend in ("python", "auto"):
+            yml_backend.set_backend(backend)
+            try:
+                outputs.append(yml_backend.dump(data, sort_keys=False))
+                assert yml_backend.load(outputs[-1]) == yml_backend.load(
+                    outputs[0]
+                )
+            finally:
+                yml_backend.set_backend(None)
+        assert outputs[0] == outputs[1]
+
+    def test_dump_is_safe(self):
+        assert "!!python" not in yml_backend.dump(Config().removing_attr())
+        with pytest.raises(yaml.representer.RepresenterError):
+            yml_backend.dump(object())
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            yml_backend.set_backend("foo")
+
+
+class TestArtifactWriter:
+    def test_unchanged_file_is_not_rewritten(self, tmp_path):
+        filename = str(tmp_path / "Dockerfile")
+        assert write_artifact(filename, "FROM ubuntu\n", mode=0o755)
+        os.utime(filename, (0, 0))
+        assert not write_artifact(filename, "FROM ubuntu\n")
+        assert os.stat(filename).st_mtime == 0
+        assert write_artifact(filename, "FROM debian\n")
+        assert os.stat(filename).st_mode & 0o777 == 0o755
+        assert os.listdir(tmp_path) == ["Dockerfile"]
+
+    def test_failed_write_keeps_target(self, tmp_path):
+        filename = str(tmp_path / "Dockerfile")
+        write_artifact(filename, "FROM ubuntu\n")
+        with pytest.raises(RuntimeError):
+            with ArtifactWriter(filename) as f:
+                f.write("FROM")
+                raise RuntimeError
+        with open(filename) as f:
+            assert f.read() == "FROM ubuntu\n"
+        assert os.listdir(tmp_path) == ["Dockerfile"]
@@ -0,0 +1,122 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Startup budget of the CLI, imports of conman only (interpreter excluded)
+STARTUP_BUDGET_US = 50_000
+
+HEAVY_MODULES = [
+    "yaml",
+    "pkg_resources",
+    "conman.io",
+    "conman.commands.build",
+    "conman.ressources",
+]
+
+
+def import_times(code, cwd=None):
+    """
+    Runs code with -X importtime and returns the top level imports.
+
+    Returns:
+        dict: Module name to cumulative import time in microseconds.
+    """
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        cwd=cwd,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            # Nested imports are indented after the separator space
+            times[name[1:].rstrip()] = int(cumulative)
+    return times
+
+
+def startup_time(code, repeat=3, cwd=None):
+    """
+    Returns the best import time of conman over a few runs, and the imports.
+    """
+
+    baseline = import_times("pass")
+    best = None
+    for _ in range(repeat):
+        times = import_times(code, cwd=cwd)
+        total = sum(
+            value
+            for name, value in times.items()
+            if not name.startswith(" ") and name not in baseline
+        )
+        best = total if best is None else min(best, total)
+    return best, times
+
+
+@pytest.mark.parametrize(
+    "argv, forbidden",
+    [
+        (["status"], HEAVY_MODULES + ["importlib.metadata"]),
+        (["--version"], HEAVY_MODULES),
+    ],
+)
+def test_cli_startup(argv, forbidden, tmp_path):
+    code = (
+        "from conman.main import main\n"
+        "try:\n"
+        f"    main({argv!r})\n"
+        "except SystemExit:\n"
+        "    pass\n"
+    )
+    # Outside of a project, status has no config file to load
+    total, times = startup_time(code, cwd=tmp_path)
+    modules = {name.strip() for name in times}
+
+    for module in forbidden:
+        assert module not in modules
+    assert total < STARTUP_BUDGET_US
+
+
+def test_status_startup_in_project(built_project):
+    code = (
+        "from conman.main import main\n"
+        "try:\n"
+        "    main(['status'])\n"
+        "except SystemExit:\n"
+        "    pass\n"
+    )
+    total, times = startup_time(code, cwd=built_project)
+    modules = {name.strip() for name in times}
+
+    for module in HEAVY_MODULES + ["importlib.metadata"]:
+        assert module not in modules
+    assert total < STARTUP_BUDGET_US
+
+
+def test_build_import_probes_nothing(built_project):
+    # The config defaults are created with a Config, not at import, so the
+    # import neither reads the user database nor needs USER
+    code = (
+        "import pwd\n"
+        "def fail(*args):\n"
+        "    raise AssertionError('user database read at import')\n"
+        "pwd.getpwnam = pwd.getpwuid = fail\n"
+        "import conman.commands.build\n"
+        "import conman.host\n"
+        "assert conman.host._host_facts is None\n"
+    )
+    env = {k: v for k, v in os.environ.items() if k != "USER"}
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        cwd=built_project,
+        env=env,
+    )
+    assert proc.returncode == 0, proc.stderr
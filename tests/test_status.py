@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+
+from conftest import CONFIG
+from conman.commands.status import status
+
+
+def states(capsys):
+    lines = capsys.readouterr().out.splitlines()[:-1]
+    return {line[13:]: line[:11].rstrip() for line in lines}
+
+
+class TestStatus:
+    def test_up_to_date_without_loading_config(self, built_project):
+        proc = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys; from conman.commands.status import status; "
+                "assert status() == 0; "
+                "assert 'conman.commands.build' not in sys.modules",
+            ],
+            capture_output=True,
+            text=True,
+        )
+        assert proc.returncode == 0, proc.stderr
+        assert "up to date   Dockerfile.user" in proc.stdout
+
+    def test_drift(self, built_project, capsys):
+        manifest = built_project / ".conman" / "build-manifest.json"
+        before = manifest.read_text()
+        dockerfile = built_project / "Dockerfile.user"
+        dockerfile.write_text("FROM debian\n")
+        config = built_project / ".conman" / "conman-config.yml"
+        config.write_text(CONFIG.replace("main", "other"))
+        capsys.readouterr()
+
+        assert status() == 1
+        result = states(capsys)
+        assert result["Dockerfile.user"] == "hand-edited"
+        assert result["docker-compose.yml"] == "stale"
+        # Nothing is written
+        assert manifest.read_text() == before
+        assert dockerfile.read_text() == "FROM debian\n"
+
+        os.remove(built_project / "docker-compose.yml")
+        assert status() == 1
+        assert states(capsys)["docker-compose.yml"] == "missing"
@@ -0,0 +1,177 @@
+import os
+
+import pytest
+
+from conftest import FAKE_USER
+from conman import host
+from conman.commands.build import Gpu, Resources
+from conman.host import HostFacts, set_host_facts
+from conman.ressources.docker_compose import DockerComposeFile
+from conman.topology import (
+    compute_capability,
+    discover_gpus,
+    discover_numa_nodes,
+    format_cpulist,
+    gpus_to_facts,
+    parse_cpulist,
+    plan_numa_placement,
+    select_gpus,
+)
+
+# Two sockets, each with a PCIe switch holding two GPUs
+FAKE_GPUS = {
+    "0000:07:00.0": ("pci0000:00", "0000:00:01.0/0000:03:00.0", 0, "A100"),
+    "0000:08:00.0": ("pci0000:00", "0000:00:01.0/0000:03:01.0", 0, "A100"),
+    "0000:85:00.0": ("pci0000:80", "0000:80:01.0/0000:83:00.0", 1, "A100"),
+    "0000:86:00.0": ("pci0000:80", "0000:80:01.0/0000:83:01.0", 1, "A100"),
+}
+
+
+def make_fake_root(root, gpus=FAKE_GPUS):
+    for bus_id, (domain, bridges, numa_node, model) in gpus.items():
+        gpu_dir = root / "proc/driver/nvidia/gpus" / bus_id
+        gpu_dir.mkdir(parents=True)
+        (gpu_dir / "information").write_text(
+            f"Model: \t\t NVIDIA {model}-SXM4-40GB\n"
+            f"GPU UUID: \t GPU-{bus_id[5:7]}\n"
+            f"Bus Location: \t {bus_id}\n"
+        )
+        device = root / "sys/devices" / domain / bridges / bus_id
+        device.mkdir(parents=True)
+        (device / "numa_node").write_text(f"{numa_node}\n")
+        link = root / "sys/bus/pci/devices" / bus_id
+        link.parent.mkdir(parents=True, exist_ok=True)
+        os.symlink(os.path.relpath(device, link.parent), link)
+    return str(root)
+
+
+def make_fake_nodes(root, nodes={0: "0-7,16-23", 1: "8-15,24-31"}):
+    cpu_dir = root / "sys/devices/system/cpu"
+    cpu_dir.mkdir(parents=True)
+    (cpu_dir / "online").write_text("0-30\n")
+    for node, cpulist in nodes.items():
+        node_dir = root / "sys/devices/system/node" / f"node{node}"
+        node_dir.mkdir(parents=True)
+        (node_dir / "cpulist").write_text(f"{cpulist}\n")
+    return str(root)
+
+
+class TestTopology:
+    def test_discover(self, tmp_path):
+        gpus = discover_gpus(make_fake_root(tmp_path))
+        assert [gpu.index for gpu in gpus] == [0, 1, 2, 3]
+        assert gpus[2].bus_id == "0000:85:00.0"
+        assert gpus[2].numa_node == 1
+        assert gpus[2].uuid == "GPU-85"
+        assert gpus[2].compute_capability == "8.0"
+        assert gpus[2].pci_path == [
+            "0000:80:01.0",
+            "0000:83:00.0",
+            "0000:85:00.0",
+        ]
+
+    def test_no_driver(self, tmp_path):
+        assert discover_gpus(str(tmp_path)) == []
+
+    def test_select_by_locality(self, tmp_path):
+        gpus = discover_gpus(make_fake_root(tmp_path))
+        # GPUs 1 and 2 are adjacent in bus order but on different sockets
+        pair = select_gpus([gpus[1], gpus[2], gpus[3]], 2)
+        assert [gpu.index for gpu in pair] == [2, 3]
+        assert len(select_gpus(gpus, 4)) == 4
+        with pytest.raises(ValueError):
+            select_gpus(gpus, 5)
+
+    def test_compute_capability_without_cli(self, tmp_path):
+        gpus = gpus_to_facts(discover_gpus(make_fake_root(tmp_path)))
+        facts = HostFacts({"gpus": gpus})
+        assert host.probe_compute_capability(facts) == "8.0"
+        assert host.probe_compute_capability(HostFacts({"gpus": []})) == ""
+
+    @pytest.mark.parametrize(
+        "model, expected",
+        [
+            ("Quadro RTX 5000", "7.5"),
+            ("Quadro RTX 4000", "7.5"),
+            ("NVIDIA RTX 5000 Ada Generation", "8.9"),
+            ("NVIDIA RTX 4000 SFF Ada Generation", "8.9"),
+            ("GeForce GTX TITAN X", "5.2"),
+            ("NVIDIA TITAN Xp", "6.1"),
+            ("NVIDIA GeForce RTX 5090", "12.0"),
+            ("NVIDIA RTX PRO 6000 Blackwell Workstation Edition", "12.0"),
+            ("NVIDIA B200", "10.0"),
+        ],
+    )
+    def test_compute_capability_by_model(self, model, expected):
+        assert compute_capability(model) == expected
+
+    def test_gpu_grouped_by_locality(self, tmp_path):
+        gpus = discover_gpus(make_fake_root(tmp_path))
+        facts = {"user": FAKE_USER, "gpus": gpus_to_facts(gpus[1:])}
+        previous = set_host_facts(HostFacts(facts))
+        try:
+            compose_file = DockerComposeFile()
+            compose_file.add_service("main")
+            Gpu(count=2, group_by_locality=True).add_to_service(
+                compose_file.get_service("main")
+            )
+            data = compose_file.to_dict()["services"]["main"]
+        finally:
+            set_host_facts(previous)
+
+        devices = data["deploy"]["resources"]["reservations"]["devices"]
+        assert devices[0]["device_ids"] == ["2", "3"]
+        assert "NVIDIA_VISIBLE_DEVICES=2,3" in data["environment"]
+
+
+class TestNumaPlacement:
+    def test_cpulist(self):
+        assert parse_cpulist("0-3,8,10-11\n") == [0, 1, 2, 3, 8, 10, 11]
+        assert format_cpulist([11, 0, 1, 2, 3, 8, 10]) == "0-3,8,10-11"
+
+    def test_discover(self, tmp_path):
+        nodes = discover_numa_nodes(make_fake_nodes(tmp_path))
+        assert format_cpulist(nodes[0]) == "0-7,16-23"
+        # CPU 31 is offline
+        assert format_cpulist(nodes[1]) == "8-15,24-30"
+
+    def test_no_numa(self, tmp_path):
+        cpu_dir = tmp_path / "sys/devices/system/cpu"
+        cpu_dir.mkdir(parents=True)
+        (cpu_dir / "online").write_text("0-3\n")
+        assert discover_numa_nodes(str(tmp_path)) == {0: [0, 1, 2, 3]}
+
+    def test_plan(self, tmp_path):
+        nodes = discover_numa_nodes(make_fake_nodes(tmp_path))
+        gpus = discover_gpus(make_fake_root(tmp_path))
+        assert plan_numa_placement(nodes, gpus=gpus[2:])[0] == 1
+        assert plan_numa_placement(nodes, node=0) == (0, "0-7,16-23")
+        key_node = plan_numa_placement(nodes, key="project")[0]
+        assert plan_numa_placement(nodes, key="project")[0] == key_node
+        with pytest.raises(ValueError):
+            plan_numa_placement(nodes, node=2)
+
+    def test_service_on_gpu_node(self, tmp_path):
+        facts = {
+            "user": FAKE_USER,
+            "gpus": gpus_to_facts(discover_gpus(make_fake_root(tmp_path))),
+            "numa_nodes": discover_numa_nodes(make_fake_nodes(tmp_path)),
+        }
+        previous = set_host_facts(HostFacts(facts))
+        try:
+            compose_file = DockerComposeFile()
+            compose_file.add_service("main")
+            service = compose_file.get_service("main")
+            device_ids = Gpu(device_ids=["3"]).add_to_service(service)
+            Resources(placement="numa").add_to_service(
+                service, gpu_device_ids=device_ids, key="project"
+            )
+            data = compose_file.to_dict()["services"]["main"]
+        finally:
+            set_host_facts(previous)
+
+        assert data["cpuset"] == "8-15,24-30"
+
+    def test_cpuset_exclusive(self):
+        with pytest.raises(ValueError):
+            Resources(placement="numa", cpuset="0-3").validate()